@@ -0,0 +1,220 @@
+"""Benchmarks of models/db.py on a synthetic database.
+
+    python -m benchmarks.db_bench --scale 100k --out bench.json
+    python -m benchmarks.db_bench --scale 100k --compare bench.json --threshold 0.25
+
+The database for a scale is generated once (benchmarks/synthetic.py, via the bulk
+importer) into the temp directory and reused by later runs; --fresh regenerates it.
+Reads are measured first, then writes, which add a few hundred rows to the reused file.
+
+For each operation the result holds p50/p95/mean in ms and the peak memory allocated
+by one call (tracemalloc, measured in a separate pass so it does not skew the timings).
+With --compare the run fails (exit code 1) when an operation's p95 is more than
+``threshold`` slower than in the given earlier result.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from models import db
+from models.importer import import_records
+from benchmarks.synthetic import Generator
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+# differences below this are timer noise, whatever the relative change
+MIN_DELTA_MS = 0.05
+
+
+def parse_scale(text):
+    text = text.lower()
+    return SCALES[text] if text in SCALES else int(text)
+
+def database_for(visits, seed, fresh=False, directory=None):
+    """Path of the synthetic DB with ``visits`` visits, generated if missing."""
+    path = os.path.join(directory or tempfile.gettempdir(), f'mis_bench_{visits}_{seed}.db')
+    if fresh:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    db.DB_PATH = path
+    db.init_db()
+    gen = Generator(seed, patients=max(1, visits // 4))
+    started = time.perf_counter()
+    imported, _, _ = import_records(gen.records(visits), f'synthetic:{visits}:{seed}', chunk_size=5000,
+                                    progress=lambda done, rate: print(f'\rgenerating: {done}/{visits}, {rate:.0f} rows/s',
+                                                                      end='', file=sys.stderr, flush=True))
+    if imported:
+        print(f'\rgenerated {imported} visits in {time.perf_counter() - started:.1f} s', file=sys.stderr)
+        db.get_conn().execute("ANALYZE")
+    return path, gen
+
+
+def _sample(conn, sql, count, rnd):
+    rows = conn.execute(sql).fetchall()
+    return [rnd.choice(rows) for _ in range(count)] if rows else []
+
+def workloads(gen, count, rnd):
+    """name -> (function, list of argument tuples); argument values come from the data itself."""
+    conn = db.get_conn()
+    max_vid = conn.execute("SELECT MAX(id) FROM visits").fetchone()[0] or 1
+    patients = _sample(conn, "SELECT fio, birthdate, phone FROM patients ORDER BY random() LIMIT 1000", count, rnd)
+    first, last = conn.execute("SELECT MIN(visit_date), MAX(visit_date) FROM visits").fetchone()
+    first = datetime.strptime(first, '%Y-%m-%d')
+    span = max(1, (datetime.strptime(last, '%Y-%m-%d') - first).days)
+
+    def day(offset=0):
+        return (first + timedelta(days=rnd.randrange(span) + offset)).strftime('%Y-%m-%d')
+
+    def week():
+        start = rnd.randrange(span)
+        return ((first + timedelta(days=start)).strftime('%Y-%m-%d'),
+                (first + timedelta(days=start + 6)).strftime('%Y-%m-%d'))
+
+    phones = [p['phone'] for p in patients if p['phone']]
+    next_patient = conn.execute("SELECT MAX(id) FROM patients").fetchone()[0] + 1_000_000
+    new_patients = [gen.patient(next_patient + i) for i in range(count)]
+    visits = [gen.record(rnd.randrange(10 ** 9)) for _ in range(count)]
+    ids = [p['id'] for p in conn.execute("SELECT id FROM patients ORDER BY random() LIMIT ?", (count,))]
+    return {
+        'find_patient.phone': (db.find_patient, [(None, None, p) for p in phones]),
+        'find_patient.fio_birthdate': (db.find_patient, [(p['fio'], p['birthdate']) for p in patients]),
+        'find_patient.fio': (db.find_patient, [(p['fio'].split()[0],) for p in patients]),
+        'list_patients_like': (db.list_patients_like, [(p['fio'].split()[0][:4],) for p in patients]),
+        'list_visits_for_date': (db.list_visits_for_date, [(day(),) for _ in range(count)]),
+        'list_visits_between': (db.list_visits_between, [week() for _ in range(count)]),
+        'list_visits_between.brief_page': (lambda a, b: db.list_visits_between(a, b, brief=True, limit=200),
+                                           [week() for _ in range(count)]),
+        'get_visit_by_id': (db.get_visit_by_id, [(rnd.randint(1, max_vid),) for _ in range(count)]),
+        # writes last: they change the data the reads above run on
+        'save_patient': (db.save_patient, [(p,) for p in new_patients]),
+        'save_visit': (db.save_visit, [
+            (rnd.choice(ids), v['visit_datetime'], v['vid_priema'], v['obschsost'], v['soznanie'], v['examiner'],
+             v['diagnosis'], v['mkb_code'], v['outcome'], v['evacuation_place'], v['full_epicrisis'])
+            for v in visits]),
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def measure(fn, calls, warmup=3, memory_calls=20):
+    for args in calls[:warmup]:
+        fn(*args)
+    times = []
+    for args in calls:
+        started = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - started) * 1000)
+    peak = 0
+    tracemalloc.start()
+    for args in calls[:memory_calls]:
+        tracemalloc.reset_peak()
+        fn(*args)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return {
+        'calls': len(times),
+        'p50_ms': round(percentile(times, 0.5), 4),
+        'p95_ms': round(percentile(times, 0.95), 4),
+        'mean_ms': round(sum(times) / len(times), 4),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(visits, seed=1, count=200, fresh=False, directory=None, only=None):
+    path, gen = database_for(visits, seed, fresh, directory)
+    rnd = random.Random(seed)
+    results = {}
+    for name, (fn, calls) in workloads(gen, count, rnd).items():
+        if only and not any(name.startswith(o) for o in only):
+            continue
+        if not calls:
+            continue
+        results[name] = measure(fn, calls)
+        r = results[name]
+        print(f'{name:34} p50 {r["p50_ms"]:9.3f} ms   p95 {r["p95_ms"]:9.3f} ms   peak {r["peak_kb"]:9.1f} KiB',
+              file=sys.stderr)
+    db.close_conn()
+    return {
+        'meta': {
+            'commit': _commit(), 'date': datetime.now().isoformat(timespec='seconds'),
+            'visits': visits, 'seed': seed, 'calls': count,
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(),
+            'db_mb': round(os.path.getsize(path) / 2 ** 20, 1), 'max_rss_kb': _max_rss_kb(),
+        },
+        'ops': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """List of (op, baseline p95, current p95) for operations slower than ``threshold`` (0.2 = 20%)."""
+    worse = []
+    for op, r in current['ops'].items():
+        old = baseline.get('ops', {}).get(op)
+        if not old:
+            continue
+        if r['p95_ms'] > old['p95_ms'] * (1 + threshold) and r['p95_ms'] - old['p95_ms'] > MIN_DELTA_MS:
+            worse.append((op, old['p95_ms'], r['p95_ms']))
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark models/db.py on a synthetic database')
+    parser.add_argument('--scale', default='10k', help='number of visits: 10k, 100k, 1m or a number')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--calls', type=int, default=200, help='calls per operation')
+    parser.add_argument('--only', nargs='*', help='operations to run (name prefixes)')
+    parser.add_argument('--dir', help='where to keep the generated databases (default: temp directory)')
+    parser.add_argument('--fresh', action='store_true', help='regenerate the database')
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='earlier results (JSON) to check against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown, 0.2 = 20%%')
+    args = parser.parse_args(argv)
+
+    visits = parse_scale(args.scale)
+    result = run(visits, args.seed, args.calls, args.fresh, args.dir, args.only)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('visits') != visits:
+            print(f'warning: baseline was measured on {baseline.get("meta", {}).get("visits")} visits', file=sys.stderr)
+        worse = compare(result, baseline, args.threshold)
+        for op, old, new in worse:
+            print(f'REGRESSION {op}: p95 {old:.3f} -> {new:.3f} ms', file=sys.stderr)
+        return 1 if worse else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
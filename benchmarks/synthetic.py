@@ -0,0 +1,145 @@
+"""Synthetic patients and visits for benchmarks.
+
+Records have the shape models.importer expects: patient columns, visit columns and
+a full_epicrisis with every field of the main form, as the form saves it (empty
+strings and unchecked boxes included). Combo box values are taken from the items
+in ui/mainwindow.ui, so the data looks like what doctors actually enter.
+
+The output depends only on ``seed``: the same seed gives the same records, which
+lets an interrupted generation resume (see models.importer.import_records).
+"""
+import random
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+from models.epicrisis import FORM_UI, FORM_VERSION, VERSION_KEY, get_plan
+
+SURNAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+            'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов',
+            'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв',
+            'Борисов', 'Яковлев', 'Григорьев', 'Романов', 'Воробьёв', 'Сергеев', 'Кузьмин', 'Фролов', 'Белов')
+MALE_NAMES = ('Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артём', 'Илья', 'Кирилл',
+              'Михаил', 'Никита', 'Иван', 'Евгений', 'Владимир', 'Павел', 'Роман', 'Олег', 'Виктор')
+FEMALE_NAMES = ('Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Ирина', 'Екатерина', 'Светлана',
+                'Юлия', 'Дарья', 'Алина', 'Ксения', 'Марина', 'Виктория', 'Людмила', 'Галина', 'Полина')
+PATRONYMICS = ('Александров', 'Дмитриев', 'Сергеев', 'Андреев', 'Алексеев', 'Михайлов', 'Иванов',
+               'Владимиров', 'Николаев', 'Викторов', 'Петров', 'Юрьев', 'Олегов', 'Павлов')
+ORGANISATIONS = ('ООО "Вахта-Сервис"', 'АО "Северная нефть"', 'ООО "СтройМонтаж"', 'ПАО "Энергосеть"',
+                 'ООО "Бурение"', 'АО "Транснефть-Север"', 'ООО "ГеоТехСервис"', 'ООО "Логистик"', '')
+PROFESSIONS = ('Оператор', 'Машинист', 'Электромонтёр', 'Слесарь', 'Водитель', 'Инженер', 'Повар', 'Бурильщик')
+DIAGNOSES = (
+    ('J06.9', 'Острая инфекция верхних дыхательных путей неуточнённая'),
+    ('J20.9', 'Острый бронхит неуточнённый'),
+    ('I10', 'Эссенциальная (первичная) гипертензия'),
+    ('K29.7', 'Гастрит неуточнённый'),
+    ('M54.5', 'Боль внизу спины'),
+    ('S60.0', 'Ушиб пальца(ев) кисти без повреждения ногтевой пластинки'),
+    ('T14.0', 'Поверхностная травма неуточнённой области тела'),
+    ('R51', 'Головная боль'),
+    ('L23.9', 'Аллергический контактный дерматит, причина не уточнена'),
+    ('H10.9', 'Конъюнктивит неуточнённый'),
+    ('K08.8', 'Другие уточнённые изменения зубов и их опорного аппарата'),
+    ('N30.0', 'Острый цистит'),
+)
+EXAMINERS = ('admin', 'Петрова Е.В.', 'Сидоров А.Н.', 'Ким О.Л.', 'Галиев Р.Р.')
+PHRASES = ('без особенностей', 'жалобы на слабость и недомогание в течение двух дней',
+           'боль умеренная, усиливается при движении', 'со слов пациента, заболел остро',
+           'хронические заболевания отрицает', 'аллергологический анамнез не отягощён',
+           'принимал парацетамол с временным эффектом', 'рекомендовано наблюдение в динамике',
+           'ОАК, ОАМ, ЭКГ — без патологии', 'повязка сухая, отёка нет')
+
+
+def combo_items(path=FORM_UI):
+    """Combo box name -> list of its item texts in the .ui file."""
+    items = {}
+    for widget in ET.parse(path).getroot().iter('widget'):
+        if widget.get('class') != 'QComboBox':
+            continue
+        texts = [item.findtext("property[@name='text']/string") for item in widget.findall('item')]
+        texts = [t for t in texts if t]
+        if texts:
+            items[widget.get('name')] = texts
+    return items
+
+
+class Generator:
+    """Deterministic source of patient+visit records."""
+
+    def __init__(self, seed=1, patients=None, start=datetime(2022, 1, 1), days=3 * 365):
+        self.seed = seed
+        self.patients = patients
+        self.start = start
+        self.days = days
+        self.plan = get_plan().fields
+        self.combos = combo_items()
+
+    def fio(self, rnd):
+        if rnd.random() < 0.5:
+            return f'{rnd.choice(SURNAMES)} {rnd.choice(MALE_NAMES)} {rnd.choice(PATRONYMICS)}ич'
+        return f'{rnd.choice(SURNAMES)}а {rnd.choice(FEMALE_NAMES)} {rnd.choice(PATRONYMICS)}на'
+
+    def patient(self, n):
+        """Patient ``n``: the same person (phone, FIO, birthdate) every time it is asked for."""
+        rnd = random.Random(self.seed * 1_000_003 + n)
+        return {
+            'fio': self.fio(rnd),
+            'birthdate': f'{rnd.randint(1960, 2003)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}',
+            # every tenth patient has no phone and is matched by fio+birthdate
+            'phone': '' if n % 10 == 9 else f'+79{n:09d}',
+            'organisation': rnd.choice(ORGANISATIONS),
+            'profession': rnd.choice(PROFESSIONS),
+        }
+
+    def epicrisis(self, rnd, patient, visit):
+        full = {}
+        for name, (_, _, _, kind, _) in self.plan.items():
+            if kind == 'flag':
+                full[name] = rnd.random() < 0.2
+            elif kind == 'number':
+                full[name] = rnd.randint(0, 15) if name == 'glazgoslider' else rnd.randint(0, 10)
+            elif name in self.combos:
+                full[name] = rnd.choice(self.combos[name]) if rnd.random() < 0.8 else ''
+            else:
+                full[name] = rnd.choice(PHRASES) if rnd.random() < 0.35 else ''
+        full.update({
+            'patientfio': patient['fio'], 'patientdate': patient['birthdate'], 'phone_pole': patient['phone'],
+            'organisation': patient['organisation'], 'profession': patient['profession'],
+            'rostpole': str(rnd.randint(155, 195)), 'vespole': str(rnd.randint(50, 120)),
+            'ADpole': f'{rnd.randint(100, 160)}/{rnd.randint(60, 100)}', 'chsspole': str(rnd.randint(55, 110)),
+            'ttelapole': f'{rnd.uniform(35.8, 38.9):.1f}', 'ddpole': str(rnd.randint(14, 22)),
+            'spo2pole': str(rnd.randint(92, 99)), 'pspole': str(rnd.randint(55, 110)),
+            'zhalobypole': rnd.choice(PHRASES), 'anamnesispole': ' '.join(rnd.sample(PHRASES, 3)),
+            'dspole': visit['diagnosis'], 'mkb10list': visit['mkb_code'], 'fiovrach': visit['examiner'],
+            'lechpole': ' '.join(rnd.sample(PHRASES, 2)),
+            VERSION_KEY: FORM_VERSION,
+        })
+        return full
+
+    def record(self, i):
+        """Visit ``i`` with its patient as an importer record."""
+        rnd = random.Random(self.seed * 7_000_003 + i)
+        total = self.patients or max(1, i)
+        patient = self.patient(rnd.randrange(total))
+        when = self.start + timedelta(days=rnd.randrange(self.days), hours=rnd.randint(7, 21),
+                                      minutes=rnd.randrange(60), seconds=rnd.randrange(60))
+        mkb_code, diagnosis = rnd.choice(DIAGNOSES)
+        outcome = rnd.choice(self.combos.get('ishod') or ('Выздоровление',))
+        visit = {
+            'visit_datetime': when.strftime('%Y-%m-%d %H:%M:%S'),
+            'vid_priema': rnd.choice(self.combos.get('vidpriema') or ('первичный',)),
+            'obschsost': rnd.choice(self.combos.get('obschsost') or ('Удовлетворительное',)),
+            'soznanie': rnd.choice(self.combos.get('soznanie') or ('Ясное',)),
+            'examiner': rnd.choice(EXAMINERS),
+            'diagnosis': diagnosis,
+            'mkb_code': mkb_code,
+            'outcome': outcome,
+            'evacuation_place': rnd.choice(self.combos.get('stacionarname') or ('',)) if rnd.random() < 0.05 else '',
+        }
+        record = {k: patient[k] for k in ('fio', 'birthdate', 'phone', 'organisation')}
+        record.update(visit)
+        record['full_epicrisis'] = self.epicrisis(rnd, patient, visit)
+        return record
+
+    def records(self, count):
+        for i in range(count):
+            yield self.record(i)
@@ -6,3 +6,16 @@ DB_PATH = os.path.join(BASE_DIR, "app.db")
 SETTINGS_FILE = os.path.join(BASE_DIR, "app_settings.json")
 
 DEFAULT_AUTOSAVE_INTERVAL = 60
+
+# How long a connection waits for another process's write lock before "database is locked".
+DB_BUSY_TIMEOUT_MS = 10000
+
+# Optional DB service (db_service.py): "host:port" makes models.db call it instead of
+# opening DB_PATH; empty = direct access. The token, if set, must match the service's.
+DB_SERVICE = os.environ.get("MIS_DB_SERVICE", "")
+DB_SERVICE_PORT = 8765
+DB_SERVICE_TOKEN = os.environ.get("MIS_DB_SERVICE_TOKEN", "")
+
+# Timing instrumentation (perf.py): off unless MIS_PERF=1, can be switched on in the debug window
+PERF_ENABLED = os.environ.get("MIS_PERF") == "1"
+PERF_LOG_FILE = os.path.join(BASE_DIR, "logs", "perf.log")
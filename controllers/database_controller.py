@@ -1,7 +1,10 @@
 from PyQt5 import QtWidgets, uic, QtCore
 import os
 from config import UI_DIR
-from models.db import list_visits_between, get_visit_by_id, init_db
+from models.db import list_visits_between, search_visits, get_visit_by_id
+from controllers.visits_model import VisitsTableModel
+from controllers.db_executor import db_executor
+import perf
 
 class DatabaseController(QtWidgets.QMainWindow):
     def __init__(self):
@@ -13,7 +16,8 @@ class DatabaseController(QtWidgets.QMainWindow):
         lay = QtWidgets.QVBoxLayout(central)
         top = QtWidgets.QHBoxLayout()
         self.search_edit = QtWidgets.QLineEdit()
-        self.search_edit.setPlaceholderText('Поиск по ФИО или коду...')
+        self.search_edit.setPlaceholderText('Поиск по ФИО, диагнозу, коду МКБ или тексту эпикриза...')
+        self.search_edit.returnPressed.connect(self.on_filter)
         self.date_from = QtWidgets.QDateEdit()
         self.date_from.setCalendarPopup(True)
         self.date_from.setDate(QtCore.QDate.currentDate().addDays(-30))
@@ -26,55 +30,52 @@ class DatabaseController(QtWidgets.QMainWindow):
         top.addWidget(self.date_to)
         top.addWidget(self.btn_filter)
         lay.addLayout(top)
-        self.table = QtWidgets.QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(['id','Дата','Пациент','Кейс'])
+        self.model = VisitsTableModel([('id','id'), ('visit_datetime','Дата'), ('patient_fio','Пациент'), ('case_text','Кейс')], self, executor=db_executor())
+        self.model.load_failed.connect(lambda e: QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить данные: {e}'))
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
         self.table.hideColumn(0)
         self.table.doubleClicked.connect(self.on_double)
         lay.addWidget(self.table)
         self.btn_filter.clicked.connect(self.on_filter)
-        # initialize DB
-        try:
-            init_db()
-        except Exception:
-            pass
-        self.on_filter()
+        # the first query runs when the window is shown, not when it is built
+        self._loaded = False
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._loaded:
+            self._loaded = True
+            self.on_filter()
 
+    @perf.timed('ui.on_filter')
     def on_filter(self):
         try:
             start = self.date_from.date().toString('yyyy-MM-dd') + ' 00:00:00'
             end = self.date_to.date().toString('yyyy-MM-dd') + ' 23:59:59'
-            rows = list_visits_between(start, end)
-            q = self.search_edit.text().lower()
-            filtered = []
-            for r in rows:
-                if not q or q in (r.get('patient_fio') or '').lower() or q in str(r.get('full_epicrisis','')).lower():
-                    filtered.append(r)
-            self.table.setRowCount(len(filtered))
-            for i, r in enumerate(filtered):
-                id_item = QtWidgets.QTableWidgetItem(str(r.get('id')))
-                date_item = QtWidgets.QTableWidgetItem(r.get('visit_datetime'))
-                fio_item = QtWidgets.QTableWidgetItem(r.get('patient_fio') or '')
-                case_item = QtWidgets.QTableWidgetItem(str(r.get('full_epicrisis') or ''))
-                self.table.setItem(i,0,id_item)
-                self.table.setItem(i,1,date_item)
-                self.table.setItem(i,2,fio_item)
-                self.table.setItem(i,3,case_item)
-            try:
-                self.table.hideColumn(0)
-            except Exception:
-                pass
+            q = self.search_edit.text().strip()
+
+            def fetch(offset, limit):
+                if q:
+                    rows = search_visits(q, start, end, limit=limit, offset=offset)
+                else:
+                    rows = list_visits_between(start, end, brief=True, limit=limit, offset=offset)
+                for r in rows:
+                    r['case_text'] = r.get('snippet') or ' '.join(x for x in (r.get('mkb_code'), r.get('diagnosis')) if x)
+                return rows
+
+            self.model.set_source(fetch)
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить данные: {e}')
 
     def on_double(self, index):
+        vid = self.model.visit_id(index.row())
+        if vid is None:
+            return
+        db_executor().submit(get_visit_by_id, vid, key='database_open_visit', on_done=self.show_visit,
+                             on_error=lambda e: QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось открыть кейс: {e}'))
+
+    def show_visit(self, visit):
         try:
-            row = index.row()
-            id_item = self.table.item(row,0)
-            if not id_item:
-                return
-            vid = int(id_item.text())
-            visit = get_visit_by_id(vid)
             if not visit:
                 QtWidgets.QMessageBox.warning(self, 'Ошибка', 'Кейс не найден')
                 return
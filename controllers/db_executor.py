@@ -0,0 +1,138 @@
+from PyQt5 import QtCore
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+import perf
+
+
+class QueryTask(QtCore.QObject):
+    """Future for one background DB call; callbacks and signals fire on the GUI thread."""
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(object)
+    _completed = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, fn, args, kwargs, parent=None):
+        super().__init__(parent)
+        self._fn, self._args, self._kwargs = fn, args, kwargs
+        self._cancelled = False
+        self._done = False
+        self._result = None
+        self._error = None
+        self._submitted = time.perf_counter()
+        # emitted from the pool thread, delivered queued to this object's (GUI) thread
+        self._completed.connect(self._deliver)
+
+    def cancel(self):
+        """Drop the task: skipped if not started yet, its result is discarded otherwise."""
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self):
+        if self._cancelled:
+            self._completed.emit(None, None)
+            return
+        if perf.enabled:
+            # time spent queued behind other tasks of the pool
+            perf.record('executor.wait', (time.perf_counter() - self._submitted) * 1000,
+                        task=getattr(self._fn, '__name__', type(self._fn).__name__))
+        try:
+            res = self._fn(*self._args, **self._kwargs)
+        except Exception as e:
+            self._completed.emit(None, e)
+        else:
+            self._completed.emit(res, None)
+
+    def _deliver(self, result, error):
+        self._done = True
+        self._result, self._error = result, error
+        if not self._cancelled:
+            if error is None:
+                self.finished.emit(result)
+            else:
+                self.failed.emit(error)
+        self.deleteLater()
+
+
+class DbExecutor(QtCore.QObject):
+    """Runs models.db calls on a small thread pool so the GUI thread never waits on SQLite.
+
+    The pool threads are ordinary Python threads that live as long as the executor,
+    so each keeps its models.db connection between tasks (QThreadPool workers lose
+    their Python thread state, and with it the thread-local connection, after every
+    task). Tasks submitted with a ``key`` supersede the previous task with the same
+    key, e.g. the autocomplete query of the previous keystroke. Tasks submitted with
+    ``serial=True`` run one at a time in submission order on a thread of their own
+    (the draft journal: an autosave must not overtake the clearing that follows it).
+    """
+    MAX_THREADS = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(self.MAX_THREADS, thread_name_prefix='db-executor')
+        self.serial_pool = ThreadPoolExecutor(1, thread_name_prefix='db-serial')
+        self._latest = {}
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, serial=False, **kwargs) -> QueryTask:
+        task = QueryTask(fn, args, kwargs, self)
+        if key is not None:
+            prev = self._latest.get(key)
+            if prev is not None:
+                prev.cancel()
+            self._latest[key] = task
+            task.destroyed.connect(lambda *_, k=key, t=task: self._forget(k, t))
+        if on_done is not None:
+            task.finished.connect(on_done)
+        if on_error is not None:
+            task.failed.connect(on_error)
+        future = (self.serial_pool if serial else self.pool).submit(task._run)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return task
+
+    def cancel(self, key):
+        task = self._latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def wait(self, msecs=-1):
+        """Block until the submitted tasks have run (results are still delivered by the event loop)."""
+        with self._pending_lock:
+            pending = list(self._pending)
+        done, not_done = futures_wait(pending, None if msecs < 0 else msecs / 1000)
+        return not not_done
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+        self.serial_pool.shutdown(wait=True)
+
+    def _finished(self, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def _forget(self, key, task):
+        if self._latest.get(key) is task:
+            del self._latest[key]
+
+
+_executor = None
+
+
+def db_executor() -> DbExecutor:
+    """Shared executor for all windows (created on first use, in the GUI thread)."""
+    global _executor
+    if _executor is None:
+        _executor = DbExecutor()
+    return _executor
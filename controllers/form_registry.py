@@ -0,0 +1,126 @@
+from PyQt5 import QtWidgets, QtCore
+# bump models.epicrisis.FORM_VERSION when the set or meaning of persisted fields changes
+from models.epicrisis import FORM_VERSION, PERSISTED_FIELDS, VERSION_KEY
+
+
+# Widget types whose value is part of the case, in isinstance order (QTextBrowser is a QTextEdit).
+FIELD_TYPES = (QtWidgets.QLineEdit, QtWidgets.QTextEdit, QtWidgets.QComboBox, QtWidgets.QDateEdit,
+               QtWidgets.QCheckBox, QtWidgets.QRadioButton, QtWidgets.QSlider)
+
+# Value of a field that is left out of the stored epicrisis (see models.db.encode_epicrisis).
+EMPTY = {'text': '', 'choice': '', 'flag': False}
+
+# visits table column -> form field it is taken from
+VISIT_COLUMNS = {
+    'vid_priema': 'vidpriema',
+    'obschsost': 'obschsost',
+    'soznanie': 'soznanie',
+    'diagnosis': 'dspole',
+    'mkb_code': 'mkb10list',
+    'outcome': 'ishod',
+    'evacuation_place': 'stacionarname',
+}
+
+
+class FieldBinding:
+    """One form field: typed getter/setter, change signal and the epicrisis group it belongs to."""
+    __slots__ = ('name', 'widget', 'kind', 'get', 'set', 'changed', 'group', 'label')
+
+    def __init__(self, name, widget, group):
+        self.name = name
+        self.widget = widget
+        self.group = group
+        w = widget
+        if isinstance(w, QtWidgets.QLineEdit):
+            self.kind, self.get, self.set, self.changed = 'text', w.text, lambda v: w.setText(str(v)), w.textChanged
+        elif isinstance(w, QtWidgets.QTextEdit):
+            self.kind, self.get, self.set, self.changed = 'text', w.toPlainText, lambda v: w.setPlainText(str(v)), w.textChanged
+        elif isinstance(w, QtWidgets.QComboBox):
+            self.kind, self.get, self.set, self.changed = 'choice', w.currentText, lambda v: _set_combo(w, v), w.currentTextChanged
+        elif isinstance(w, QtWidgets.QDateEdit):
+            self.kind, self.get, self.changed = 'date', lambda: w.date().toString('yyyy-MM-dd'), w.dateChanged
+            self.set = lambda v: w.setDate(QtCore.QDate.fromString(str(v), 'yyyy-MM-dd'))
+        elif isinstance(w, (QtWidgets.QCheckBox, QtWidgets.QRadioButton)):
+            self.kind, self.get, self.set, self.changed = 'flag', w.isChecked, lambda v: w.setChecked(bool(v)), w.toggled
+        elif isinstance(w, QtWidgets.QSlider):
+            self.kind, self.get, self.set, self.changed = 'number', w.value, lambda v: w.setValue(int(v)), w.valueChanged
+        else:
+            raise TypeError(f'unsupported form widget {name}')
+        # checkboxes and radio buttons carry their own caption
+        self.label = w.text() if self.kind == 'flag' else None
+
+
+def _set_combo(w, v):
+    idx = w.findText(str(v))
+    if idx >= 0:
+        w.setCurrentIndex(idx)
+    elif w.isEditable():
+        w.setCurrentText(str(v))
+
+
+def _group_of(w):
+    p = w.parentWidget()
+    while p is not None:
+        if isinstance(p, QtWidgets.QGroupBox):
+            return p.title() or p.objectName()
+        p = p.parentWidget()
+    return None
+
+
+class FormRegistry:
+    """Field bindings of a designer form, built once when the window is constructed.
+
+    Only the widgets listed in PERSISTED_FIELDS for FORM_VERSION are bound; listed
+    names not found in the form are kept in ``missing``. ``fields`` keeps the .ui order; ``groups`` maps each QGroupBox title to the names
+    of the fields inside it. values()/apply() are plain loops over prebuilt getters
+    and setters, without findChildren or isinstance per call.
+    """
+
+    def __init__(self, root):
+        declared = PERSISTED_FIELDS[FORM_VERSION]
+        wanted = set(declared)
+        self.fields = {}
+        for w in root.findChildren(FIELD_TYPES):
+            name = w.objectName()
+            if name in wanted and name not in self.fields:
+                self.fields[name] = FieldBinding(name, w, _group_of(w))
+        self.missing = [name for name in declared if name not in self.fields]
+        self.groups = {}
+        for b in self.fields.values():
+            self.groups.setdefault(b.group, []).append(b.name)
+
+    def values(self, names=None):
+        """{name: value} of all persisted fields (or of ``names``), tagged with FORM_VERSION."""
+        fields = self.fields
+        if names is None:
+            out = {name: b.get() for name, b in fields.items()}
+            out[VERSION_KEY] = FORM_VERSION
+            return out
+        return {name: fields[name].get() for name in names if name in fields}
+
+    def value(self, name, default=None):
+        b = self.fields.get(name)
+        return b.get() if b is not None else default
+
+    def apply(self, values, reset=False):
+        """Set fields from a saved epicrisis; unknown keys are ignored.
+
+        With ``reset`` the fields missing from ``values`` are emptied, since the stored
+        epicrisis leaves out empty text and unchecked boxes.
+        """
+        fields = self.fields
+        for name, b in fields.items():
+            v = values.get(name)
+            if v is None:
+                if not reset or b.kind not in EMPTY:
+                    continue
+                v = EMPTY[b.kind]
+            try:
+                b.set(v)
+            except Exception:
+                pass
+
+    def connect_changed(self, callback):
+        """callback(name) whenever the user changes a field."""
+        for name, b in self.fields.items():
+            b.changed.connect(lambda *_, n=name: callback(n))
@@ -1,11 +1,15 @@
 from PyQt5 import QtWidgets, QtCore
-import csv
-try:
-    import openpyxl
-    from openpyxl import Workbook
-except Exception:
-    openpyxl = None
+import threading
 from models.db import list_visits_between
+from models import export
+from controllers.visits_model import VisitsTableModel
+from controllers.db_executor import db_executor
+import perf
+
+class _ExportSignals(QtCore.QObject):
+    # emitted from the executor thread, delivered to the progress dialog on the GUI thread
+    progress = QtCore.pyqtSignal(int, int)
+
 
 class HistoryController(QtWidgets.QMainWindow):
     def __init__(self, parent=None):
@@ -29,64 +33,91 @@ class HistoryController(QtWidgets.QMainWindow):
         top.addWidget(self.btn_apply)
         top.addWidget(self.btn_export)
         lay.addLayout(top)
-        self.table = QtWidgets.QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(['id','ДатаВремя','ФИО','МКБ'])
+        self.model = VisitsTableModel([('id','id'), ('visit_datetime','ДатаВремя'), ('patient_fio','ФИО'), ('mkb_code','МКБ')], self, executor=db_executor())
+        self.model.load_failed.connect(self.on_load_failed)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
         self.table.hideColumn(0)
         lay.addWidget(self.table)
         self.btn_apply.clicked.connect(self.on_apply)
         self.btn_export.clicked.connect(self.on_export)
-        self.on_apply()
+        # the first query runs when the window is shown, not when it is built
+        self._loaded = False
+        self._period = None
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._loaded:
+            self._loaded = True
+            self.on_apply()
 
+    @perf.timed('ui.on_apply')
     def on_apply(self):
         start = self.date_from.date().toString('yyyy-MM-dd') + ' 00:00:00'
         end = self.date_to.date().toString('yyyy-MM-dd') + ' 23:59:59'
-        rows = list_visits_between(start, end)
-        self.table.setRowCount(len(rows))
-        for i, r in enumerate(rows):
-            id_item = QtWidgets.QTableWidgetItem(str(r.get('id')))
-            dt_item = QtWidgets.QTableWidgetItem(r.get('visit_datetime') or '')
-            fio_item = QtWidgets.QTableWidgetItem(r.get('patient_fio') or '')
-            mkb_item = QtWidgets.QTableWidgetItem(r.get('mkb_code') or '')
-            self.table.setItem(i,0,id_item)
-            self.table.setItem(i,1,dt_item)
-            self.table.setItem(i,2,fio_item)
-            self.table.setItem(i,3,mkb_item)
-        try:
-            self.table.hideColumn(0)
-        except Exception:
-            pass
+        self._period = (start, end)
+        self.model.set_source(lambda offset, limit: list_visits_between(start, end, brief=True, limit=limit, offset=offset))
 
+    def on_load_failed(self, error):
+        QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить данные: {error}')
+
+    @perf.timed('ui.on_export')
     def on_export(self):
-        n = self.table.rowCount()
-        if n == 0:
+        if self.model.rowCount() == 0:
             QtWidgets.QMessageBox.information(self, 'Экспорт', 'Нет данных для экспорта')
             return
-        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Сохранить в Excel', '', 'Excel Files (*.xlsx);;CSV Files (*.csv)')
+        filters = 'Excel Files (*.xlsx);;CSV Files (*.csv)' if export.Workbook else 'CSV Files (*.csv)'
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Сохранить в Excel', '', filters)
         if not path:
             return
-        if path.lower().endswith('.xlsx') and openpyxl:
-            wb = Workbook()
-            ws = wb.active
-            ws.append(['id','ДатаВремя','ФИО','МКБ'])
-            for i in range(n):
-                row = [self.table.item(i,0).text() if self.table.item(i,0) else '',
-                       self.table.item(i,1).text() if self.table.item(i,1) else '',
-                       self.table.item(i,2).text() if self.table.item(i,2) else '',
-                       self.table.item(i,3).text() if self.table.item(i,3) else '']
-                ws.append(row)
-            wb.save(path)
-            QtWidgets.QMessageBox.information(self, 'Экспорт', f'Экспорт выполнен: {path}')
-        else:
-            if not path.lower().endswith('.csv'):
-                path = path + '.csv'
-            with open(path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['id','ДатаВремя','ФИО','МКБ'])
-                for i in range(n):
-                    row = [self.table.item(i,0).text() if self.table.item(i,0) else '',
-                           self.table.item(i,1).text() if self.table.item(i,1) else '',
-                           self.table.item(i,2).text() if self.table.item(i,2) else '',
-                           self.table.item(i,3).text() if self.table.item(i,3) else '']
-                    writer.writerow(row)
-            QtWidgets.QMessageBox.information(self, 'Экспорт', f'Экспорт выполнен: {path}')
+        db_executor().submit(export.epicrisis_fields, key='history_export_fields',
+                             on_done=lambda fields: self._start_export(path, fields),
+                             on_error=lambda e: self._start_export(path, []))
+
+    def choose_export_columns(self, epicrisis_fields):
+        """Checkable list of visit columns and epicrisis fields; returns the chosen keys or None."""
+        dlg = QtWidgets.QDialog(self)
+        dlg.setWindowTitle('Столбцы для экспорта')
+        lay = QtWidgets.QVBoxLayout(dlg)
+        lst = QtWidgets.QListWidget(dlg)
+        keys = list(export.COLUMNS) + [export.EPICRISIS_PREFIX + f for f in epicrisis_fields]
+        for key in keys:
+            item = QtWidgets.QListWidgetItem(export.header(key), lst)
+            item.setData(QtCore.Qt.UserRole, key)
+            item.setCheckState(QtCore.Qt.Checked if key in export.DEFAULT_COLUMNS else QtCore.Qt.Unchecked)
+        lay.addWidget(lst)
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, parent=dlg)
+        btns.accepted.connect(dlg.accept)
+        btns.rejected.connect(dlg.reject)
+        lay.addWidget(btns)
+        dlg.resize(400, 500)
+        if dlg.exec_() != QtWidgets.QDialog.Accepted:
+            return None
+        return [lst.item(i).data(QtCore.Qt.UserRole) for i in range(lst.count())
+                if lst.item(i).checkState() == QtCore.Qt.Checked] or None
+
+    def _start_export(self, path, epicrisis_fields):
+        columns = self.choose_export_columns(epicrisis_fields)
+        if not columns:
+            return
+        cancel = threading.Event()
+        dlg = QtWidgets.QProgressDialog('Экспорт...', 'Отмена', 0, 0, self)
+        dlg.setWindowTitle('Экспорт')
+        dlg.setWindowModality(QtCore.Qt.WindowModal)
+        dlg.canceled.connect(cancel.set)
+        signals = _ExportSignals(dlg)
+        signals.progress.connect(lambda done, total: (dlg.setMaximum(total), dlg.setValue(done)))
+        dlg.show()
+
+        def finished(p):
+            dlg.reset()
+            QtWidgets.QMessageBox.information(self, 'Экспорт', f'Экспорт выполнен: {p}')
+
+        def failed(e):
+            dlg.reset()
+            if not isinstance(e, export.ExportCancelled):
+                QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось выполнить экспорт: {e}')
+
+        db_executor().submit(export.export_visits, path, *self._period, columns=columns,
+                             progress=signals.progress.emit, cancelled=cancel.is_set,
+                             on_done=finished, on_error=failed)
@@ -1,24 +1,26 @@
-from PyQt5 import uic, QtWidgets, QtCore, QtGui
-import os, json, datetime
-from config import UI_DIR
-from models.db import save_patient, init_db, save_visit, list_patients_like, list_visits_for_date, get_visit_by_id
+from PyQt5 import QtWidgets, QtCore
+import datetime, time
+from controllers.ui_loader import load_ui
+from models.db import save_case, list_patients_like, list_visits_for_date, get_visit_by_id, load_fio_index
+from models.fio_index import get_index as get_fio_index
+from models.mkb import get_index as get_mkb_index
+from models.stats import day_summary
+from models.drafts import append_draft, load_draft, clear_drafts
+from models.epicrisis import render as render_epicrisis, render_visit
 from settings_store import load_settings, get_current_user
+from controllers.visits_model import VisitsTableModel
+from controllers.db_executor import db_executor
+import perf
+from controllers.form_registry import FormRegistry, VISIT_COLUMNS
 
 class MainWindowController(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
-        ui_path = os.path.join(UI_DIR, "mainwindow.ui")
         try:
-            uic.loadUi(ui_path, self)
+            load_ui("mainwindow.ui", self)
         except Exception as e:
             print('Ошибка загрузки mainwindow.ui:', e)
 
-        # Auto init DB if missing
-        try:
-            init_db()
-        except Exception as e:
-            print('init_db error', e)
-
         self.app_settings = load_settings()
 
         # Connect menu actions
@@ -45,25 +47,62 @@ class MainWindowController(QtWidgets.QMainWindow):
 
         # Autocomplete for patientfio
         if hasattr(self, 'patientfio'):
-            completer = QtWidgets.QCompleter([], self)
+            # one persistent model; the index already did the matching, so the completer must not re-filter
+            self.fio_model = QtCore.QStringListModel(self)
+            completer = QtWidgets.QCompleter(self.fio_model, self)
             completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+            completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
             self.patientfio.setCompleter(completer)
             self.patientfio.textEdited.connect(self.on_patientfio_edited)
+            db_executor().submit(load_fio_index, on_error=lambda e: print('load_fio_index error', e))
+
+        # МКБ-10 completer: the combo is free text, suggestions come from the classifier index
+        if hasattr(self, 'mkb10list'):
+            self.mkb10list.setEditable(True)
+            self.mkb10list.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+            self.mkb_model = QtCore.QStringListModel(self)
+            mkb_completer = QtWidgets.QCompleter(self.mkb_model, self)
+            mkb_completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+            mkb_completer.activated[str].connect(self.on_mkb_chosen)
+            self.mkb10list.setCompleter(mkb_completer)
+            self.mkb10list.lineEdit().textEdited.connect(self.on_mkb_edited)
+            db_executor().submit(lambda: get_mkb_index().load(), on_error=lambda e: print('mkb index error', e))
+
+        # Field bindings are resolved once; saving, restoring and autosave go through them
+        self.form = FormRegistry(self)
+        if self.form.missing:
+            # a case without some of its fields would be stored incomplete: the window
+            # opens for viewing, saving and autosave stay off
+            print('Поля формы не найдены:', ', '.join(self.form.missing))
+            QtCore.QTimer.singleShot(0, lambda: QtWidgets.QMessageBox.critical(
+                self, 'Ошибка', 'Форма приёма повреждена: не найдено полей - '
+                f'{len(self.form.missing)}. Сохранение кейсов отключено.'))
+
+        # Draft autosave: widgets report their own changes, autosave() writes only those
+        self._dirty = set()
+        self._tracking = True
+        self._autosave_timer = QtCore.QTimer(self)
+        self._autosave_timer.timeout.connect(self.autosave)
+        self.form.connect_changed(self._mark_dirty)
 
         # Fill comboboxes from settings
         self.apply_settings_to_ui(self.app_settings)
+        self._set_save_enabled(True)
 
         # patientlist table
         if hasattr(self, 'patientlist'):
+            self.patientlist_model = VisitsTableModel([('id','id'), ('visit_datetime','Время'), ('patient_fio','Пациент'), ('mkb_code','МКБ')], self)
             try:
-                self.patientlist.setColumnCount(4)
-                self.patientlist.setHorizontalHeaderLabels(['id','Время','Пациент','МКБ'])
+                self.patientlist.setModel(self.patientlist_model)
                 self.patientlist.hideColumn(0)
             except Exception:
                 pass
             self.patientlist.doubleClicked.connect(self.on_patientlist_doubleclick)
             self.load_today_visits()
 
+        # Offer to restore the draft left by a crash
+        db_executor().submit(load_draft, on_done=self.offer_draft_restore, on_error=lambda e: print('load_draft error', e))
+
         # LCD show hours:minutes
         if hasattr(self, 'LCDtimedate'):
             self._timer_clock = QtCore.QTimer(self)
@@ -76,7 +115,7 @@ class MainWindowController(QtWidgets.QMainWindow):
         try:
             if theme_name == 'dark':
                 # Simple built-in dark theme
-                self.setStyleSheet("QWidget{background:#2b2b2b;color:#e6e6e6;} QLineEdit{background:#3c3c3c;} QTableWidget{background:#3c3c3c;}")
+                self.setStyleSheet("QWidget{background:#2b2b2b;color:#e6e6e6;} QLineEdit{background:#3c3c3c;} QTableView{background:#3c3c3c;}")
             else:
                 self.setStyleSheet("")
         except Exception:
@@ -85,6 +124,8 @@ class MainWindowController(QtWidgets.QMainWindow):
     
     def apply_settings_to_ui(self, settings):
         """Применяет настройки приложения к интерфейсу главного окна."""
+        # refilling the combos is not a user edit of the case
+        self._tracking = False
         try:
             # Применяем тему
             try:
@@ -124,8 +165,44 @@ class MainWindowController(QtWidgets.QMainWindow):
             except Exception:
                 pass
 
+            self.configure_autosave(settings)
+
         except Exception as e:
             print('Ошибка применения настроек:', e)
+        finally:
+            self._tracking = True
+
+    def configure_autosave(self, settings):
+        interval = int(settings.get('autosave_interval') or 0)
+        if settings.get('autosave_on', True) and interval > 0 and not self.form.missing:
+            self._autosave_timer.start(interval * 1000)
+        else:
+            self._autosave_timer.stop()
+
+    def _mark_dirty(self, name):
+        if self._tracking:
+            self._dirty.add(name)
+
+    def autosave(self):
+        """Append the fields changed since the last autosave to the draft journal (in the background)."""
+        if not self._dirty:
+            return
+        fields = self.form.values(self._dirty)
+        self._dirty.clear()
+        db_executor().submit(append_draft, fields, time.time_ns(), serial=True, on_error=lambda e: print('autosave error', e))
+
+    def offer_draft_restore(self, draft):
+        if not draft:
+            return
+        fio = draft.get('patientfio')
+        text = f'Найден несохранённый кейс ({fio}). Восстановить?' if fio else 'Найден несохранённый кейс. Восстановить?'
+        answer = QtWidgets.QMessageBox.question(self, 'Восстановление', text, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        if answer == QtWidgets.QMessageBox.Yes:
+            self.open_visit_in_ui({'full_epicrisis': draft}, partial=True)
+            # restored values are still unsaved: keep them in the journal
+            self._dirty.update(draft)
+        else:
+            db_executor().submit(clear_drafts, serial=True)
 
 
     def update_clock(self):
@@ -136,319 +213,171 @@ class MainWindowController(QtWidgets.QMainWindow):
             pass
 
     def on_patientfio_edited(self, text):
+        index = get_fio_index()
+        if index.loaded:
+            self._set_fio_suggestions(index.search(text, limit=50))
+        else:
+            # index still loading: fall back to the database, each keystroke supersedes the previous lookup
+            db_executor().submit(list_patients_like, text, limit=50, key='fio_autocomplete', on_done=self._set_fio_suggestions)
+
+    def _set_fio_suggestions(self, suggestions):
         try:
-            suggestions = list_patients_like(text, limit=50)
-            model = QtCore.QStringListModel(suggestions, self)
-            self.patientfio.completer().setModel(model)
+            self.fio_model.setStringList(suggestions)
+            if suggestions:
+                self.patientfio.completer().complete()
+            else:
+                self.patientfio.completer().popup().hide()
         except Exception:
             pass
 
-    def collect_patient_from_form(self) -> dict:
-        def get_value(w):
-            try:
-                if isinstance(w, QtWidgets.QLineEdit):
-                    return w.text()
-                if isinstance(w, QtWidgets.QTextEdit):
-                    return w.toPlainText()
-                if isinstance(w, QtWidgets.QComboBox):
-                    return w.currentText()
-                if isinstance(w, QtWidgets.QDateEdit):
-                    return w.date().toString('yyyy-MM-dd')
-                if isinstance(w, QtWidgets.QCheckBox):
-                    return w.isChecked()
-            except Exception:
-                pass
-            return None
+    def on_mkb_edited(self, text):
+        index = get_mkb_index()
+        results = index.search(text, limit=50) if index.loaded else []
+        self.mkb_model.setStringList([f'{code}  {title}' for code, title, _ in results])
+        completer = self.mkb10list.completer()
+        if results:
+            completer.complete()
+        else:
+            completer.popup().hide()
+
+    def on_mkb_chosen(self, text):
+        # keep only the code in the field; the title goes to the diagnosis if that is still empty
+        code, _, title = text.partition('  ')
+        QtCore.QTimer.singleShot(0, lambda: self.mkb10list.setEditText(code))
+        if title and hasattr(self, 'dspole') and not self.dspole.toPlainText().strip():
+            self.dspole.setPlainText(title)
 
+    def collect_patient_from_form(self) -> dict:
+        form = self.form
+        full = form.values()
         patient = {
-            'fio': getattr(self, 'patientfio').text() if hasattr(self, 'patientfio') else '',
-            'birthdate': getattr(self, 'patientdate').date().toString('yyyy-MM-dd') if hasattr(self, 'patientdate') else None,
-            'phone': getattr(self, 'phone_pole').text() if hasattr(self, 'phone_pole') else '',
-            'organisation': getattr(self, 'organisation').currentText() if hasattr(self, 'organisation') else ''
+            'fio': full.get('patientfio', ''),
+            'birthdate': full.get('patientdate'),
+            'phone': full.get('phone_pole', ''),
+            'organisation': full.get('organisation', ''),
+            'full_epicrisis': full,
         }
-
-        full = {}
-        for w in self.findChildren((QtWidgets.QLineEdit, QtWidgets.QTextEdit, QtWidgets.QComboBox, QtWidgets.QDateEdit, QtWidgets.QCheckBox)):
-            try:
-                name = w.objectName()
-                full[name] = get_value(w)
-            except Exception:
-                pass
-
-        patient['full_epicrisis'] = full
         return patient
 
     def on_save_clicked(self):
         self.on_closecase()
 
+    def _set_save_enabled(self, enabled):
+        enabled = enabled and not self.form.missing
+        for name in ('closecase', 'savesession'):
+            if hasattr(self, name):
+                getattr(self, name).setEnabled(enabled)
+
+    @perf.timed('ui.on_closecase')
     def on_closecase(self):
+        if self.form.missing:
+            return
         try:
             patient = self.collect_patient_from_form()
             # require FIO
             if not patient.get('fio') or not str(patient.get('fio')).strip():
                 QtWidgets.QMessageBox.warning(self, 'Ошибка', 'Введите ФИО пациента перед сохранением.')
                 return
-            pid = save_patient(patient)
-            visit_datetime = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            diagnosis = ''
-            mkb_code = ''
-            outcome = ''
-            evacuation_place = ''
-            try:
-                if hasattr(self, 'diagnosis'):
-                    diagnosis = self.diagnosis.text()
-                if hasattr(self, 'mkb10list'):
-                    mkb_code = self.mkb10list.currentText() if isinstance(self.mkb10list, QtWidgets.QComboBox) else ''
-                if hasattr(self, 'outcome'):
-                    outcome = self.outcome.currentText() if isinstance(self.outcome, QtWidgets.QComboBox) else ''
-                if hasattr(self, 'evacuation'):
-                    evacuation_place = self.evacuation.text() if hasattr(self, 'evacuation') else ''
-            except Exception:
-                pass
-            vid = save_visit(pid, visit_datetime, getattr(self, 'vidpriema').currentText() if hasattr(self,'vidpriema') else '',
-                             getattr(self, 'obschsost').currentText() if hasattr(self,'obschsost') else '',
-                             getattr(self, 'soznanie').currentText() if hasattr(self,'soznanie') else '',
-                             get_current_user() or (getattr(self, 'profession').text() if hasattr(self, 'profession') else ''),
-                             diagnosis, mkb_code, outcome, evacuation_place, patient['full_epicrisis'])
-            QtWidgets.QMessageBox.information(self, 'Сохранено', f'Кейс сохранён (id={vid})')
-            try:
-                self.load_today_visits()
-            except Exception:
-                pass
+            full = patient['full_epicrisis']
+            visit = {col: full.get(name, '') for col, name in VISIT_COLUMNS.items()}
+            visit['visit_datetime'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            visit['examiner'] = get_current_user() or self.form.value('profession', '')
+            visit['full_epicrisis'] = full
+            # journal entries up to this seq are covered by the save; edits made while it runs
+            # are autosaved with a later seq and stay in the journal
+            seq = time.time_ns()
+            saved_fields = set(self._dirty) | set(full)
+            self._dirty.clear()
+            # one save at a time: a second click while this one runs would store the case twice
+            self._set_save_enabled(False)
+            # form values are read above on the GUI thread; only the DB writes run in the background
+            db_executor().submit(save_case, patient, visit, on_done=lambda ids: self._on_case_saved(ids, seq, patient['fio']),
+                                 on_error=lambda e: self._on_case_save_failed(e, saved_fields))
         except Exception as e:
+            self._set_save_enabled(True)
             QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось сохранить кейс: {e}')
 
-    def load_today_visits(self):
+    def _on_case_save_failed(self, error, fields):
+        # nothing was saved: the fields go back to the next autosave
+        self._dirty.update(fields)
+        self._set_save_enabled(True)
+        QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось сохранить кейс: {error}')
+
+    def _on_case_saved(self, ids, seq=None, fio=None):
+        pid, vid = ids
+        self._set_save_enabled(True)
+        # the name goes into the autocomplete only now that the case is committed (a save that
+        # fails and rolls back must not leave a patient behind; with the DB service the save ran elsewhere)
+        index = get_fio_index()
+        if fio and index.loaded:
+            index.add(fio)
+        # the case is in the database now, the draft entries it covers are no longer needed
+        db_executor().submit(clear_drafts, up_to_seq=seq, serial=True, on_error=lambda e: print('clear_drafts error', e))
+        QtWidgets.QMessageBox.information(self, 'Сохранено', f'Кейс сохранён (id={vid})')
         try:
-            today = __import__('datetime').date.today().isoformat()
-            rows = list_visits_for_date(today)
-            try:
-                self.patientlist.setColumnCount(4)
-                self.patientlist.setHorizontalHeaderLabels(['id','Время','Пациент','МКБ'])
-            except Exception:
-                pass
-            self.patientlist.setRowCount(len(rows))
-            for i, r in enumerate(rows):
-                id_item = QtWidgets.QTableWidgetItem(str(r.get('id')))
-                time_item = QtWidgets.QTableWidgetItem(str(r.get('visit_datetime')))
-                fio_item = QtWidgets.QTableWidgetItem(r.get('patient_fio') or '')
-                mkb_item = QtWidgets.QTableWidgetItem(r.get('mkb_code') or '')
-                try:
-                    self.patientlist.setItem(i,0,id_item)
-                    self.patientlist.setItem(i,1,time_item)
-                    self.patientlist.setItem(i,2,fio_item)
-                    self.patientlist.setItem(i,3,mkb_item)
-                except Exception:
-                    pass
-            try:
-                self.patientlist.hideColumn(0)
-            except Exception:
-                pass
-        except Exception as e:
-            print('load_today_visits error', e)
-
-    def on_patientlist_doubleclick(self, index):
-        try:
-            row = index.row()
-            id_item = self.patientlist.item(row, 0)
-            if not id_item:
-                return
-            vid = int(id_item.text())
-            visit = get_visit_by_id(vid)
-            if not visit:
-                QtWidgets.QMessageBox.warning(self, 'Ошибка', 'Кейс не найден')
-                return
-            self.open_visit_in_ui(visit)
-        except Exception as e:
-            print('on_patientlist_doubleclick error', e)
+            self.load_today_visits()
+        except Exception:
+            pass
 
-    def open_visit_in_ui(self, visit):
-        fc = visit.get('full_epicrisis', {}) or {}
-        for k, v in fc.items():
-            if hasattr(self, k):
-                w = getattr(self, k)
-                try:
-                    if isinstance(w, QtWidgets.QLineEdit):
-                        w.setText(str(v))
-                    elif isinstance(w, QtWidgets.QTextEdit):
-                        w.setPlainText(str(v))
-                    elif isinstance(w, QtWidgets.QComboBox):
-                        idx = w.findText(str(v))
-                        if idx>=0:
-                            w.setCurrentIndex(idx)
-                        else:
-                            try:
-                                w.setCurrentText(str(v))
-                            except Exception:
-                                pass
-                    elif isinstance(w, QtWidgets.QDateEdit):
-                        try:
-                            dt = QtCore.QDate.fromString(str(v), 'yyyy-MM-dd')
-                            w.setDate(dt)
-                        except Exception:
-                            pass
-                    elif isinstance(w, QtWidgets.QCheckBox):
-                        try:
-                            w.setChecked(bool(v))
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
+    def load_today_visits(self):
+        today = datetime.date.today().isoformat()
+        db_executor().submit(list_visits_for_date, today, key='today_visits', on_done=self.patientlist_model.set_rows,
+                             on_error=lambda e: print('load_today_visits error', e))
+        db_executor().submit(day_summary, today, key='today_summary', on_done=self.show_today_summary,
+                             on_error=lambda e: print('day_summary error', e))
+
+    def show_today_summary(self, summary):
+        total = summary.get('total', {}).get('', 0)
+        parts = [f'Сегодня обращений: {total}']
+        outcomes = summary.get('outcome', {})
+        if outcomes:
+            parts.append(', '.join(f'{k or "—"}: {v}' for k, v in sorted(outcomes.items(), key=lambda kv: -kv[1])))
+        self.statusBar().showMessage('  |  '.join(parts))
 
-def show_epikriz(self, visit=None):
-    """
-    GPT: улучшенная логика формирования эпикриза.
-    - Показываются ТОЛЬКО выбранные чекбоксы (True).
-    - Используются читаемые подписи (label_map) если доступны, иначе генерируются из objectName.
-    - Поля группируются по секциям (group_map), с дефолтными группами для медицины.
-    - Чистый формат вывода.
-    """
-    from PyQt5 import QtCore, QtWidgets
-    import datetime, re
-
-    # Получаем данные
-    if isinstance(visit, bool):
-        visit = None
-
-    if visit is None:
-        patient = self.collect_patient_from_form()
-        fc = patient.get('full_epicrisis', {}) or {}
-        header = f"Пациент: {patient.get('fio') or ''}\\nДата: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\\n\\n"
-    else:
+    def on_patientlist_doubleclick(self, index):
+        vid = self.patientlist_model.visit_id(index.row())
+        if vid is None:
+            return
+        db_executor().submit(get_visit_by_id, vid, key='open_visit', on_done=self._on_visit_loaded,
+                             on_error=lambda e: print('on_patientlist_doubleclick error', e))
+
+    def _on_visit_loaded(self, visit):
+        if not visit:
+            QtWidgets.QMessageBox.warning(self, 'Ошибка', 'Кейс не найден')
+            return
+        self.open_visit_in_ui(visit)
+
+    def open_visit_in_ui(self, visit, partial=False):
         fc = visit.get('full_epicrisis', {}) or {}
-        header = f"Пациент: {visit.get('patient_fio') or ''}\\nДата: {visit.get('visit_datetime') or ''}\\n\\n"
-
-    lines = [header]
-
-    # Try to get label_map / group_map if present in module globals (generated from UI elsewhere)
-    label_map = globals().get('label_map', {}) or {}
-    group_map = globals().get('group_map', {}) or {}
-
-    # If no explicit label_map, build a human-readable map from fc keys
-    def human_label(name):
-        # common replacements and prettify
-        name = re.sub(r'^(sy|syp|sym|s__?)', '', name, flags=re.IGNORECASE)
-        s = re.sub(r'[_\-]+', ' ', name)
-        # split camelCase
-        s = re.sub('([a-z0-9])([A-Z])', r'\\1 \\2', s)
-        s = s.strip().replace('  ', ' ')
-        return s.capitalize()
-
-    if not label_map:
-        for k in fc.keys():
-            label_map[k] = human_label(k)
-
-    # Define groups (use requested Russian names)
-    default_groups = {
-        "general": "Общее состояние пациента",
-        "skin": "Состояние кожи и слизистых",
-        "respiratory": "Дыхательная система",
-        "cardio": "Сердечно-сосудистая система",
-        "digestive": "Пищеварительная система",
-        "urinary": "Мочевыделительная система",
-        "nervous": "Нервная система",
-        "treatment": "Назначенное лечение",
-    }
-
-    # Heuristic mapping from field name -> group key
-    heur = {
-        "skin": ["skin", "kож", "кож", "sypskin", "rash", "syp"],
-        "respiratory": ["resp", "dysp", "dyspno", "breath", "odush", "дых", "одыш"],
-        "cardio": ["card", "heart", "серд", "пульс", "аритм"],
-        "digestive": ["gastro", "digest", "abdom", "печен", " желуд", "стул", "тошн"],
-        "urinary": ["urin", "почк", "моч", "diur"],
-        "nervous": ["nerv", "neuro", "sozn", "созн", "судор", "голов", "головокруж"],
-        "treatment": ["treat", "ther", "lechenie", "назнач"],
-        "general": ["fio", "age", "weight", "height", "compl", "жалоб", "obschsost"]
-    }
-
-    # If group_map empty, build grouping based on heuristics
-    if not group_map:
-        group_map = {v: [] for v in default_groups.values()}
-        for name in label_map:
-            placed = False
-            lname = name.lower()
-            for gk, keys in heur.items():
-                for key in keys:
-                    if key in lname:
-                        group_map[default_groups[gk]].append((name, label_map.get(name, human_label(name))))
-                        placed = True
-                        break
-                if placed:
-                    break
-            if not placed:
-                # default to general
-                group_map[default_groups["general"]].append((name, label_map.get(name, human_label(name))))
-
-    # Now build lines: only show checkboxes that are True and non-empty other fields
-    for group, items in group_map.items():
-        # skip empty groups
-        if not items:
-            continue
-        lines.append(f"\\n--- {group} ---")
-        for name, display_text in items:
-            v = fc.get(name, None)
-            # Normalize strings that represent booleans
-            if isinstance(v, str):
-                vl = v.strip().lower()
-                if vl in ('false','0','нет','no','none',''):
-                    v = False
-                elif vl in ('true','1','да','yes'):
-                    v = True
-            # Detect checkbox widgets if possible: check stored as bool or 0/1 or 'True'
-            is_checked = False
-            if isinstance(v, bool):
-                is_checked = v
-            elif isinstance(v, (int, float)) and v != 0:
-                is_checked = True
-            elif isinstance(v, str) and v.strip().lower() in ('true','1','да','yes'):
-                is_checked = True
-
-            # Show only checked checkboxes; other fields: show if non-empty
-            if is_checked:
-                # render checked checkbox as simple label "DisplayText"
-                lines.append(f"{display_text}")
-            else:
-                # for non-boolean fields, show if present
-                if v not in (None, '', False):
-                    lines.append(f"{display_text}: {v}")
-
-    text = "\\n".join(lines)
-
-    # Persist and display
-    try:
-        if visit is None:
-            patient['full_epicrisis_text'] = text
-        else:
-            visit['full_epicrisis_text'] = text
-    except Exception:
-        pass
-
-    # Display in UI: try several known widget names
-    try:
-        if hasattr(self, 'ui') and hasattr(self.ui, 'epicriz_output'):
-            self.ui.epicriz_output.setPlainText(text)
+        if not isinstance(fc, dict):
+            fc = {}
+        self._tracking = False
+        try:
+            self.form.apply(fc, reset=not partial)
+        finally:
+            self._tracking = True
+
+    @perf.timed('ui.show_epikriz')
+    def show_epikriz(self, visit=None):
+        """Epicrisis text of the open form (or of a stored visit), shown in a dialog."""
+        if visit:
+            text = render_visit(visit)
         else:
-            w = getattr(self, 'epicriz_output', None) or getattr(self, 'epikriz_output', None)
-            if w is not None and hasattr(w, 'setPlainText'):
-                w.setPlainText(text)
-            else:
-                # Fallback dialog
-                dlg = QtWidgets.QDialog(self)
-                dlg.setWindowTitle('Эпикриз')
-                dlg.resize(800, 600)
-                lay = QtWidgets.QVBoxLayout(dlg)
-                txt = QtWidgets.QTextEdit(dlg)
-                txt.setPlainText(text)
-                txt.setReadOnly(True)
-                lay.addWidget(txt)
-                btns = QtWidgets.QHBoxLayout()
-                btn_close = QtWidgets.QPushButton('Закрыть')
-                btns.addWidget(btn_close)
-                lay.addLayout(btns)
-                btn_close.clicked.connect(dlg.accept)
-                dlg.exec_()
-    except Exception:
-        pass
-
-    return text
+            patient = self.collect_patient_from_form()
+            text = render_epicrisis(patient['full_epicrisis'], patient.get('fio') or '',
+                                    datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        dlg = QtWidgets.QDialog(self)
+        dlg.setWindowTitle('Эпикриз')
+        dlg.resize(800, 600)
+        lay = QtWidgets.QVBoxLayout(dlg)
+        txt = QtWidgets.QTextEdit(dlg)
+        txt.setPlainText(text)
+        txt.setReadOnly(True)
+        lay.addWidget(txt)
+        btns = QtWidgets.QHBoxLayout()
+        btn_close = QtWidgets.QPushButton('Закрыть')
+        btns.addWidget(btn_close)
+        lay.addLayout(btns)
+        btn_close.clicked.connect(dlg.accept)
+        dlg.exec_()
+        return text
@@ -0,0 +1,115 @@
+from PyQt5 import QtWidgets, QtCore
+import perf
+from config import PERF_LOG_FILE
+from controllers.visits_model import VisitsTableModel
+
+OP_COLUMNS = [('op', 'Операция'), ('count', 'Вызовов'), ('total_ms', 'Всего, мс'), ('avg_ms', 'Среднее, мс'),
+              ('p95_ms', 'p95, мс'), ('max_ms', 'Макс, мс')]
+SLOW_COLUMNS = [('ms', 'мс'), ('at', 'Время'), ('op', 'Операция'), ('sql', 'SQL')]
+
+
+def bucket_labels():
+    bounds = perf.BUCKETS
+    labels = [f'< {bounds[0]} мс']
+    labels += [f'{lo}–{hi} мс' for lo, hi in zip(bounds, bounds[1:])]
+    labels.append(f'≥ {bounds[-1]} мс')
+    return labels
+
+def histogram_text(row, width=40):
+    """Text histogram of one operation's timings."""
+    counts = row['buckets']
+    top = max(counts) or 1
+    labels = bucket_labels()
+    pad = max(len(l) for l in labels)
+    lines = [row['op']]
+    for label, n in zip(labels, counts):
+        lines.append(f'{label:>{pad}} | {"█" * round(width * n / top):<{width}} {n}')
+    return '\n'.join(lines)
+
+
+class PerfController(QtWidgets.QMainWindow):
+    """Debug window: per-operation timings, slowest calls and a histogram of the selected operation."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Производительность')
+        self.resize(1000, 650)
+        central = QtWidgets.QWidget(self)
+        self.setCentralWidget(central)
+        lay = QtWidgets.QVBoxLayout(central)
+        top = QtWidgets.QHBoxLayout()
+        self.enabled_box = QtWidgets.QCheckBox('Замер включён')
+        self.enabled_box.setChecked(perf.enabled)
+        self.enabled_box.toggled.connect(self.on_toggle)
+        self.btn_refresh = QtWidgets.QPushButton('Обновить')
+        self.btn_reset = QtWidgets.QPushButton('Сбросить')
+        top.addWidget(self.enabled_box)
+        top.addWidget(QtWidgets.QLabel(f'Журнал: {PERF_LOG_FILE}'))
+        top.addStretch(1)
+        top.addWidget(self.btn_refresh)
+        top.addWidget(self.btn_reset)
+        lay.addLayout(top)
+
+        self.ops_model = VisitsTableModel(OP_COLUMNS, self)
+        self.ops_table = QtWidgets.QTableView()
+        self.ops_table.setModel(self.ops_model)
+        self.ops_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.ops_table.clicked.connect(self.on_op_selected)
+        self.slow_model = VisitsTableModel(SLOW_COLUMNS, self)
+        self.slow_table = QtWidgets.QTableView()
+        self.slow_table.setModel(self.slow_model)
+        self.histogram = QtWidgets.QPlainTextEdit()
+        self.histogram.setReadOnly(True)
+        self.histogram.setStyleSheet('font-family: monospace;')
+
+        tabs = QtWidgets.QTabWidget()
+        tabs.addTab(self.ops_table, 'Операции')
+        tabs.addTab(self.slow_table, 'Самые медленные')
+        split = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        split.addWidget(tabs)
+        split.addWidget(self.histogram)
+        split.setSizes([450, 200])
+        lay.addWidget(split)
+
+        self.btn_refresh.clicked.connect(self.refresh)
+        self.btn_reset.clicked.connect(self.on_reset)
+        self._ops = []
+        self._selected = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start(2000)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        self._ops, slowest = perf.snapshot()
+        self.ops_model.set_rows(self._ops)
+        self.slow_model.set_rows(slowest)
+        if not self._ops:
+            self.histogram.setPlainText('Нет данных. Включите замер и поработайте с программой.' if not perf.enabled else 'Нет данных.')
+            return
+        # the histogram follows the selected operation across refreshes, the busiest one by default
+        row = next((r for r in self._ops if r['op'] == self._selected), self._ops[0])
+        self.histogram.setPlainText(histogram_text(row))
+
+    def on_op_selected(self, index):
+        if 0 <= index.row() < len(self._ops):
+            self._selected = self._ops[index.row()]['op']
+            self.histogram.setPlainText(histogram_text(self._ops[index.row()]))
+
+    def on_toggle(self, checked):
+        if checked:
+            perf.enable()
+        else:
+            perf.disable()
+        self.refresh()
+
+    def on_reset(self):
+        perf.reset()
+        self.refresh()
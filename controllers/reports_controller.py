@@ -1,14 +1,18 @@
-from PyQt5 import uic, QtWidgets
-import os
-from config import UI_DIR
-from models.db import list_visits_between
+from PyQt5 import QtWidgets
+from controllers.ui_loader import load_ui
+from models.reports import REPORT_TYPES, VISITS_COLUMNS, VISITS_TITLE, build_report, visits_page
+from controllers.visits_model import VisitsTableModel
+from controllers.db_executor import db_executor
 import datetime
 
 class ReportsController(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
-        ui_path = os.path.join(UI_DIR, "reports.ui")
-        uic.loadUi(ui_path, self)
+        load_ui("reports.ui", self)
+
+        if hasattr(self, "reporttype"):
+            for key, title in REPORT_TYPES:
+                self.reporttype.addItem(title, key)
 
         if hasattr(self, "createreport"):
             self.createreport.clicked.connect(self.on_create_report)
@@ -21,21 +25,28 @@ class ReportsController(QtWidgets.QMainWindow):
             start = getattr(self, "datereport_s", None).text() if hasattr(self, "datereport_s") else datetime.date.today().isoformat()
             end = getattr(self, "datereport_po", None).text() if hasattr(self, "datereport_po") else datetime.date.today().isoformat()
 
-        rows = list_visits_between(start, end)
-        self.show_results_table(rows)
+        kind = (self.reporttype.currentData() if hasattr(self, "reporttype") else None) or "visits"
+        if kind == "visits":
+            # the list can be the whole period: pages are read as the table is scrolled
+            self.show_results_table(VISITS_TITLE, VISITS_COLUMNS,
+                                    fetch=lambda offset, limit: visits_page(start, end, offset, limit))
+            return
+        db_executor().submit(build_report, kind, start, end, key="reports", on_done=lambda r: self.show_results_table(*r),
+                             on_error=lambda e: QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось построить отчёт: {e}"))
 
-    def show_results_table(self, rows):
+    def show_results_table(self, title, columns, rows=None, fetch=None):
+        """Show report rows, or with ``fetch(offset, limit)`` page them in through the DB executor."""
         dialog = QtWidgets.QDialog(self)
-        dialog.setWindowTitle("Результаты отчёта")
-        table = QtWidgets.QTableWidget(dialog)
-        table.setColumnCount(4)
-        table.setHorizontalHeaderLabels(["Дата", "Пациент", "Организация", "Прочее"])
-        table.setRowCount(len(rows))
-        for i, r in enumerate(rows):
-            table.setItem(i, 0, QtWidgets.QTableWidgetItem(r.get("visit_date", "")))
-            table.setItem(i, 1, QtWidgets.QTableWidgetItem(r.get("patient_fio", "")))
-            table.setItem(i, 2, QtWidgets.QTableWidgetItem(r.get("organisation", "")))
-            table.setItem(i, 3, QtWidgets.QTableWidgetItem(str(r.get("extra", ""))))
+        dialog.setWindowTitle(f"Результаты отчёта: {title}")
+        if fetch is not None:
+            model = VisitsTableModel(columns, dialog, executor=db_executor())
+            model.load_failed.connect(lambda e: QtWidgets.QMessageBox.critical(dialog, "Ошибка", f"Не удалось загрузить данные: {e}"))
+            model.set_source(fetch)
+        else:
+            model = VisitsTableModel(columns, dialog)
+            model.set_rows(rows)
+        table = QtWidgets.QTableView(dialog)
+        table.setModel(model)
         layout = QtWidgets.QVBoxLayout(dialog)
         layout.addWidget(table)
         dialog.resize(800, 400)
@@ -1,16 +1,14 @@
-from PyQt5 import uic, QtWidgets, QtCore
-import os
-from config import UI_DIR
-from settings_store import load_settings, save_settings, add_user
+from PyQt5 import QtWidgets, QtCore
+from controllers.ui_loader import load_ui
+from settings_store import load_settings, save_settings, add_user, batch
 
 class SettingsController(QtWidgets.QMainWindow):
     settings_updated = QtCore.pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
-        ui_path = os.path.join(UI_DIR, "settings.ui")
         try:
-            uic.loadUi(ui_path, self)
+            load_ui("settings.ui", self)
         except Exception as e:
             print("Ошибка загрузки settings.ui:", e)
 
@@ -101,8 +99,13 @@ class SettingsController(QtWidgets.QMainWindow):
                     return
                 # update current user password (or admin)
                 user = self.listvrachadd.currentText() if hasattr(self,'listvrachadd') and self.listvrachadd.currentText() else 'admin'
-                add_user(user, pwd)
-            save_settings(self.app_settings)
+                with batch():
+                    add_user(user, pwd)
+                    # keep the new password hash when saving the rest of the form
+                    self.app_settings['users'] = load_settings().get('users', {})
+                    save_settings(self.app_settings)
+            else:
+                save_settings(self.app_settings)
             # emit signal for other windows to update dynamically
             try:
                 self.settings_updated.emit(self.app_settings)
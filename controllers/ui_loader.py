@@ -0,0 +1,94 @@
+"""Designer forms compiled to Python once instead of parsing the .ui XML on every start.
+
+load_ui(name, widget) behaves like uic.loadUi(os.path.join(UI_DIR, name), widget): the
+named children become attributes of ``widget`` and slots are connected by name. The
+form is compiled with uic.compileUi into ui/compiled/<form>_ui.py, tagged with the
+SHA-1 of the .ui file and the PyQt version, and recompiled only when either changes;
+the generated module is then imported like any other (and gets its own .pyc).
+`python -m controllers.ui_loader` compiles all forms ahead of time (install step).
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import sys
+from PyQt5 import QtCore
+from config import UI_DIR
+
+COMPILED_DIR = os.path.join(UI_DIR, 'compiled')
+_TAG = '# source-sha1: '
+
+_modules = {}
+
+
+def _digest(ui_path):
+    with open(ui_path, 'rb') as f:
+        h = hashlib.sha1(f.read())
+    h.update(QtCore.PYQT_VERSION_STR.encode())
+    return h.hexdigest()
+
+def _compiled_path(name):
+    return os.path.join(COMPILED_DIR, os.path.splitext(name)[0] + '_ui.py')
+
+def _is_fresh(py_path, digest):
+    try:
+        with open(py_path, encoding='utf-8') as f:
+            return f.readline().strip() == _TAG + digest
+    except OSError:
+        return False
+
+def compile_ui(name, force=False):
+    """Compile ui/<name> into ui/compiled if it is missing or stale. Returns the module path."""
+    ui_path = os.path.join(UI_DIR, name)
+    py_path = _compiled_path(name)
+    digest = _digest(ui_path)
+    if not force and _is_fresh(py_path, digest):
+        return py_path
+    from PyQt5 import uic  # the uic package itself costs ~20 ms to import; only needed here
+    out = io.StringIO()
+    with open(ui_path, encoding='utf-8') as f:
+        uic.compileUi(f, out)
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    tmp = py_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(_TAG + digest + '\n')
+        f.write(out.getvalue())
+    os.replace(tmp, py_path)
+    return py_path
+
+def _form_class(name):
+    cls = _modules.get(name)
+    if cls is None:
+        py_path = compile_ui(name)
+        mod_name = 'ui_compiled_' + os.path.splitext(name)[0]
+        spec = importlib.util.spec_from_file_location(mod_name, py_path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        cls = next(v for k, v in vars(mod).items() if k.startswith('Ui_') and isinstance(v, type))
+        _modules[name] = cls
+    return cls
+
+def load_ui(name, widget):
+    """Build form ui/<name> on ``widget``; falls back to uic.loadUi if compiling is not possible."""
+    try:
+        cls = _form_class(name)
+    except Exception as e:
+        print(f'compiled form {name} unavailable, parsing .ui:', e)
+        from PyQt5 import uic
+        return uic.loadUi(os.path.join(UI_DIR, name), widget)
+    form = cls()
+    form.setupUi(widget)
+    # same attribute layout as uic.loadUi: widgets, layouts and actions on the window itself
+    for attr, value in vars(form).items():
+        setattr(widget, attr, value)
+    return widget
+
+def compile_all(force=False):
+    names = sorted(n for n in os.listdir(UI_DIR) if n.endswith('.ui'))
+    for name in names:
+        print(compile_ui(name, force))
+    return names
+
+
+if __name__ == '__main__':
+    compile_all(force='--force' in sys.argv)
@@ -0,0 +1,134 @@
+from PyQt5 import QtCore
+
+
+class VisitsTableModel(QtCore.QAbstractTableModel):
+    """Read-only table model for visit lists, shared by all visit grids.
+
+    Rows are kept column-wise (one list per key) instead of one QTableWidgetItem
+    per cell. With set_source() rows are pulled from the database page by page
+    through canFetchMore/fetchMore, so the view only materialises what it scrolls to.
+    Given a DbExecutor, pages are fetched in the background and inserted when ready.
+    """
+    PAGE_SIZE = 500
+    load_failed = QtCore.pyqtSignal(object)
+
+    def __init__(self, columns, parent=None, executor=None):
+        """columns: list of (row key, header) pairs. The visit 'id' is always kept, shown or not."""
+        super().__init__(parent)
+        self._executor = executor
+        self._loading = False
+        self._columns = list(columns)
+        self._keys = [k for k, _ in self._columns]
+        if 'id' not in self._keys:
+            self._keys.append('id')
+        self._data = {k: [] for k in self._keys}
+        self._count = 0
+        self._fetch = None
+        self._exhausted = True
+
+    def set_rows(self, rows):
+        """Show a ready list of row dicts (small results such as today's visits)."""
+        self.beginResetModel()
+        self._clear()
+        self._append(rows)
+        self._fetch = None
+        self._exhausted = True
+        self._loading = False
+        self.endResetModel()
+
+    def set_source(self, fetch):
+        """Page rows in lazily; fetch(offset, limit) must return a list of row dicts."""
+        self.beginResetModel()
+        self._clear()
+        self._fetch = fetch
+        self._exhausted = False
+        if self._executor is None:
+            rows = fetch(0, self.PAGE_SIZE)
+            self._append(rows)
+            self._exhausted = len(rows) < self.PAGE_SIZE
+        self.endResetModel()
+        if self._executor is not None:
+            self._loading = False
+            self._fetch_async()
+
+    def _fetch_async(self):
+        self._loading = True
+        fetch = self._fetch
+        self._executor.submit(fetch, self._count, self.PAGE_SIZE, key=('visits_model', id(self)),
+                              on_done=lambda rows: self._on_page(fetch, rows),
+                              on_error=lambda e: self._on_page_error(fetch, e))
+
+    def _on_page(self, fetch, rows):
+        if fetch is not self._fetch:
+            return
+        self._loading = False
+        self._insert(rows)
+
+    def _on_page_error(self, fetch, error):
+        if fetch is not self._fetch:
+            return
+        self._loading = False
+        self._exhausted = True
+        self.load_failed.emit(error)
+
+    def _insert(self, rows):
+        self._exhausted = len(rows) < self.PAGE_SIZE
+        if not rows:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._count, self._count + len(rows) - 1)
+        self._append(rows)
+        self.endInsertRows()
+
+    def visit_id(self, row):
+        try:
+            return self._data['id'][row]
+        except IndexError:
+            return None
+
+    def value(self, row, key):
+        return self._data[key][row]
+
+    def headers(self):
+        return [h for _, h in self._columns]
+
+    def _clear(self):
+        for col in self._data.values():
+            col.clear()
+        self._count = 0
+
+    def _append(self, rows):
+        for key, col in self._data.items():
+            col.extend(r.get(key) for r in rows)
+        self._count += len(rows)
+
+    # Qt model interface
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.ToolTipRole):
+            return None
+        v = self._data[self._columns[index.column()][0]][index.row()]
+        return '' if v is None else str(v)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self._columns[section][1]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading and self._fetch is not None
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        if self._executor is not None:
+            self._fetch_async()
+        else:
+            self._insert(self._fetch(self._count, self.PAGE_SIZE))
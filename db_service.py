@@ -0,0 +1,29 @@
+import argparse
+import config
+
+# this process owns the database file: never run in client mode itself
+config.DB_SERVICE = ''
+
+from config import DB_PATH, DB_SERVICE_PORT
+from models.db_service import make_server
+
+parser = argparse.ArgumentParser(description='Serve app.db to the workstations (see models/db_service.py)')
+parser.add_argument('--host', default='127.0.0.1',
+                    help='address to listen on; 0.0.0.0 for all network interfaces (requires MIS_DB_SERVICE_TOKEN)')
+parser.add_argument('--port', type=int, default=DB_SERVICE_PORT)
+parser.add_argument('--readers', type=int, default=4, help='threads serving reads')
+parser.add_argument('--batch', type=int, default=200, help='max writes committed in one transaction')
+args = parser.parse_args()
+
+try:
+    server, service = make_server(args.host, args.port, args.readers, args.batch)
+except PermissionError as e:
+    parser.exit(2, f'{e}\n')
+print(f'Serving {DB_PATH} on {args.host}:{args.port}')
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.server_close()
+    service.close()
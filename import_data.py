@@ -0,0 +1,18 @@
+import argparse
+from models.importer import import_file
+
+parser = argparse.ArgumentParser(description='Bulk import of historical visits (CSV or JSON Lines) into app.db')
+parser.add_argument('files', nargs='+', help='.csv or .jsonl files')
+parser.add_argument('--chunk', type=int, default=5000, help='records per transaction')
+args = parser.parse_args()
+
+for path in args.files:
+    bad = []
+    imported, new_patients, rejected = import_file(path, chunk_size=args.chunk,
+                                                   progress=lambda done, rate: print(f'\r{path}: {done} records, {rate:.0f} rows/s', end='', flush=True),
+                                                   on_reject=lambda number, value: bad.append((number, value)))
+    print(f'\n{path}: imported {imported} visits, {new_patients} new patients')
+    if rejected:
+        print(f'{path}: skipped {rejected} records with an unreadable visit_datetime, e.g.:')
+        for number, value in bad[:10]:
+            print(f'  record {number}: {value!r}')
@@ -1,3 +1,32 @@
-from models.db import init_db
+import sys
+from models.db import init_db, get_conn
+from models.migrations import get_version, check_query_plans
+from models import stats
 init_db()
-print('DB initialized')
+print('DB initialized, schema version', get_version(get_conn()))
+if '--check-plans' in sys.argv:
+    check_query_plans(get_conn())
+    print('Query plans OK')
+if '--rebuild-stats' in sys.argv:
+    stats.rebuild()
+    print('visit_stats rebuilt')
+if '--check-stats' in sys.argv:
+    diff = stats.check()
+    for day, dim, value, stored, actual in diff:
+        print(f'{day} {dim}={value!r}: stored {stored}, actual {actual}')
+    if diff:
+        sys.exit(1)
+    print('visit_stats OK')
+if '--vacuum' in sys.argv:
+    # return pages freed by the compact epicrisis migration to the file system
+    get_conn().execute("VACUUM")
+    print('VACUUM done')
+if '--find-duplicates' in sys.argv:
+    from models.dedup import find_duplicates
+    for score, a, b in find_duplicates():
+        print(f"{score:.2f}  {a['patient_number']} {a['fio']} {a['birthdate']} {a['phone']}  ~  "
+              f"{b['patient_number']} {b['fio']} {b['birthdate']} {b['phone']}")
+if '--merge-duplicates' in sys.argv:
+    from models.dedup import merge_duplicates
+    clusters, removed, moved = merge_duplicates(progress=lambda done, total: print(f'\rmerged {done}/{total}', end='', flush=True))
+    print(f'\n{clusters} patients had duplicates: {removed} records merged, {moved} visits moved')
@@ -1,61 +1,135 @@
+import time
+_T0 = time.perf_counter()
+
 import sys
-from PyQt5 import QtWidgets
+from contextlib import contextmanager
+import perf
+from PyQt5 import QtWidgets, QtCore, QtGui
 from controllers.mainwindow_controller import MainWindowController
-from controllers.reports_controller import ReportsController
-from controllers.settings_controller import SettingsController
-from controllers.database_controller import DatabaseController
 from controllers.login_controller import LoginDialog
-from controllers.history_controller import HistoryController
 from models.db import init_db
 
 
+class StartupTimer:
+    """Wall-clock breakdown of the startup phases, printed once the main window is up."""
+
+    def __init__(self, t0):
+        self.t0 = t0
+        self.phases = [('imports', time.perf_counter() - t0)]
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases.append((name, elapsed))
+            if perf.enabled:
+                perf.record('startup.' + name, elapsed * 1000)
+
+    def report(self):
+        total = time.perf_counter() - self.t0
+        parts = ', '.join(f'{name} {sec * 1000:.0f}' for name, sec in self.phases)
+        print(f'startup {total * 1000:.0f} ms ({parts}; ms)')
+        if perf.enabled:
+            perf.record('startup.total', total * 1000)
+
+
+def lazy_window(factory, setup=None):
+    """Slot that builds the window on first use and just shows it afterwards."""
+    holder = []
+
+    def show(*_):
+        if not holder:
+            win = factory()
+            if setup is not None:
+                setup(win)
+            holder.append(win)
+        win = holder[0]
+        win.show()
+        win.raise_()
+        win.activateWindow()
+    return show
+
+def reports_window():
+    from controllers.reports_controller import ReportsController
+    return ReportsController()
+
+def settings_window():
+    from controllers.settings_controller import SettingsController
+    return SettingsController()
+
+def database_window():
+    from controllers.database_controller import DatabaseController
+    return DatabaseController()
+
+def perf_window():
+    from controllers.perf_controller import PerfController
+    return PerfController()
+
+def history_window():
+    from controllers.history_controller import HistoryController
+    return HistoryController()
+
+
 def main():
-    # initialize DB automatically
-    try:
-        init_db()
-    except Exception:
-        pass
+    timer = StartupTimer(_T0)
+    # schema and migrations run once here; windows no longer call init_db() themselves
+    with timer.phase('init_db'):
+        try:
+            init_db()
+        except Exception as e:
+            print('init_db error', e)
 
-    app = QtWidgets.QApplication(sys.argv)
+    with timer.phase('QApplication'):
+        app = QtWidgets.QApplication(sys.argv)
 
+    # time spent waiting for the user is not part of the breakdown
     login = LoginDialog()
     if login.exec_() != QtWidgets.QDialog.Accepted:
         sys.exit(0)
+    timer.t0 = time.perf_counter() - sum(sec for _, sec in timer.phases)
 
-    main_win = MainWindowController()
-    reports_win = ReportsController()
-    settings_win = SettingsController()
-    db_win = DatabaseController()
-    history_win = HistoryController()
+    with timer.phase('main window'):
+        main_win = MainWindowController()
 
-    # connect settings_updated signal so main window updates comboboxes automatically
-    try:
+    # secondary windows are built on the first menu trigger, not at startup
+    def connect_settings(settings_win):
+        # settings_updated refreshes the main window comboboxes automatically
         settings_win.settings_updated.connect(main_win.apply_settings_to_ui)
-    except Exception:
-        pass
 
+    show_settings = lazy_window(settings_window, connect_settings)
     try:
         if hasattr(main_win, 'reports'):
-            main_win.reports.triggered.connect(reports_win.show)
+            main_win.reports.triggered.connect(lazy_window(reports_window))
         if hasattr(main_win, 'opendatabase'):
-            main_win.opendatabase.triggered.connect(db_win.show)
+            main_win.opendatabase.triggered.connect(lazy_window(database_window))
         if hasattr(main_win, 'action_3'):
-            main_win.action_3.triggered.connect(settings_win.show)
+            main_win.action_3.triggered.connect(show_settings)
         if hasattr(main_win, 'action_4'):
-            main_win.action_4.triggered.connect(settings_win.show)
+            main_win.action_4.triggered.connect(show_settings)
         if hasattr(main_win, 'history'):
-            main_win.history.triggered.connect(history_win.show)
+            main_win.history.triggered.connect(lazy_window(history_window))
     except Exception:
         pass
+    # timing debug window (perf.py), not in the menu
+    perf_shortcut = QtWidgets.QShortcut(QtGui.QKeySequence('Ctrl+Shift+D'), main_win)
+    perf_shortcut.activated.connect(lazy_window(perf_window))
 
-    main_win.show()
-    try:
-        if hasattr(main_win, 'load_today_visits'):
-            main_win.load_today_visits()
-    except Exception:
-        pass
+    with timer.phase('show'):
+        main_win.show()
+    # the first event loop pass paints the window; the report follows it
+    first_paint = time.perf_counter()
+
+    def startup_done():
+        timer.phases.append(('first paint', time.perf_counter() - first_paint))
+        timer.report()
+    QtCore.QTimer.singleShot(0, startup_done)
 
-    sys.exit(app.exec_())
+    code = app.exec_()
+    perf.flush()
+    sys.exit(code)
 
 if __name__ == '__main__':
     main()
@@ -1,7 +1,13 @@
 import sqlite3
-from contextlib import closing
-from config import DB_PATH
+import threading
+import time
+from contextlib import contextmanager
+from config import DB_PATH, DB_BUSY_TIMEOUT_MS, DB_SERVICE
+from models import fio_index, stats
+from models.identity import normalize_fio, normalize_phone, patient_keys
+import perf
 import json
+import zlib
 
 SCHEMA = """
 PRAGMA foreign_keys = ON;
@@ -33,124 +39,439 @@ CREATE TABLE IF NOT EXISTS visits (
     FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
 );
 """
+# Columns and indexes added after the first release live in models/migrations.py.
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
+# Applied once when a thread opens its connection.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}",
+)
+
+# One long-lived connection per thread (sqlite3 connections must not be shared between threads).
+_local = threading.local()
+
+
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            perf.sql(sql, params, time.perf_counter() - started)
+
+    def executemany(self, sql, seq):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            perf.sql(sql, None, time.perf_counter() - started, many=True)
+
+
+class _TimedConnection(sqlite3.Connection):
+    """Connection that reports every statement to perf; only used while timing is on."""
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+def _connect(path, timed=False):
+    # isolation_level=None: reads run in autocommit, writes go through transaction()
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+                           factory=_TimedConnection if timed else sqlite3.Connection)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.executescript(SCHEMA)
-        conn.commit()
+def get_conn():
+    """Return the connection of the current thread, opening it on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH or (_local.timed != perf.enabled and not _local.depth):
+        # switching timing on or off swaps in the matching connection class between transactions;
+        # the old one is left to open cursors (e.g. a running export) and closes when released
+        if conn is not None and _local.path != DB_PATH:
+            conn.close()
+        _local.conn = conn = _connect(DB_PATH, perf.enabled)
+        _local.path = DB_PATH
+        _local.timed = perf.enabled
+        _local.depth = 0
+    return conn
+
+def close_conn():
+    """Close the connection of the current thread (e.g. when a worker thread finishes)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def transaction():
+    """Run a block in one transaction: commit on success, rollback on error.
+
+    Nested calls join the outer transaction, so helpers can be combined freely.
+    """
+    conn = get_conn()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    _local.depth = 1
+    try:
+        yield conn
+    except BaseException:
+        # field ids interned by this transaction disappear with it
+        _forget_epicrisis_fields()
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        _local.depth = 0
+
+# DB files already brought up to date by this process.
+_initialized = set()
+
+def init_db(force=False):
+    """Create missing tables and bring the schema up to the latest migration.
+
+    Runs once per database file and process; later calls return at once unless ``force``.
+    """
+    if DB_PATH in _initialized and not force:
+        return
+    from models.migrations import migrate
+    conn = get_conn()
+    conn.executescript(SCHEMA)
+    migrate(conn)
+    _initialized.add(DB_PATH)
+
+# full_epicrisis storage.
+#
+# Rows written before schema version 7 hold a JSON dump of every form widget. Newer rows
+# hold a BLOB: one tag byte, then ``[[id, ...], [id, value, id, value, ...]]`` as compact
+# JSON, zlib-compressed when that is smaller. Only non-default values are stored: empty
+# strings, None and False are dropped, the ids of checkboxes set to True form the first
+# list. Field names are interned in the epicrisis_fields table (id -> name), cached in
+# _fields. The first rows of this format held the checkboxes as one integer with bit
+# ``id`` set per box; decode_epicrisis still reads those.
+EPICRISIS_RAW = 1
+EPICRISIS_ZLIB = 2
+_COMPRESS_MIN = 200
+
+_fields = {'path': None, 'ids': {}, 'names': {}}
+_fields_lock = threading.Lock()
+
+
+def _forget_epicrisis_fields():
+    with _fields_lock:
+        _fields['path'] = None
+        _fields['ids'] = {}
+        _fields['names'] = {}
+
+def _load_epicrisis_fields(conn):
+    # called with _fields_lock held
+    ids = dict(conn.execute("SELECT name, id FROM epicrisis_fields").fetchall())
+    _fields['path'] = DB_PATH
+    _fields['ids'] = ids
+    _fields['names'] = {i: n for n, i in ids.items()}
+
+def _field_ids(conn, names):
+    """Ids of field names, interning the unknown ones; must run inside a write transaction."""
+    with _fields_lock:
+        if _fields['path'] != DB_PATH:
+            _load_epicrisis_fields(conn)
+        ids = _fields['ids']
+        missing = [n for n in names if n not in ids]
+        if missing:
+            conn.executemany("INSERT OR IGNORE INTO epicrisis_fields (name) VALUES (?)", [(n,) for n in missing])
+            _load_epicrisis_fields(conn)
+            ids = _fields['ids']
+        return ids
+
+def _field_names(conn, wanted):
+    with _fields_lock:
+        if _fields['path'] != DB_PATH or any(i not in _fields['names'] for i in wanted):
+            _load_epicrisis_fields(conn)
+        return _fields['names']
+
+def encode_epicrisis(full, conn=None):
+    """Serialize full_epicrisis for the visits table (see the format note above)."""
+    if not isinstance(full, dict):
+        return json.dumps(full, ensure_ascii=False)
+    kept = {k: v for k, v in full.items() if not (v is None or v is False or v == '')}
+    ids = _field_ids(conn or get_conn(), kept)
+    checked = []
+    pairs = []
+    for name, v in kept.items():
+        if v is True:
+            checked.append(ids[name])
+        else:
+            pairs += (ids[name], v)
+    checked.sort()
+    payload = json.dumps([checked, pairs], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if len(payload) >= _COMPRESS_MIN:
+        packed = zlib.compress(payload, 6)
+        if len(packed) < len(payload):
+            return bytes((EPICRISIS_ZLIB,)) + packed
+    return bytes((EPICRISIS_RAW,)) + payload
+
+def decode_epicrisis(value, conn=None):
+    """Inverse of encode_epicrisis; returns the stored value unchanged if it cannot be decoded.
+
+    Fields that were empty or unchecked when saved are absent from the result.
+    """
+    if not value:
+        return value
+    if isinstance(value, (bytes, memoryview)):
+        try:
+            value = bytes(value)
+            body = zlib.decompress(value[1:]) if value[0] == EPICRISIS_ZLIB else value[1:]
+            checked, pairs = json.loads(body)
+            if isinstance(checked, int):
+                # early rows: one bit per checked box
+                checked = [i for i in range(checked.bit_length()) if checked >> i & 1]
+            names = _field_names(conn or get_conn(), checked + pairs[0::2])
+            full = {}
+            for fid in checked:
+                full[names.get(fid, f'#{fid}')] = True
+            for fid, v in zip(pairs[0::2], pairs[1::2]):
+                full[names.get(fid, f'#{fid}')] = v
+            return full
+        except Exception:
+            return value
+    try:
+        return json.loads(value)
+    except Exception:
+        return value
+
+def list_epicrisis_fields():
+    """Names of all fields ever stored in an epicrisis, in first-seen order."""
+    return [r[0] for r in get_conn().execute("SELECT name FROM epicrisis_fields ORDER BY id")]
+
+def _epicrisis_text(full) -> str:
+    """Searchable text of an epicrisis: the non-empty string values, checkbox flags are skipped."""
+    if not isinstance(full, dict):
+        return ''
+    return ' '.join(v.strip() for v in full.values() if isinstance(v, str) and v.strip())
+
+def _index_visit(conn, vid: int, patient_fio: str, diagnosis: str, mkb_code: str, full_epicrisis):
+    if not isinstance(full_epicrisis, dict):
+        full_epicrisis = decode_epicrisis(full_epicrisis, conn)
+    conn.execute("INSERT OR REPLACE INTO visits_fts (rowid, patient_fio, diagnosis, mkb_code, epicrisis) VALUES (?, ?, ?, ?, ?)",
+                 (vid, patient_fio or '', diagnosis or '', mkb_code or '', _epicrisis_text(full_epicrisis)))
+
+def rebuild_search_index(conn=None):
+    """Refill visits_fts from the visits table (backfill, or repair after manual edits)."""
+    conn = conn or get_conn()
+    conn.execute("DELETE FROM visits_fts")
+    cur = conn.execute("SELECT v.id, p.fio, v.diagnosis, v.mkb_code, v.full_epicrisis FROM visits v LEFT JOIN patients p ON p.id=v.patient_id")
+    for vid, fio, diagnosis, mkb_code, full in cur:
+        _index_visit(conn, vid, fio, diagnosis, mkb_code, full)
+
+def _fts_query(text: str) -> str:
+    """Turn free text from the search box into an FTS5 query: every word is a quoted prefix, all must match."""
+    words = [w.replace('"', '') for w in text.split()]
+    return ' '.join(f'"{w}"*' for w in words if w)
 
 def _generate_patient_number(last_id: int) -> str:
     return f"P{last_id:06d}"
 
+# SQL of the hot-path queries, shared with models.migrations.check_query_plans so the
+# plans it checks are those of the statements that actually run.
+PATIENT_BY_PHONE_SQL = "SELECT * FROM patients WHERE phone_norm=? LIMIT 1"
+PATIENT_BY_FIO_SQL = "SELECT * FROM patients WHERE fio_norm=? AND birthdate=? LIMIT 1"
+# visits_fts.patient_fio of all visits of a patient after a rename or merge
+PATIENT_FTS_SQL = "UPDATE visits_fts SET patient_fio=? WHERE rowid IN (SELECT id FROM visits WHERE patient_id=?)"
+# {cols}: BRIEF_COLUMNS or FULL_COLUMNS
+VISITS_BETWEEN_SQL = ("SELECT {cols} FROM visits v LEFT JOIN patients p ON p.id=v.patient_id "
+                      "WHERE v.visit_datetime >= ? AND v.visit_datetime <= ? ORDER BY v.visit_datetime DESC, v.id DESC LIMIT ? OFFSET ?")
+ALL_VISITS_SQL = "SELECT {cols} FROM visits v LEFT JOIN patients p ON p.id=v.patient_id ORDER BY v.visit_datetime DESC LIMIT ?"
+VISITS_FOR_DATE_SQL = ("SELECT v.id, v.visit_datetime, p.fio AS patient_fio, v.mkb_code FROM visits v "
+                       "LEFT JOIN patients p ON p.id=v.patient_id WHERE v.visit_date = ? ORDER BY v.visit_datetime ASC")
+
 def find_patient(fio: str=None, birthdate: str=None, phone: str=None):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        if phone:
-            cur.execute("SELECT * FROM patients WHERE phone=? LIMIT 1", (phone,))
-        elif fio and birthdate:
-            cur.execute("SELECT * FROM patients WHERE fio=? AND birthdate=? LIMIT 1", (fio, birthdate))
-        elif fio:
-            cur.execute("SELECT * FROM patients WHERE fio LIKE ? LIMIT 1", (f"%{fio}%",))
-        else:
-            return None
-        row = cur.fetchone()
-        return dict(row) if row else None
+    """Patient with the same normalised phone, else FIO+birthdate (models.identity); a bare FIO is a substring match."""
+    cur = get_conn().cursor()
+    phone_norm = normalize_phone(phone)
+    if phone_norm:
+        cur.execute(PATIENT_BY_PHONE_SQL, (phone_norm,))
+    elif fio and birthdate:
+        cur.execute(PATIENT_BY_FIO_SQL, (normalize_fio(fio), birthdate))
+    elif fio:
+        cur.execute("SELECT * FROM patients WHERE fio LIKE ? LIMIT 1", (f"%{fio}%",))
+    else:
+        return None
+    row = cur.fetchone()
+    return dict(row) if row else None
 
 def save_patient(patient: dict) -> int:
     """Create or update patient. Ensures patient_number exists."""
-    with closing(get_conn()) as conn:
+    fio, phone = patient.get('fio'), patient.get('phone')
+    keys = patient_keys(fio, phone)
+    with transaction() as conn:
         cur = conn.cursor()
         existing = None
-        if patient.get('phone'):
-            existing = find_patient(phone=patient.get('phone'))
-        if not existing and patient.get('fio') and patient.get('birthdate'):
-            existing = find_patient(fio=patient.get('fio'), birthdate=patient.get('birthdate'))
+        if keys[0]:
+            existing = find_patient(phone=phone)
+        if not existing and fio and patient.get('birthdate'):
+            existing = find_patient(fio=fio, birthdate=patient.get('birthdate'))
         if existing:
             pid = existing['id']
-            cur.execute("""UPDATE patients SET fio=?, birthdate=?, phone=?, organisation=? WHERE id=?""",
-                        (patient.get('fio'), patient.get('birthdate'), patient.get('phone'), patient.get('organisation'), pid))
-            conn.commit()
-            return pid
+            cur.execute("""UPDATE patients SET fio=?, birthdate=?, phone=?, organisation=?, phone_norm=?, fio_norm=?, fio_key=? WHERE id=?""",
+                        (fio, patient.get('birthdate'), phone, patient.get('organisation'), *keys, pid))
+            if existing.get('fio') != fio:
+                cur.execute(PATIENT_FTS_SQL, (fio or '', pid))
         else:
-            cur.execute("""INSERT INTO patients (fio, birthdate, phone, organisation) VALUES (?, ?, ?, ?)""",
-                        (patient.get('fio'), patient.get('birthdate'), patient.get('phone'), patient.get('organisation')))
-            conn.commit()
+            cur.execute("""INSERT INTO patients (fio, birthdate, phone, organisation, phone_norm, fio_norm, fio_key) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                        (fio, patient.get('birthdate'), phone, patient.get('organisation'), *keys))
             pid = cur.lastrowid
             pnum = _generate_patient_number(pid)
             cur.execute("UPDATE patients SET patient_number=? WHERE id=?", (pnum, pid))
-            conn.commit()
-            return pid
+    return pid
 
 def get_patient_by_id(pid: int):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM patients WHERE id=?", (pid,))
-        row = cur.fetchone()
-        return dict(row) if row else None
+    cur = get_conn().cursor()
+    cur.execute("SELECT * FROM patients WHERE id=?", (pid,))
+    row = cur.fetchone()
+    return dict(row) if row else None
 
 def list_patients_like(prefix: str, limit=20):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT fio FROM patients WHERE fio LIKE ? GROUP BY fio LIMIT ?", (f"%{prefix}%", limit))
-        return [r[0] for r in cur.fetchall()]
+    cur = get_conn().cursor()
+    cur.execute("SELECT fio FROM patients WHERE fio LIKE ? GROUP BY fio LIMIT ?", (f"%{prefix}%", limit))
+    return [r[0] for r in cur.fetchall()]
+
+# Columns for list views (grids, reports); everything except the full_epicrisis blob.
+BRIEF_COLUMNS = ("v.id, v.patient_id, v.visit_datetime, v.visit_date, v.vid_priema, v.examiner, v.diagnosis, v.mkb_code, v.outcome, "
+                 "p.fio AS patient_fio, p.patient_number, p.organisation")
+FULL_COLUMNS = "v.*, p.fio AS patient_fio, p.patient_number"
+
+def _decode_epicrisis(rows):
+    for r in rows:
+        r['full_epicrisis'] = decode_epicrisis(r.get('full_epicrisis'))
+
+def _day_bounds(start_date: str, end_date: str):
+    """Widen bare 'YYYY-MM-DD' bounds to whole days so they compare correctly with visit_datetime."""
+    if start_date and len(start_date) == 10:
+        start_date += ' 00:00:00'
+    if end_date and len(end_date) == 10:
+        end_date += ' 23:59:59'
+    return start_date, end_date
+
+def list_patient_names():
+    cur = get_conn().cursor()
+    cur.execute("SELECT DISTINCT fio FROM patients WHERE fio IS NOT NULL AND fio <> ''")
+    return [r[0] for r in cur.fetchall()]
+
+def load_fio_index():
+    """Fill the in-memory FIO autocomplete index (models.fio_index) from the patients table."""
+    fio_index.get_index().load(list_patient_names())
 
 def save_visit(patient_id: int, visit_datetime: str, vid_priema: str, obschsost: str, soznanie: str, examiner: str, diagnosis: str, mkb_code: str, outcome: str, evacuation_place: str, full_epicrisis: dict) -> int:
-    with closing(get_conn()) as conn:
+    with transaction() as conn:
         cur = conn.cursor()
-        cur.execute("""INSERT INTO visits (patient_id, visit_datetime, vid_priema, obschsost, soznanie, examiner, diagnosis, mkb_code, outcome, evacuation_place, full_epicrisis) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (patient_id, visit_datetime, vid_priema, obschsost, soznanie, examiner, diagnosis, mkb_code, outcome, evacuation_place, json.dumps(full_epicrisis, ensure_ascii=False)))
-        conn.commit()
-        return cur.lastrowid
+        cur.execute("""INSERT INTO visits (patient_id, visit_datetime, visit_date, vid_priema, obschsost, soznanie, examiner, diagnosis, mkb_code, outcome, evacuation_place, full_epicrisis) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (patient_id, visit_datetime, (visit_datetime or '')[:10] or None, vid_priema, obschsost, soznanie, examiner, diagnosis, mkb_code, outcome, evacuation_place, encode_epicrisis(full_epicrisis)))
+        vid = cur.lastrowid
+        row = cur.execute("SELECT fio, organisation FROM patients WHERE id=?", (patient_id,)).fetchone()
+        _index_visit(conn, vid, row[0] if row else '', diagnosis, mkb_code, full_epicrisis)
+        stats.record_visit(conn, (visit_datetime or '')[:10], row[1] if row else '', mkb_code, outcome, examiner)
+        return vid
+
+def save_case(patient: dict, visit: dict):
+    """Save a closed case: patient upsert, patient_number and visit insert in one transaction.
+
+    ``visit`` holds the keyword arguments of save_visit except patient_id.
+    The patient is matched by phone, then by fio+birthdate, as in save_patient.
+    Returns (patient_id, visit_id).
+    """
+    with transaction():
+        pid = save_patient(patient)
+        vid = save_visit(pid, **visit)
+    return pid, vid
 
 def get_visit_by_id(vid: int):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT v.*, p.fio AS patient_fio, p.patient_number, p.phone, p.organisation FROM visits v LEFT JOIN patients p ON p.id=v.patient_id WHERE v.id=?", (vid,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        data = dict(row)
-        if data.get('full_epicrisis'):
-            try:
-                data['full_epicrisis'] = json.loads(data['full_epicrisis'])
-            except Exception:
-                pass
-        return data
-
-def list_visits_between(start_date: str, end_date: str):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.execute("""SELECT v.*, p.fio AS patient_fio, p.patient_number FROM visits v LEFT JOIN patients p ON p.id=v.patient_id WHERE visit_datetime BETWEEN ? AND ? ORDER BY visit_datetime DESC""", (start_date, end_date))
-        rows = [dict(r) for r in cur.fetchall()]
-        for r in rows:
-            if r.get('full_epicrisis'):
-                try:
-                    r['full_epicrisis'] = json.loads(r['full_epicrisis'])
-                except Exception:
-                    pass
-        return rows
+    cur = get_conn().cursor()
+    cur.execute("SELECT v.*, p.fio AS patient_fio, p.patient_number, p.phone, p.organisation FROM visits v LEFT JOIN patients p ON p.id=v.patient_id WHERE v.id=?", (vid,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    data = dict(row)
+    data['full_epicrisis'] = decode_epicrisis(data.get('full_epicrisis'))
+    return data
+
+def list_visits_between(start_date: str, end_date: str, brief: bool=False, limit: int=None, offset: int=0):
+    """Visits in a period, newest first.
+
+    With ``brief=True`` only the grid columns (BRIEF_COLUMNS) are selected and
+    full_epicrisis is neither read nor decoded; open a row with get_visit_by_id.
+    ``limit``/``offset`` page through the result (used by VisitsTableModel).
+    """
+    start_date, end_date = _day_bounds(start_date, end_date)
+    cur = get_conn().cursor()
+    cur.execute(VISITS_BETWEEN_SQL.format(cols=BRIEF_COLUMNS if brief else FULL_COLUMNS),
+                (start_date, end_date, -1 if limit is None else limit, offset))
+    rows = [dict(r) for r in cur.fetchall()]
+    if not brief:
+        _decode_epicrisis(rows)
+    return rows
 
 def list_visits_for_date(date_iso: str):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.execute("""SELECT v.id, v.visit_datetime, p.fio AS patient_fio, v.mkb_code FROM visits v LEFT JOIN patients p ON p.id=v.patient_id WHERE date(v.visit_datetime) = date(?) ORDER BY v.visit_datetime ASC""", (date_iso,))
-        return [dict(r) for r in cur.fetchall()]
+    cur = get_conn().cursor()
+    cur.execute(VISITS_FOR_DATE_SQL, (date_iso[:10],))
+    return [dict(r) for r in cur.fetchall()]
 
-def list_all_visits(limit=1000):
-    with closing(get_conn()) as conn:
-        cur = conn.cursor()
-        cur.execute("""SELECT v.*, p.fio AS patient_fio, p.patient_number FROM visits v LEFT JOIN patients p ON p.id=v.patient_id ORDER BY visit_datetime DESC LIMIT ?""", (limit,))
-        rows = [dict(r) for r in cur.fetchall()]
-        for r in rows:
-            if r.get('full_epicrisis'):
-                try:
-                    r['full_epicrisis'] = json.loads(r['full_epicrisis'])
-                except Exception:
-                    pass
-        return rows
+def list_all_visits(limit=1000, brief: bool=False):
+    cur = get_conn().cursor()
+    cur.execute(ALL_VISITS_SQL.format(cols=BRIEF_COLUMNS if brief else FULL_COLUMNS), (limit,))
+    rows = [dict(r) for r in cur.fetchall()]
+    if not brief:
+        _decode_epicrisis(rows)
+    return rows
+
+def search_visits(query: str, date_from: str=None, date_to: str=None, limit=200, offset=0):
+    """Full-text search over FIO, diagnosis, MKB code and epicrisis text, best matches first.
+
+    Every word of ``query`` is matched as a prefix. Rows carry ``snippet`` with the
+    matched words in [brackets] and ``rank`` (bm25, lower is better).
+    """
+    match = _fts_query(query or '')
+    if not match:
+        return []
+    date_from, date_to = _day_bounds(date_from, date_to)
+    where = ["visits_fts MATCH ?"]
+    params = [match]
+    if date_from:
+        where.append("v.visit_datetime >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("v.visit_datetime <= ?")
+        params.append(date_to)
+    params += [limit, offset]
+    cur = get_conn().cursor()
+    cur.execute(f"""SELECT v.id, v.visit_datetime, v.diagnosis, v.mkb_code, p.fio AS patient_fio, p.patient_number,
+                           snippet(visits_fts, -1, '[', ']', '…', 12) AS snippet, bm25(visits_fts) AS rank
+                    FROM visits_fts JOIN visits v ON v.id = visits_fts.rowid LEFT JOIN patients p ON p.id=v.patient_id
+                    WHERE {' AND '.join(where)} ORDER BY rank LIMIT ? OFFSET ?""", params)
+    return [dict(r) for r in cur.fetchall()]
+
+
+# time every public query function (a flag check per call while timing is off)
+perf.instrument(globals(), 'db', skip={'get_conn', 'close_conn', 'transaction', 'encode_epicrisis', 'decode_epicrisis'})
+
+if DB_SERVICE:
+    # client mode: patient/visit queries go to the DB service (models/db_service.py)
+    from models.db_service import install_client
+    install_client(globals())
@@ -0,0 +1,291 @@
+"""Optional DB service: one process owns app.db, workstations call it over HTTP.
+
+When several reception desks open one app.db on a network share, every save is a
+write lock on the file taken by a different process, and SQLite's locking over
+network file systems is both slow and unreliable. With the service, only the
+machine running ``python db_service.py`` opens the file; the desks set
+MIS_DB_SERVICE=host:port (config.DB_SERVICE) and the functions listed in
+SERVICE_API become calls to it.
+
+Protocol: ``POST /call`` with ``{"call": "models.db.save_case", "kwargs": {...}}``,
+answered by ``{"result": ...}`` or ``{"error": {"type": ..., "message": ...}}``.
+Arguments are bound to names on the client, so the server only sees JSON objects.
+If MIS_DB_SERVICE_TOKEN is set, both sides must use the same value. The service
+only listens on a non-loopback address (other machines) when a token is set: the
+calls return patient records and write cases, and travel as plain HTTP.
+
+Reads run on a pool of threads, each with its own connection (WAL lets them run
+while a write is in progress). Writes go to a single writer thread which takes
+everything queued so far and commits it as one transaction (group commit), each
+call inside a SAVEPOINT so a failing call does not undo the others. A client gets
+its answer only after the commit, so it can read its own write right away.
+"""
+import builtins
+import hmac
+import http.client
+import importlib
+import inspect
+import ipaddress
+import json
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import perf
+from config import DB_SERVICE, DB_SERVICE_PORT, DB_SERVICE_TOKEN
+
+# module -> functions served by the service; 'local' arguments are filled on the client
+# (the workstation of a draft is the desk's host name, not the server's)
+SERVICE_API = {
+    'models.db': {
+        'read': ('init_db', 'find_patient', 'get_patient_by_id', 'list_patients_like', 'list_patient_names',
+                 'get_visit_by_id', 'list_visits_between', 'list_visits_for_date', 'list_all_visits', 'search_visits',
+                 'list_epicrisis_fields'),
+        'write': ('save_patient', 'save_visit', 'save_case'),
+    },
+    'models.drafts': {
+        'read': ('load_draft',),
+        'write': ('append_draft', 'clear_drafts'),
+        'local': {'station': 'workstation'},
+    },
+    'models.export': {
+        'read': ('count_visits', 'export_page'),
+        'write': (),
+    },
+    'models.stats': {
+        'read': ('totals', 'per_day', 'day_summary'),
+        'write': (),
+    },
+}
+
+CALL_TIMEOUT = 60
+TOKEN_HEADER = 'X-Service-Token'
+
+
+class ServiceError(RuntimeError):
+    """Error raised by the service that has no matching local exception class."""
+
+
+# ---- client -------------------------------------------------------------------------
+
+_local = threading.local()
+
+
+def _address():
+    host, _, port = DB_SERVICE.rpartition(':')
+    if not host:
+        host, port = port, DB_SERVICE_PORT
+    return host, int(port)
+
+def _http():
+    # one keep-alive connection per thread (the GUI thread and each DbExecutor thread)
+    conn = getattr(_local, 'http', None)
+    if conn is None:
+        host, port = _address()
+        conn = _local.http = http.client.HTTPConnection(host, port, timeout=CALL_TIMEOUT)
+    return conn
+
+def _raise(error):
+    kind, message = error.get('type') or 'Error', error.get('message') or ''
+    cls = getattr(sqlite3, kind, None) or getattr(builtins, kind, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        raise cls(message)
+    raise ServiceError(f'{kind}: {message}')
+
+def call(name, kwargs, retry=False):
+    """Run ``module.function`` on the service with keyword arguments; returns its result."""
+    body = json.dumps({'call': name, 'kwargs': kwargs}, ensure_ascii=False, default=str).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if DB_SERVICE_TOKEN:
+        headers[TOKEN_HEADER] = DB_SERVICE_TOKEN
+    while True:
+        conn = _http()
+        try:
+            conn.request('POST', '/call', body, headers)
+            resp = conn.getresponse()
+            data = json.loads(resp.read())
+            break
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            _local.http = None
+            # a dropped keep-alive connection (service restarted) is retried for reads only:
+            # a write may already have been committed
+            if not retry:
+                raise
+            retry = False
+    if 'error' in data:
+        _raise(data['error'])
+    return data.get('result')
+
+def _proxy(namespace, name, write, local):
+    fn = namespace[name]
+    signature = inspect.signature(inspect.unwrap(fn))
+    remote = f"{namespace['__name__']}.{name}"
+
+    def proxy(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = bound.arguments
+        for arg, filler in local.items():
+            if arg in params and params[arg] is None:
+                params[arg] = namespace[filler]()
+        return call(remote, params, retry=not write)
+    proxy.__name__ = proxy.__qualname__ = name
+    proxy.__doc__ = fn.__doc__
+    return proxy
+
+def install_client(namespace):
+    """Replace the served functions of a module (pass globals()) with calls to the service."""
+    spec = SERVICE_API[namespace['__name__']]
+    for write, names in ((False, spec['read']), (True, spec['write'])):
+        for name in names:
+            namespace[name] = perf.timed(f'service.{name}')(_proxy(namespace, name, write, spec.get('local', {})))
+
+
+# ---- server -------------------------------------------------------------------------
+
+class DbService:
+    """Executes calls against the local database: reads on a pool, writes group-committed."""
+
+    def __init__(self, readers=4, max_batch=200):
+        self.max_batch = max_batch
+        self.functions = {}
+        for module, spec in SERVICE_API.items():
+            mod = importlib.import_module(module)
+            for name in spec['read']:
+                self.functions[f'{module}.{name}'] = (getattr(mod, name), False)
+            for name in spec['write']:
+                self.functions[f'{module}.{name}'] = (getattr(mod, name), True)
+        self._reads = ThreadPoolExecutor(readers, thread_name_prefix='db-read')
+        self._writes = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name='db-write', daemon=True)
+        self._writer.start()
+
+    def submit(self, name, kwargs) -> Future:
+        fn, write = self.functions[name]
+        if not write:
+            return self._reads.submit(fn, **kwargs)
+        fut = Future()
+        self._writes.put((fn, kwargs, fut))
+        return fut
+
+    def close(self):
+        self._writes.put(None)
+        self._writer.join()
+        self._reads.shutdown()
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                return
+            batch = [item]
+            # everything that queued up while the previous batch was committing goes into this one
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._writes.put(None)
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        from models.db import transaction, get_conn, _forget_epicrisis_fields
+        started = time.perf_counter()
+        done = []
+        try:
+            with transaction() as conn:
+                for fn, kwargs, fut in batch:
+                    conn.execute("SAVEPOINT service_call")
+                    try:
+                        result = fn(**kwargs)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO service_call")
+                        conn.execute("RELEASE service_call")
+                        # field ids interned by the failed call are gone with it
+                        _forget_epicrisis_fields()
+                        done.append((fut, None, e))
+                    else:
+                        conn.execute("RELEASE service_call")
+                        done.append((fut, result, None))
+        except Exception as e:
+            conn = get_conn()
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            _forget_epicrisis_fields()
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        if perf.enabled:
+            perf.record('service.commit', (time.perf_counter() - started) * 1000, calls=len(batch))
+        for fut, result, error in done:
+            if error is None:
+                fut.set_result(result)
+            else:
+                fut.set_exception(error)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are separate writes; with Nagle on, each answer waits for a delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    service = None
+
+    def do_POST(self):
+        if self.path != '/call':
+            return self._reply(404, {'error': {'type': 'ServiceError', 'message': 'unknown path'}})
+        if DB_SERVICE_TOKEN and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ''), DB_SERVICE_TOKEN):
+            return self._reply(403, {'error': {'type': 'PermissionError', 'message': 'bad service token'}})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+            fut = self.service.submit(request['call'], request.get('kwargs') or {})
+        except (ValueError, KeyError, TypeError) as e:
+            return self._reply(400, {'error': {'type': 'ServiceError', 'message': f'bad request: {e}'}})
+        try:
+            result = fut.result(CALL_TIMEOUT)
+        except Exception as e:
+            return self._reply(500, {'error': {'type': type(e).__name__, 'message': str(e)}})
+        self._reply(200, {'result': result})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def is_loopback(host):
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback
+                   for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP))
+    except (OSError, ValueError):
+        return False
+
+def make_server(host='127.0.0.1', port=DB_SERVICE_PORT, readers=4, max_batch=200):
+    """(HTTP server, DbService); call serve_forever() on the server, close() on both when done.
+
+    Raises PermissionError for an address reachable from other machines when no
+    MIS_DB_SERVICE_TOKEN is set.
+    """
+    if not DB_SERVICE_TOKEN and not is_loopback(host):
+        raise PermissionError(f'refusing to serve on {host} without MIS_DB_SERVICE_TOKEN: '
+                              'set a token on the service and the workstations, or listen on 127.0.0.1')
+    from models.db import init_db
+    init_db()
+    service = DbService(readers, max_batch)
+    handler = type('Handler', (_Handler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
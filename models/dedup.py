@@ -0,0 +1,146 @@
+"""Batch detection and merging of duplicate patients.
+
+Candidates are never found by comparing every patient with every other: only
+records sharing a blocking key are compared (same normalised phone, or same
+birthdate and phonetic FIO key, see models/identity.py), which keeps the job
+linear in the number of patients. Pairs are scored with identity.similarity().
+
+Merging keeps the patient with the smallest id (the oldest patient_number),
+fills its empty phone/birthdate/organisation from the duplicates, repoints
+visits.patient_id, brings the FTS patient_fio of the moved visits in line and
+deletes the duplicates. Every merge is logged in patient_merges. Clusters are
+merged ``batch`` at a time, one transaction per batch.
+"""
+from itertools import groupby
+
+from models.db import PATIENT_FTS_SQL, transaction, get_conn
+from models.identity import MERGE_THRESHOLD, REVIEW_THRESHOLD, patient_keys, similarity
+
+# blocks larger than this (a shared office phone, junk data) are skipped: they would
+# cost n^2 comparisons and are better looked at by hand
+MAX_BLOCK = 50
+
+_COLUMNS = "id, patient_number, fio, birthdate, phone, organisation"
+
+BLOCKS = {
+    'phone': f"""SELECT {_COLUMNS}, phone_norm AS block FROM patients
+                 WHERE phone_norm IN (SELECT phone_norm FROM patients WHERE phone_norm IS NOT NULL
+                                      GROUP BY phone_norm HAVING COUNT(*) > 1)
+                 ORDER BY phone_norm, id""",
+    'birthdate+fio_key': f"""SELECT {_COLUMNS}, p.birthdate || '|' || p.fio_key AS block FROM patients p
+                             JOIN (SELECT birthdate, fio_key FROM patients WHERE birthdate IS NOT NULL AND fio_key IS NOT NULL
+                                   GROUP BY birthdate, fio_key HAVING COUNT(*) > 1) b USING (birthdate, fio_key)
+                             ORDER BY p.birthdate, p.fio_key, p.id""",
+}
+
+
+def candidate_pairs(conn=None, skipped=None):
+    """Yield (score, a, b) for every pair of patients sharing a block; a['id'] < b['id'].
+
+    Oversized blocks are not compared; their keys are appended to ``skipped`` if given.
+    """
+    conn = conn or get_conn()
+    seen = set()
+    for name, sql in BLOCKS.items():
+        rows = (dict(r) for r in conn.execute(sql))
+        for key, group in groupby(rows, key=lambda r: r['block']):
+            group = list(group)
+            if len(group) > MAX_BLOCK:
+                if skipped is not None:
+                    skipped.append((name, key, len(group)))
+                continue
+            for i, a in enumerate(group):
+                for b in group[i + 1:]:
+                    if (a['id'], b['id']) in seen:
+                        continue
+                    seen.add((a['id'], b['id']))
+                    yield similarity(a, b), a, b
+
+def find_duplicates(threshold=REVIEW_THRESHOLD, conn=None):
+    """Candidate pairs scoring at least ``threshold``, best first."""
+    pairs = [p for p in candidate_pairs(conn) if p[0] >= threshold]
+    pairs.sort(key=lambda p: (-p[0], p[1]['id'], p[2]['id']))
+    return pairs
+
+
+def _clusters(pairs):
+    """Union-find over scored pairs: smallest id -> {member id: patient dict}."""
+    parent = {}
+    members = {}
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for _, a, b in pairs:
+        for p in (a, b):
+            if p['id'] not in parent:
+                parent[p['id']] = p['id']
+                members[p['id']] = p
+        ra, rb = root(a['id']), root(b['id'])
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    clusters = {}
+    for pid, p in members.items():
+        clusters.setdefault(root(pid), {})[pid] = p
+    return clusters
+
+def plan_merges(threshold=MERGE_THRESHOLD, conn=None):
+    """[(survivor, [(score, duplicate), ...]), ...] without changing anything.
+
+    A chain A~B~C is only merged where each duplicate matches the survivor itself,
+    so one borderline pair cannot pull unrelated people together.
+    """
+    plan = []
+    for sid, group in sorted(_clusters(find_duplicates(threshold, conn)).items()):
+        survivor = group[sid]
+        dups = [(similarity(survivor, p), p) for pid, p in sorted(group.items()) if pid != sid]
+        dups = [(score, p) for score, p in dups if score >= threshold]
+        if dups:
+            plan.append((survivor, dups))
+    return plan
+
+
+def _merge_one(conn, survivor, dups):
+    sid = survivor['id']
+    fill = {}
+    for col in ('phone', 'birthdate', 'organisation'):
+        if not survivor.get(col):
+            value = next((p[col] for _, p in dups if p.get(col)), None)
+            if value:
+                fill[col] = value
+    if fill:
+        conn.execute(f"UPDATE patients SET {', '.join(f'{c}=?' for c in fill)} WHERE id=?", (*fill.values(), sid))
+        phone = fill.get('phone', survivor.get('phone'))
+        conn.execute("UPDATE patients SET phone_norm=?, fio_norm=?, fio_key=? WHERE id=?",
+                     (*patient_keys(survivor.get('fio'), phone), sid))
+    moved = 0
+    for score, p in dups:
+        n = conn.execute("UPDATE visits SET patient_id=? WHERE patient_id=?", (sid, p['id'])).rowcount
+        moved += n
+        conn.execute("""INSERT OR REPLACE INTO patient_merges (merged_id, merged_number, merged_fio, into_id, score, visits_moved)
+                        VALUES (?, ?, ?, ?, ?, ?)""", (p['id'], p.get('patient_number'), p.get('fio'), sid, round(score, 4), n))
+        conn.execute("DELETE FROM patients WHERE id=?", (p['id'],))
+    if any(p.get('fio') != survivor.get('fio') for _, p in dups):
+        conn.execute(PATIENT_FTS_SQL, (survivor.get('fio') or '', sid))
+    return moved
+
+def merge_duplicates(threshold=MERGE_THRESHOLD, dry_run=False, batch=500, progress=None):
+    """Merge duplicate patients; returns (clusters, patients removed, visits moved).
+
+    ``progress(done, total)`` is called after each committed batch of clusters.
+    """
+    plan = plan_merges(threshold)
+    removed = sum(len(dups) for _, dups in plan)
+    if dry_run:
+        return len(plan), removed, 0
+    moved = 0
+    for start in range(0, len(plan), batch):
+        with transaction() as conn:
+            for survivor, dups in plan[start:start + batch]:
+                moved += _merge_one(conn, survivor, dups)
+        if progress:
+            progress(min(start + batch, len(plan)), len(plan))
+    return len(plan), removed, moved
@@ -0,0 +1,53 @@
+"""Autosave journal for the unsaved case in the main window.
+
+Each autosave appends only the fields changed since the previous one; the draft
+is the merge of all entries of a workstation in ``seq`` order. The journal is
+cleared once the case is saved, so whatever is left after a crash is the draft
+to restore.
+"""
+import json
+import socket
+
+from config import DB_SERVICE
+from models.db import get_conn, transaction
+
+
+def workstation():
+    return socket.gethostname() or 'local'
+
+
+def append_draft(fields: dict, seq: int, station: str=None):
+    """Append changed form fields; ``seq`` orders entries written from different threads."""
+    with transaction() as conn:
+        conn.execute("INSERT INTO draft_journal (workstation, seq, fields) VALUES (?, ?, ?)",
+                     (station or workstation(), seq, json.dumps(fields, ensure_ascii=False)))
+
+
+def load_draft(station: str=None) -> dict:
+    """Merged draft fields of the workstation, {} if there is nothing to restore."""
+    draft = {}
+    cur = get_conn().execute("SELECT fields FROM draft_journal WHERE workstation=? ORDER BY seq, id", (station or workstation(),))
+    for (fields,) in cur:
+        try:
+            draft.update(json.loads(fields))
+        except ValueError:
+            pass
+    return draft
+
+
+def clear_drafts(station: str=None, up_to_seq: int=None):
+    """Drop the journal of the workstation; with ``up_to_seq`` only entries up to that seq.
+
+    Clearing after a save passes the seq taken when the save was submitted, so an
+    autosave of later edits that commits after the save survives.
+    """
+    with transaction() as conn:
+        if up_to_seq is None:
+            conn.execute("DELETE FROM draft_journal WHERE workstation=?", (station or workstation(),))
+        else:
+            conn.execute("DELETE FROM draft_journal WHERE workstation=? AND seq<=?", (station or workstation(), up_to_seq))
+
+
+if DB_SERVICE:
+    from models.db_service import install_client
+    install_client(globals())
@@ -0,0 +1,248 @@
+"""Epicrisis text from a stored full_epicrisis dict, without Qt.
+
+The field -> (group, label, kind) plan is compiled once per form version from
+ui/mainwindow.ui (group box titles, checkbox captions, widget classes) plus the
+LABELS/GROUPS tables below, and cached. render() is then one pass over the
+non-empty values of an epicrisis, so it can run in batches (export, print) as
+well as behind the "Сформировать эпикриз" button.
+"""
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from config import UI_DIR
+
+# Version of the set of persisted form fields; stored in every epicrisis under VERSION_KEY.
+FORM_VERSION = 1
+VERSION_KEY = '_form_version'
+
+# Names of the persisted form fields per FORM_VERSION, in form order. Only these widgets
+# are read into a case (controllers/form_registry.py); a widget added to mainwindow.ui
+# is not stored until it is listed here under a new FORM_VERSION.
+PERSISTED_FIELDS = {
+    1: (
+        'patientdate', 'organisation', 'rostpole', 'vespole', 'patientfio', 'profession', 'phone_pole',
+        'vidpriema', 'zhalobypole', 'anamnesispole', 'obschsost', 'soznanie', 'normalskin', 'blednost',
+        'sukhostskin', 'hydrosis', 'ikterusskin', 'acrocyan', 'cyan', 'hyperemiaskin', 'sypskin', 'syplocal',
+        'limfouzlylist', 'limfouzlyloc', 'nopainlu', 'painlu', 'connlu', 'noconnlu', 'nasalbre', 'zev',
+        'glands', 'glandnalet', 'glandnetnalet', 'auskgk', 'locoslab', 'hrip', 'lochrip', 'perkut', 'cortone',
+        'corritm', 'corshum', 'corlocshum', 'pulsritm', 'pulsaritm', 'pulscor', 'lingua1', 'lingua2',
+        'abdomenform', 'abdomenpain', 'locabdomenpain', 'peritoneallist', 'ortner', 'merphy', 'meiorobson',
+        'stullist', 'urea1', 'urea2', 'urea7', 'urea8', 'urea3', 'urea4', 'urea5', 'urea6', 'pasternat',
+        'pasternatloc1', 'pasternatloc2', 'pasternatloc3', 'urinapole', 'otekida', 'otekinet', 'otekiloc',
+        'glazgoslider', 'cmn1', 'cmn7', 'cmn8', 'cmn9', 'cmn10', 'cmn2', 'cmn3', 'cmn4', 'cmn5', 'cmn6',
+        'cmn11', 'reflexleftup', 'reflexleftdown', 'reflexrightup', 'reflexrightdown', 'patreflexpole',
+        'nopatreflex', 'neurodoppole', 'romberglist', 'coordlist', 'coordlistloc', 'stlocalispole',
+        'vashslider', 'dspole', 'mkb10list', 'lechpole', 'trudospos', 'ishod', 'fiovrach', 'ADpole', 'chsspole',
+        'ttelapole', 'ddpole', 'spo2pole', 'pspole', 'stacionarname', 'dmopole',
+    ),
+}
+
+FORM_UI = os.path.join(UI_DIR, 'mainwindow.ui')
+
+# Designer classes that hold case data and how their values are rendered.
+FIELD_KINDS = {
+    'QLineEdit': 'text', 'QTextEdit': 'text', 'QTextBrowser': 'text', 'QComboBox': 'text',
+    'QDateEdit': 'text', 'QSlider': 'number', 'QCheckBox': 'flag', 'QRadioButton': 'flag',
+}
+
+# Captions of text fields; in the .ui they are separate QLabel widgets.
+LABELS = {
+    'patientfio': 'Ф.И.О.', 'patientdate': 'Дата рождения', 'organisation': 'Место работы',
+    'profession': 'Должность', 'phone_pole': 'Телефон', 'rostpole': 'Рост', 'vespole': 'Вес',
+    'vidpriema': 'Приём', 'zhalobypole': 'Жалобы', 'anamnesispole': 'Анамнез',
+    'obschsost': 'Общее состояние', 'soznanie': 'Уровень сознания', 'vashslider': 'ВАШ',
+    'syplocal': 'Локализация сыпи', 'limfouzlylist': 'Лимфатические узлы', 'limfouzlyloc': 'Локализация л/у',
+    'nasalbre': 'Носовое дыхание', 'zev': 'Зев', 'glands': 'Миндалины', 'auskgk': 'Аускультативно дыхание',
+    'locoslab': 'Локализация ослабления', 'hrip': 'Хрипы', 'lochrip': 'Локализация хрипов', 'perkut': 'Перкуторно',
+    'cortone': 'Тоны сердца', 'corritm': 'Ритм', 'corshum': 'Шумы', 'corlocshum': 'Локализация шумов',
+    'pulscor': 'Пульс', 'lingua1': 'Язык', 'lingua2': 'Язык', 'abdomenform': 'Живот', 'abdomenpain': 'Живот',
+    'locabdomenpain': 'Локализация боли', 'peritoneallist': 'Симптомы раздражения брюшины', 'stullist': 'Стул',
+    'pasternat': 'Симптом поколачивания', 'urinapole': 'Моча', 'otekiloc': 'Локализация отёков',
+    'glazgoslider': 'ШКГ', 'reflexleftup': 'Рефлексы D в/к', 'reflexleftdown': 'Рефлексы D н/к',
+    'reflexrightup': 'Рефлексы S в/к', 'reflexrightdown': 'Рефлексы S н/к',
+    'patreflexpole': 'Патологические рефлексы', 'romberglist': 'Поза Ромберга', 'coordlist': 'Пальценосовая проба',
+    'coordlistloc': 'Пальценосовая проба', 'neurodoppole': 'Примечания', 'stlocalispole': 'Локальный статус',
+    'ADpole': 'АД', 'chsspole': 'ЧСС', 'ttelapole': 't тела', 'ddpole': 'ЧДД', 'spo2pole': 'SpO2', 'pspole': 'Ps',
+    'dspole': 'Диагноз', 'mkb10list': 'МКБ-10', 'lechpole': 'Назначенное лечение/оказанная помощь',
+    'trudospos': 'Трудоспособность', 'ishod': 'Исход', 'stacionarname': 'Медицинская эвакуация',
+    'fiovrach': 'Ф.И.О. врача', 'dmopole': 'Дополнительные исследования',
+}
+
+# Checkboxes printed together on one line after a caption, e.g. "Пульс: ритмичный".
+FLAG_CAPTIONS = {
+    **dict.fromkeys(('normalskin', 'blednost', 'sukhostskin', 'hydrosis', 'ikterusskin', 'acrocyan', 'cyan',
+                     'hyperemiaskin', 'sypskin'), 'Кожные покровы'),
+    **dict.fromkeys(('nopainlu', 'painlu', 'connlu', 'noconnlu'), 'Лимфатические узлы'),
+    **dict.fromkeys(('glandnalet', 'glandnetnalet'), 'Налёты'),
+    **dict.fromkeys(('pulsritm', 'pulsaritm'), 'Пульс'),
+    **dict.fromkeys(('ortner', 'merphy', 'meiorobson'), 'Положительные симптомы'),
+    **dict.fromkeys(tuple(f'urea{i}' for i in range(1, 9)), 'Мочеиспускание'),
+    **dict.fromkeys(('pasternatloc1', 'pasternatloc2', 'pasternatloc3'), 'Симптом поколачивания'),
+    **dict.fromkeys(('otekida', 'otekinet'), 'Периферические отёки'),
+    **dict.fromkeys(tuple(f'cmn{i}' for i in range(1, 12)), 'ЧМН'),
+    'nopatreflex': 'Патологические рефлексы',
+}
+
+GENERAL = 'Общее состояние'
+DIAGNOSIS = 'Диагноз и лечение'
+OTHER = 'Прочее'
+
+# Fields outside any group box of the form.
+GROUPS = {
+    'zhalobypole': GENERAL, 'anamnesispole': GENERAL, 'obschsost': GENERAL, 'soznanie': GENERAL,
+    'vashslider': GENERAL, 'dspole': DIAGNOSIS, 'mkb10list': DIAGNOSIS, 'lechpole': DIAGNOSIS,
+    'trudospos': DIAGNOSIS, 'ishod': DIAGNOSIS, 'stacionarname': DIAGNOSIS, 'fiovrach': DIAGNOSIS,
+    'dmopole': 'Дополнительные исследования',
+}
+
+# Section order of the text; group boxes not listed follow in form order.
+GROUP_ORDER = ('Паспортная часть', GENERAL, 'Жизненные показатели', 'Кожа и слизистые', 'Органы дыхания',
+               'Сердечно-сосудистая система', 'Органы ЖКТ', 'Мочеполовая система', 'Нервная система',
+               'Локальный статус', 'Дополнительные исследования', DIAGNOSIS)
+
+# Rendered in the header instead of the passport section.
+HEADER_FIELDS = {'patientfio'}
+
+_TRUE = {'true', '1', 'да', 'yes'}
+_CAMEL = re.compile(r'([a-z0-9])([A-Z])')
+_SEPARATORS = re.compile(r'[_\-]+')
+
+
+def human_label(name):
+    """Caption for a field the plan does not know (e.g. imported records)."""
+    s = _CAMEL.sub(r'\1 \2', _SEPARATORS.sub(' ', name)).strip()
+    return s[:1].upper() + s[1:]
+
+
+class Plan:
+    """Compiled rendering plan: name -> (position, group index, label, kind, caption)."""
+    __slots__ = ('fields', 'groups', 'other')
+
+    def __init__(self, fields, groups):
+        self.fields = fields
+        self.groups = groups
+        self.other = groups.index(OTHER)
+
+
+def _form_fields(path):
+    """(name, class, group box title, text) of the data widgets of a .ui file, in form order."""
+    out = []
+
+    def walk(el, group):
+        for child in el:
+            if child.tag != 'widget':
+                walk(child, group)
+                continue
+            cls, name = child.get('class'), child.get('name')
+            texts = {p.get('name'): p.findtext('string') for p in child.findall('property')}
+            inner = group
+            if cls == 'QGroupBox':
+                inner = texts.get('title') or name
+            elif cls in FIELD_KINDS and name:
+                out.append((name, cls, group, (texts.get('text') or '').strip()))
+            walk(child, inner)
+
+    walk(ET.parse(path).getroot(), None)
+    return out
+
+def compile_plan(path=FORM_UI, names=None):
+    """Plan of the form at ``path``, limited to the fields in ``names`` if given."""
+    fields = _form_fields(path)
+    if names is not None:
+        names = set(names)
+        fields = [f for f in fields if f[0] in names]
+    order = list(GROUP_ORDER)
+    for name, _, group, _ in fields:
+        group = GROUPS.get(name, group) or OTHER
+        if group not in order:
+            order.append(group)
+    if OTHER not in order:
+        order.append(OTHER)
+    group_index = {g: i for i, g in enumerate(order)}
+    plan = {}
+    for pos, (name, cls, group, text) in enumerate(fields):
+        if name in HEADER_FIELDS:
+            continue
+        kind = FIELD_KINDS[cls]
+        label = text if kind == 'flag' and text else LABELS.get(name) or human_label(name)
+        group = GROUPS.get(name, group) or OTHER
+        plan[name] = (pos, group_index[group], label, kind, FLAG_CAPTIONS.get(name))
+    return Plan(plan, order)
+
+
+_plans = {}
+_lock = threading.Lock()
+
+def get_plan(version=FORM_VERSION):
+    """Plan for a form version (its PERSISTED_FIELDS in the current .ui), compiled on first use.
+
+    Versions without a field list, e.g. written by a newer program, get the current plan.
+    """
+    if version not in PERSISTED_FIELDS:
+        version = FORM_VERSION
+    plan = _plans.get(version)
+    if plan is None:
+        with _lock:
+            plan = _plans.get(version)
+            if plan is None:
+                plan = _plans[version] = compile_plan(names=PERSISTED_FIELDS[version])
+    return plan
+
+
+def render(full, patient_fio=None, when=''):
+    """Epicrisis text of one case: only checked boxes and non-empty values, grouped by section."""
+    if not isinstance(full, dict):
+        full = {}
+    plan = get_plan(full.get(VERSION_KEY) or FORM_VERSION)
+    fields = plan.fields
+    sections = {}
+    extra = len(fields)
+    for name, v in full.items():
+        if v is None or v is False or v == '' or name[:1] == '_':
+            continue
+        spec = fields.get(name)
+        if spec is None:
+            if name in HEADER_FIELDS:
+                continue
+            extra += 1
+            spec = (extra, plan.other, human_label(name), 'text', None)
+        pos, group, label, kind, caption = spec
+        if kind == 'flag':
+            if not (v is True or str(v).strip().lower() in _TRUE):
+                continue
+            item = (pos, caption, label)
+        else:
+            if isinstance(v, str):
+                v = v.strip()
+                if not v:
+                    continue
+            item = (pos, None, f'{label}: {v}')
+        sections.setdefault(group, []).append(item)
+
+    if patient_fio is None:
+        patient_fio = full.get('patientfio') or ''
+    lines = [f'Пациент: {patient_fio}', f'Дата: {when}']
+    for group in sorted(sections):
+        lines.append('')
+        lines.append(f'--- {plan.groups[group]} ---')
+        items = sorted(sections[group])
+        i = 0
+        while i < len(items):
+            _, caption, text = items[i]
+            if caption is None:
+                lines.append(text)
+                i += 1
+                continue
+            # checked boxes of one caption go on one line
+            parts = [text]
+            i += 1
+            while i < len(items) and items[i][1] == caption:
+                parts.append(items[i][2])
+                i += 1
+            lines.append(f'{caption}: {", ".join(parts)}')
+    return '\n'.join(lines)
+
+def render_visit(visit):
+    """Text for a visit row as returned by models.db.get_visit_by_id."""
+    return render(visit.get('full_epicrisis'), visit.get('patient_fio') or '', visit.get('visit_datetime') or '')
@@ -0,0 +1,156 @@
+"""Streaming export of visits to xlsx or CSV.
+
+Rows are read in pages of CHUNK_SIZE (keyset on visit_datetime, id) and written
+as they arrive: openpyxl runs in write-only mode and CSV is written line by line,
+so memory use does not depend on the number of exported visits. The reads are
+served by the DB service in client mode (see models/db_service.py).
+"""
+import csv
+import os
+
+from config import DB_SERVICE
+from models.db import get_conn, decode_epicrisis, list_epicrisis_fields, _day_bounds
+
+try:
+    from openpyxl import Workbook
+except Exception:
+    Workbook = None
+
+# key -> (SQL expression, header)
+COLUMNS = {
+    'id': ('v.id', 'id'),
+    'visit_datetime': ('v.visit_datetime', 'ДатаВремя'),
+    'patient_number': ('p.patient_number', 'Номер пациента'),
+    'patient_fio': ('p.fio', 'ФИО'),
+    'birthdate': ('p.birthdate', 'Дата рождения'),
+    'phone': ('p.phone', 'Телефон'),
+    'organisation': ('p.organisation', 'Организация'),
+    'vid_priema': ('v.vid_priema', 'Вид приёма'),
+    'obschsost': ('v.obschsost', 'Общее состояние'),
+    'soznanie': ('v.soznanie', 'Сознание'),
+    'examiner': ('v.examiner', 'Осмотрел'),
+    'diagnosis': ('v.diagnosis', 'Диагноз'),
+    'mkb_code': ('v.mkb_code', 'МКБ'),
+    'outcome': ('v.outcome', 'Исход'),
+    'evacuation_place': ('v.evacuation_place', 'Место эвакуации'),
+}
+DEFAULT_COLUMNS = ['id', 'visit_datetime', 'patient_fio', 'mkb_code']
+EPICRISIS_PREFIX = 'full_epicrisis.'
+CHUNK_SIZE = 1000
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def epicrisis_fields():
+    """Field names that occur in stored epicrises, for the column chooser."""
+    return sorted(k for k in list_epicrisis_fields() if not k.startswith('_'))
+
+def header(key):
+    if key.startswith(EPICRISIS_PREFIX):
+        return key[len(EPICRISIS_PREFIX):]
+    return COLUMNS[key][1]
+
+def count_visits(start_date, end_date):
+    start_date, end_date = _day_bounds(start_date, end_date)
+    return get_conn().execute("SELECT COUNT(*) FROM visits WHERE visit_datetime >= ? AND visit_datetime <= ?",
+                              (start_date, end_date)).fetchone()[0]
+
+def export_page(start_date, end_date, columns=None, after=None, limit=CHUNK_SIZE):
+    """(rows, cursor) of one page of export rows, oldest first.
+
+    Pass the returned cursor as ``after`` to get the next page; it is None after the last one.
+    """
+    columns = columns or DEFAULT_COLUMNS
+    base = [c for c in columns if not c.startswith(EPICRISIS_PREFIX)]
+    need_full = len(base) != len(columns)
+    exprs = ['v.visit_datetime', 'v.id'] + [COLUMNS[c][0] for c in base] + (['v.full_epicrisis'] if need_full else [])
+    start_date, end_date = _day_bounds(start_date, end_date)
+    where = "v.visit_datetime >= ? AND v.visit_datetime <= ?"
+    params = [start_date, end_date]
+    if after:
+        where += " AND (v.visit_datetime, v.id) > (?, ?)"
+        params += after
+    rows = get_conn().execute(f"""SELECT {', '.join(exprs)} FROM visits v LEFT JOIN patients p ON p.id=v.patient_id
+                                  WHERE {where} ORDER BY v.visit_datetime, v.id LIMIT ?""", (*params, limit)).fetchall()
+    pos = {c: i + 2 for i, c in enumerate(base)}
+    page = []
+    for r in rows:
+        full = decode_epicrisis(r[-1]) if need_full else None
+        if not isinstance(full, dict):
+            full = {}
+        out = []
+        for c in columns:
+            if c.startswith(EPICRISIS_PREFIX):
+                v = full.get(c[len(EPICRISIS_PREFIX):])
+                out.append('Да' if v is True else '' if v in (None, False) else v)
+            else:
+                out.append(r[pos[c]])
+        page.append(out)
+    return page, ([rows[-1][0], rows[-1][1]] if len(rows) == limit else None)
+
+def iter_rows(start_date, end_date, columns=None):
+    """Yield export rows (lists of values in ``columns`` order) for a period, oldest first."""
+    after = None
+    while True:
+        page, after = export_page(start_date, end_date, columns, after)
+        yield from page
+        if after is None:
+            return
+
+def export_visits(path, start_date, end_date, columns=None, progress=None, cancelled=None):
+    """Write a period to ``path`` (.xlsx if openpyxl is available, CSV otherwise). Returns the path written.
+
+    ``progress(done, total)`` is called after every chunk; if ``cancelled()`` becomes true
+    the export stops with ExportCancelled and the partial file is removed.
+    """
+    columns = columns or DEFAULT_COLUMNS
+    total = count_visits(start_date, end_date)
+    xlsx = path.lower().endswith('.xlsx') and Workbook is not None
+    if not xlsx and not path.lower().endswith('.csv'):
+        path = path + '.csv'
+    rows = iter_rows(start_date, end_date, columns)
+    done = 0
+
+    def tick():
+        if cancelled and cancelled():
+            raise ExportCancelled()
+        if progress:
+            progress(done, total)
+
+    try:
+        if xlsx:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append([header(c) for c in columns])
+            for row in rows:
+                ws.append(['' if v is None else v for v in row])
+                done += 1
+                if done % CHUNK_SIZE == 0:
+                    tick()
+            tick()
+            wb.save(path)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([header(c) for c in columns])
+                for row in rows:
+                    writer.writerow(['' if v is None else v for v in row])
+                    done += 1
+                    if done % CHUNK_SIZE == 0:
+                        tick()
+                tick()
+    except ExportCancelled:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+if DB_SERVICE:
+    # client mode: the export reads go to the DB service (models/db_service.py)
+    from models.db_service import install_client
+    install_client(globals())
@@ -0,0 +1,92 @@
+"""In-memory prefix index of patient names for FIO autocomplete.
+
+Names are loaded once from the database (see models.db.load_fio_index) and then
+kept up to date by the main window after each committed save. Lookups are binary searches over sorted keys,
+so typing latency does not depend on the number of patients.
+"""
+import bisect
+import threading
+
+
+def normalize(text: str) -> str:
+    """Case-folded, 'ё'→'е', single-spaced form used for matching."""
+    return ' '.join((text or '').casefold().replace('ё', 'е').split())
+
+
+class FioIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = set()
+        self._full = []    # (normalized full name, name), sorted
+        self._tokens = []  # (normalized name from its 2nd, 3rd... word on, name), sorted
+        self.loaded = False
+
+    def load(self, names):
+        full, tokens, known = [], [], set()
+        for name in names:
+            if name and name not in known:
+                known.add(name)
+                self._entries(name, full, tokens)
+        full.sort()
+        tokens.sort()
+        with self._lock:
+            self._names, self._full, self._tokens = known, full, tokens
+            self.loaded = True
+
+    def add(self, name):
+        if not name:
+            return
+        with self._lock:
+            if name in self._names:
+                return
+            self._names.add(name)
+            full, tokens = [], []
+            self._entries(name, full, tokens)
+            for e in full:
+                bisect.insort(self._full, e)
+            for e in tokens:
+                bisect.insort(self._tokens, e)
+
+    def search(self, text: str, limit=50):
+        """Names whose words start with the typed words, full-name prefix matches first."""
+        words = normalize(text).split()
+        if not words:
+            return []
+        query = ' '.join(words)
+        rest = words[1:]
+        out, seen = [], set()
+        with self._lock:
+            for entries in (self._full, self._tokens):
+                # all words typed after the first must also prefix some word of the name
+                i = bisect.bisect_left(entries, (words[0],))
+                while i < len(entries) and len(out) < limit:
+                    key, name = entries[i]
+                    if not key.startswith(words[0]):
+                        break
+                    i += 1
+                    if name in seen:
+                        continue
+                    if key.startswith(query) or self._has_word_prefixes(key, rest):
+                        seen.add(name)
+                        out.append(name)
+        return out
+
+    @staticmethod
+    def _entries(name, full, tokens):
+        key = normalize(name)
+        full.append((key, name))
+        words = key.split(' ')
+        for i in range(1, len(words)):
+            tokens.append((' '.join(words[i:]), name))
+
+    @staticmethod
+    def _has_word_prefixes(key, prefixes):
+        words = key.split(' ')
+        return all(any(w.startswith(p) for w in words) for p in prefixes)
+
+
+_index = FioIndex()
+
+
+def get_index() -> FioIndex:
+    return _index
@@ -0,0 +1,156 @@
+"""Normalised patient keys and duplicate scoring, without database access.
+
+The same person is entered as "+7 900 123-45-67" and "89001234567", as
+"Иванов  Иван" and "иванов иван", as "Семёнова" and "Семенова". The keys below are
+stored next to the raw columns (patients.phone_norm, fio_norm, fio_key, see
+migration 8) and indexed:
+
+* ``phone_norm`` - digits only, Russian mobile/landline numbers as 7XXXXXXXXXX;
+  exact matches are used by save_patient and the importer;
+* ``fio_norm`` - lower case, ё -> е, punctuation dropped, single spaces; matched
+  exactly together with birthdate;
+* ``fio_key`` - phonetic key of the surname plus the first letter of the name, a
+  blocking key: patients with the same birthdate and fio_key are compared by
+  similarity() in models/dedup.py.
+"""
+import re
+from difflib import SequenceMatcher
+
+# similarity() at or above which two records are merged by the batch job / shown for review
+MERGE_THRESHOLD = 0.9
+REVIEW_THRESHOLD = 0.75
+
+_NON_DIGITS = re.compile(r'\D+')
+_NON_NAME = re.compile(r'[^\w\s-]+')
+_SPACES = re.compile(r'\s+')
+_NOT_LETTER = re.compile(r'[^a-zа-я]+')
+
+# Sound-alike groups for the phonetic key: voiced consonants become voiceless,
+# vowels fold into three classes, soft/hard signs disappear.
+_PHONETIC = str.maketrans({
+    'б': 'п', 'в': 'ф', 'г': 'к', 'д': 'т', 'ж': 'ш', 'з': 'с',
+    'о': 'а', 'ы': 'а', 'я': 'а', 'э': 'и', 'е': 'и', 'й': 'и', 'ю': 'у',
+    'ь': None, 'ъ': None,
+})
+_CLUSTERS = (('тьс', 'ц'), ('тс', 'ц'), ('дс', 'ц'), ('сч', 'щ'), ('зч', 'щ'), ('жч', 'щ'), ('стн', 'сн'))
+# feminine surname endings -> masculine, so that Иванов/Иванова share a block
+_FEMININE = (('ская', 'ский'), ('цкая', 'цкий'), ('ова', 'ов'), ('ева', 'ев'), ('ина', 'ин'), ('ына', 'ын'))
+
+FIO_WEIGHTS = (0.5, 0.3, 0.2)
+
+
+def normalize_phone(phone):
+    """Digits of a phone number, 8XXXXXXXXXX / 9XXXXXXXXX written as 7XXXXXXXXXX; None if too short."""
+    digits = _NON_DIGITS.sub('', phone or '')
+    if len(digits) == 11 and digits[0] == '8':
+        digits = '7' + digits[1:]
+    elif len(digits) == 10 and digits[0] == '9':
+        digits = '7' + digits
+    return digits if len(digits) >= 5 else None
+
+def normalize_fio(fio):
+    s = _NON_NAME.sub(' ', (fio or '').lower().replace('ё', 'е'))
+    s = _SPACES.sub(' ', s).strip()
+    return s or None
+
+def phonetic(word):
+    """Phonetic code of one Russian word (Latin letters are kept as they are)."""
+    w = _NOT_LETTER.sub('', (word or '').lower().replace('ё', 'е'))
+    for ending, masculine in _FEMININE:
+        if w.endswith(ending) and len(w) > len(ending) + 1:
+            w = w[:-len(ending)] + masculine
+            break
+    for cluster, sound in _CLUSTERS:
+        w = w.replace(cluster, sound)
+    w = w.translate(_PHONETIC)
+    out = []
+    for ch in w:
+        if not out or out[-1] != ch:
+            out.append(ch)
+    return ''.join(out)
+
+def fio_key(fio):
+    """Blocking key: phonetic surname + first letter of the given name."""
+    parts = (normalize_fio(fio) or '').split()
+    if not parts:
+        return None
+    key = phonetic(parts[0])
+    if len(parts) > 1:
+        key += ' ' + parts[1][0]
+    return key or None
+
+def patient_keys(fio, phone):
+    """(phone_norm, fio_norm, fio_key) for the patients table."""
+    return normalize_phone(phone), normalize_fio(fio), fio_key(fio)
+
+
+def _token_similarity(a, b):
+    if len(a) == 1 or len(b) == 1:
+        # initials: "Иванов И.И."
+        return 1.0 if a[0] == b[0] else 0.0
+    if a == b:
+        return 1.0
+    if phonetic(a) == phonetic(b):
+        return 0.95
+    return SequenceMatcher(None, a, b).ratio()
+
+def _gender(tokens):
+    """'m', 'f' or None from the patronymic or the surname ending."""
+    if len(tokens) > 2:
+        if tokens[2].endswith('ич'):
+            return 'm'
+        if tokens[2].endswith('на'):
+            return 'f'
+    surname = tokens[0]
+    if surname.endswith(('ова', 'ева', 'ина', 'ына', 'ская', 'цкая')):
+        return 'f'
+    if surname.endswith(('ов', 'ев', 'ин', 'ын', 'ский', 'цкий')):
+        return 'm'
+    return None
+
+def fio_similarity(a, b):
+    """0..1, surname weighs most; tokens missing on one side (no patronymic) are not counted."""
+    ta, tb = (normalize_fio(a) or '').split(), (normalize_fio(b) or '').split()
+    if not ta or not tb:
+        return None
+    total = weight = 0.0
+    for x, y, w in zip(ta, tb, FIO_WEIGHTS):
+        total += w * _token_similarity(x, y)
+        weight += w
+    ga, gb = _gender(ta), _gender(tb)
+    if ga and gb and ga != gb:
+        # Иванов/Иванова with one birthdate are twins or spouses, not a typo
+        return total / weight / 2
+    return total / weight
+
+def birthdate_similarity(a, b):
+    if not a or not b:
+        return None
+    if a == b:
+        return 1.0
+    # one mistyped digit or day and month swapped
+    if len(a) == len(b) == 10:
+        if sum(x != y for x, y in zip(a, b)) == 1 or (a[:4] == b[:4] and a[5:7] == b[8:10] and a[8:10] == b[5:7]):
+            return 0.5
+    return 0.0
+
+def similarity(a, b):
+    """Probability-like score 0..1 that two patient dicts (fio, birthdate, phone) are one person.
+
+    FIO, birthdate and phone are weighted 0.5/0.3/0.2; a component missing on either
+    side is left out, so two records that agree on everything they have score 1.0.
+    """
+    parts = []
+    fio = fio_similarity(a.get('fio'), b.get('fio'))
+    if fio is not None:
+        parts.append((0.5, fio))
+    bd = birthdate_similarity(a.get('birthdate'), b.get('birthdate'))
+    if bd is not None:
+        parts.append((0.3, bd))
+    pa, pb = normalize_phone(a.get('phone')), normalize_phone(b.get('phone'))
+    if pa and pb:
+        parts.append((0.2, 1.0 if pa == pb else 0.0))
+    if fio is None or len(parts) < 2:
+        # a name alone, or a phone alone, is not enough to call two records one person
+        return 0.0
+    return sum(w * s for w, s in parts) / sum(w for w, _ in parts)
@@ -0,0 +1,189 @@
+"""Bulk import of historical patients and visits from CSV or JSON Lines.
+
+One record = one visit together with its patient. Recognised keys are the
+patients columns (fio, birthdate, phone, organisation) and the visits columns
+(visit_datetime, vid_priema, obschsost, soznanie, examiner, diagnosis, mkb_code,
+outcome, evacuation_place, full_epicrisis). full_epicrisis may be a dict
+(JSON Lines) or a JSON string (CSV). visit_datetime is accepted in the formats of
+DATETIME_FORMATS and stored as 'YYYY-MM-DD HH:MM:SS'; records whose date cannot be
+read are counted and skipped, not imported.
+
+Patients are deduplicated against the database and the file itself by the
+normalised phone, then by normalised fio+birthdate, the same keys save_patient
+uses (models.identity). Rows, their search
+index entries and visit_stats counters are written with executemany in chunks
+of ``chunk_size`` records, one transaction per chunk; the number of committed
+records is stored in import_progress in the same transaction, so an
+interrupted import continues where it stopped.
+"""
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from models import stats
+from models.identity import patient_keys
+from models.db import (transaction, get_conn, init_db, encode_epicrisis, _epicrisis_text,
+                       _generate_patient_number)
+
+# visit_datetime formats seen in legacy exports, tried in order
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d',
+                    '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S.%f',
+                    '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+VISIT_FIELDS = ('visit_datetime', 'vid_priema', 'obschsost', 'soznanie', 'examiner', 'diagnosis',
+                'mkb_code', 'outcome', 'evacuation_place')
+
+
+def read_records(path):
+    """Yield records one by one from a .csv or .jsonl/.ndjson file."""
+    if path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                yield row
+
+
+def _chunks(records, size):
+    chunk = []
+    for r in records:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _next_id(conn, table):
+    # explicit ids let one executemany insert patients and link visits/FTS rows without lastrowid
+    row = conn.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name=?), 0), "
+                       f"COALESCE((SELECT MAX(id) FROM {table}), 0))", (table,)).fetchone()
+    return row[0] + 1
+
+
+class _PatientKeys:
+    """phone_norm -> id and (fio_norm, birthdate) -> id for all known patients."""
+
+    def __init__(self, conn):
+        self.by_phone = {}
+        self.by_fio_bd = {}
+        for pid, fio, birthdate, phone in conn.execute("SELECT id, fio_norm, birthdate, phone_norm FROM patients ORDER BY id"):
+            self.remember(pid, fio, birthdate, phone)
+
+    def lookup(self, fio, birthdate, phone):
+        pid = self.by_phone.get(phone) if phone else None
+        if pid is None and fio and birthdate:
+            pid = self.by_fio_bd.get((fio, birthdate))
+        return pid
+
+    def remember(self, pid, fio, birthdate, phone):
+        if phone:
+            self.by_phone.setdefault(phone, pid)
+        if fio and birthdate:
+            self.by_fio_bd.setdefault((fio, birthdate), pid)
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_visit_datetime(value):
+    """visit_datetime as 'YYYY-MM-DD HH:MM:SS', or None if it is empty or not in DATETIME_FORMATS."""
+    value = _clean(value)
+    if not value:
+        return None
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            pass
+    return None
+
+
+def import_file(path, chunk_size=5000, progress=None, on_reject=None):
+    """Import ``path``; returns (records imported now, new patients, records rejected).
+
+    ``progress(done, rate)`` is called per chunk, ``on_reject(number, visit_datetime)``
+    for each record skipped because of its date (``number`` counts from 1).
+    """
+    return import_records(read_records(path), os.path.abspath(path), chunk_size, progress, on_reject)
+
+
+def import_records(records, source, chunk_size=5000, progress=None, on_reject=None):
+    """Import an iterable of records under the name ``source`` (the resume key in import_progress).
+
+    A repeated import of the same source skips the records already committed, so
+    ``records`` must yield them in the same order every time.
+    """
+    init_db()
+    conn = get_conn()
+    row = conn.execute("SELECT records_done FROM import_progress WHERE source=?", (source,)).fetchone()
+    skip = row[0] if row else 0
+    done = skip
+    keys = _PatientKeys(conn)
+    records = iter(records)
+    for _ in range(skip):
+        if next(records, None) is None:
+            break
+
+    started = time.perf_counter()
+    imported = new_patients = rejected = 0
+    for chunk in _chunks(records, chunk_size):
+        with transaction() as conn:
+            next_pid = _next_id(conn, 'patients')
+            next_vid = _next_id(conn, 'visits')
+            patients, visits, fts = [], [], []
+            for number, r in enumerate(chunk, done + 1):
+                vdt = parse_visit_datetime(r.get('visit_datetime'))
+                if vdt is None:
+                    rejected += 1
+                    if on_reject:
+                        on_reject(number, r.get('visit_datetime'))
+                    continue
+                fio, birthdate, phone = _clean(r.get('fio')), _clean(r.get('birthdate')), _clean(r.get('phone'))
+                phone_norm, fio_norm, fio_key = patient_keys(fio, phone)
+                pid = keys.lookup(fio_norm, birthdate, phone_norm)
+                if pid is None:
+                    pid = next_pid
+                    next_pid += 1
+                    patients.append((pid, _generate_patient_number(pid), fio, birthdate, phone, _clean(r.get('organisation')),
+                                     phone_norm, fio_norm, fio_key))
+                    keys.remember(pid, fio_norm, birthdate, phone_norm)
+                full = r.get('full_epicrisis') or {}
+                if isinstance(full, str):
+                    try:
+                        full = json.loads(full)
+                    except ValueError:
+                        full = {'text': full}
+                v = {k: _clean(r.get(k)) for k in VISIT_FIELDS}
+                visits.append((next_vid, pid, vdt, vdt[:10], v['vid_priema'], v['obschsost'], v['soznanie'], v['examiner'],
+                               v['diagnosis'], v['mkb_code'], v['outcome'], v['evacuation_place'], encode_epicrisis(full, conn)))
+                fts.append((next_vid, fio or '', v['diagnosis'] or '', v['mkb_code'] or '', _epicrisis_text(full)))
+                next_vid += 1
+            conn.executemany("""INSERT INTO patients (id, patient_number, fio, birthdate, phone, organisation, phone_norm, fio_norm, fio_key)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", patients)
+            conn.executemany("""INSERT INTO visits (id, patient_id, visit_datetime, visit_date, vid_priema, obschsost, soznanie, examiner, diagnosis, mkb_code, outcome, evacuation_place, full_epicrisis)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", visits)
+            conn.executemany("INSERT INTO visits_fts (rowid, patient_fio, diagnosis, mkb_code, epicrisis) VALUES (?, ?, ?, ?, ?)", fts)
+            if visits:
+                stats.record_visit_ids(conn, visits[0][0], visits[-1][0])
+            done += len(chunk)
+            conn.execute("""INSERT INTO import_progress (source, records_done) VALUES (?, ?)
+                            ON CONFLICT(source) DO UPDATE SET records_done=excluded.records_done, updated_at=CURRENT_TIMESTAMP""",
+                         (source, done))
+        imported += len(visits)
+        new_patients += len(patients)
+        if progress:
+            elapsed = time.perf_counter() - started
+            progress(done, imported / elapsed if elapsed else 0.0)
+    return imported, new_patients, rejected
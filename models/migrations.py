@@ -0,0 +1,186 @@
+"""Versioned schema migrations for app.db.
+
+The applied version is kept in ``PRAGMA user_version``. Each migration runs in its
+own transaction together with the version bump, so an interrupted upgrade leaves
+the file at the last fully applied version and is simply resumed on next start.
+"""
+
+def _m1_hot_query_indexes(conn):
+    # find_patient(phone=...) and find_patient(fio=..., birthdate=...)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_phone ON patients(phone)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_fio_birthdate ON patients(fio, birthdate)")
+    # list_visits_between / list_all_visits: range + ORDER BY visit_datetime
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visits_datetime ON visits(visit_datetime)")
+    # visits of a patient and ON DELETE CASCADE from patients
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visits_patient ON visits(patient_id, visit_datetime)")
+
+def _m2_visit_date(conn):
+    # Stored calendar date so that "visits of a day" is an index seek instead of date() per row.
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(visits)").fetchall()]
+    if 'visit_date' not in cols:
+        conn.execute("ALTER TABLE visits ADD COLUMN visit_date TEXT")
+    conn.execute("UPDATE visits SET visit_date = date(visit_datetime) WHERE visit_date IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visits_date ON visits(visit_date, visit_datetime)")
+
+def _m3_search_index(conn):
+    # Full-text index over patient FIO, diagnosis, MKB code and epicrisis text; rowid = visits.id.
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS visits_fts USING fts5(
+        patient_fio, diagnosis, mkb_code, epicrisis,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')""")
+    from models.db import rebuild_search_index
+    rebuild_search_index(conn)
+
+def _m4_import_progress(conn):
+    # Resume point of models/importer.py: records of a source file already committed.
+    conn.execute("""CREATE TABLE IF NOT EXISTS import_progress (
+        source TEXT PRIMARY KEY,
+        records_done INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
+
+def _m5_visit_stats(conn):
+    # Daily counters per dimension value, maintained by models/stats.py.
+    conn.execute("""CREATE TABLE IF NOT EXISTS visit_stats (
+        dimension TEXT NOT NULL,
+        day TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, day, value)) WITHOUT ROWID""")
+    from models.stats import rebuild
+    rebuild(conn)
+
+def _m6_draft_journal(conn):
+    # Append-only autosave journal of the main form (models/drafts.py).
+    conn.execute("""CREATE TABLE IF NOT EXISTS draft_journal (
+        id INTEGER PRIMARY KEY,
+        workstation TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        saved_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        fields TEXT NOT NULL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_draft_journal_ws ON draft_journal(workstation, seq)")
+
+def _m7_compact_epicrisis(conn):
+    # Field-name dictionary of the compact full_epicrisis format, then re-encode old JSON rows.
+    conn.execute("CREATE TABLE IF NOT EXISTS epicrisis_fields (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    from models.db import encode_epicrisis, decode_epicrisis, _forget_epicrisis_fields
+    _forget_epicrisis_fields()
+    last = 0
+    try:
+        while True:
+            rows = conn.execute("""SELECT id, full_epicrisis FROM visits
+                                   WHERE id > ? AND typeof(full_epicrisis) = 'text' ORDER BY id LIMIT 2000""", (last,)).fetchall()
+            if not rows:
+                break
+            conn.executemany("UPDATE visits SET full_epicrisis = ? WHERE id = ?",
+                             [(encode_epicrisis(decode_epicrisis(value), conn), vid) for vid, value in rows])
+            last = rows[-1][0]
+    except BaseException:
+        _forget_epicrisis_fields()
+        raise
+
+
+def _m8_patient_identity(conn):
+    # Normalised identity keys of patients (models/identity.py) and the log of merged duplicates.
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(patients)").fetchall()]
+    for col in ('phone_norm', 'fio_norm', 'fio_key'):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE patients ADD COLUMN {col} TEXT")
+    from models.identity import patient_keys
+    last = 0
+    while True:
+        rows = conn.execute("SELECT id, fio, phone FROM patients WHERE id > ? ORDER BY id LIMIT 5000", (last,)).fetchall()
+        if not rows:
+            break
+        conn.executemany("UPDATE patients SET phone_norm=?, fio_norm=?, fio_key=? WHERE id=?",
+                         [(*patient_keys(fio, phone), pid) for pid, fio, phone in rows])
+        last = rows[-1][0]
+    # the raw-column indexes of migration 1 are replaced by the normalised ones
+    conn.execute("DROP INDEX IF EXISTS idx_patients_phone")
+    conn.execute("DROP INDEX IF EXISTS idx_patients_fio_birthdate")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_phone_norm ON patients(phone_norm)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_fio_norm ON patients(fio_norm, birthdate)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_block ON patients(birthdate, fio_key)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS patient_merges (
+        merged_id INTEGER PRIMARY KEY,
+        merged_number TEXT,
+        merged_fio TEXT,
+        into_id INTEGER NOT NULL,
+        score REAL,
+        visits_moved INTEGER NOT NULL DEFAULT 0,
+        merged_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
+
+
+# (version, function) in ascending order; append new migrations at the end.
+MIGRATIONS = [
+    (1, _m1_hot_query_indexes),
+    (2, _m2_visit_date),
+    (3, _m3_search_index),
+    (4, _m4_import_progress),
+    (5, _m5_visit_stats),
+    (6, _m6_draft_journal),
+    (7, _m7_compact_epicrisis),
+    (8, _m8_patient_identity),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn) -> int:
+    """Apply all pending migrations on an autocommit connection. Returns the new version."""
+    current = get_version(conn)
+    for version, func in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            func(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        current = version
+    return current
+
+
+# Queries on the hot path with sample parameters; none of them may fall back to a full SCAN.
+# The SQL is the one the functions run (constants of models/db.py and models/dedup.py).
+def hot_queries():
+    from models import db
+    from models.dedup import BLOCKS
+    between = (db.VISITS_BETWEEN_SQL, ('', '', -1, 0))
+    return {
+        'find_patient by phone': (db.PATIENT_BY_PHONE_SQL, ('',)),
+        'find_patient by fio+birthdate': (db.PATIENT_BY_FIO_SQL, ('', '')),
+        'duplicate candidates by phone': (BLOCKS['phone'], ()),
+        'duplicate candidates by birthdate+fio_key': (BLOCKS['birthdate+fio_key'], ()),
+        'list_visits_between': (between[0].format(cols=db.FULL_COLUMNS), between[1]),
+        'list_visits_between brief': (between[0].format(cols=db.BRIEF_COLUMNS), between[1]),
+        'list_visits_for_date': (db.VISITS_FOR_DATE_SQL, ('',)),
+        'list_all_visits': (db.ALL_VISITS_SQL.format(cols=db.FULL_COLUMNS), (1,)),
+        'rename patient in search index': (db.PATIENT_FTS_SQL, ('', 0)),
+    }
+
+
+def explain(conn, sql, params=()):
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+def check_query_plans(conn):
+    """Raise RuntimeError if any of hot_queries() is planned as a full table SCAN.
+
+    An ordered walk over an index ("SCAN v USING INDEX ...", e.g. ORDER BY ... LIMIT)
+    is bounded by the LIMIT and is accepted, as are the FTS5 table (searched through
+    its own index) and subqueries materialised from an index search.
+    """
+    bad = []
+    for name, (sql, params) in hot_queries().items():
+        plan = explain(conn, sql, params)
+        built = {d.split()[1] for d in plan if d.startswith('MATERIALIZE ')}
+        scans = [d for d in plan if d.startswith('SCAN') and ' USING ' not in d
+                 and ' VIRTUAL TABLE ' not in d and d.split()[1] not in built]
+        if scans:
+            bad.append(f"{name}: {'; '.join(scans)}")
+    if bad:
+        raise RuntimeError('Full table scan in hot queries:\n' + '\n'.join(bad))
@@ -0,0 +1,247 @@
+"""МКБ-10 (ICD-10) classifier helpers and the code index behind the mkb10list completer.
+
+The classifier is resources/mkb_codes.json: a list of {"code": "J20.9", "desc": ...}
+records, optionally with "desc_ru" / "desc_lat" (all descriptions are searchable, the
+Russian one is shown). The first load compiles it into a compact marshal file next to
+it (MKB_CACHE, rebuilt when the JSON changes); later starts read only that. Searches
+are binary searches over sorted code and word keys, independent of the classifier size.
+"""
+import bisect
+import json
+from array import array
+import marshal
+import os
+import re
+import threading
+from config import BASE_DIR
+
+MKB_SOURCE = os.path.join(BASE_DIR, 'resources', 'mkb_codes.json')
+MKB_CACHE = os.path.join(BASE_DIR, 'resources', 'mkb_codes.idx')
+_CACHE_FORMAT = 1
+
+# (chapter, first code, last code, title); codes compare as 'A00' <= code[:3] <= 'B99'
+CHAPTERS = [
+    ('I', 'A00', 'B99', 'Некоторые инфекционные и паразитарные болезни'),
+    ('II', 'C00', 'D48', 'Новообразования'),
+    ('III', 'D50', 'D89', 'Болезни крови, кроветворных органов и отдельные нарушения, вовлекающие иммунный механизм'),
+    ('IV', 'E00', 'E90', 'Болезни эндокринной системы, расстройства питания и нарушения обмена веществ'),
+    ('V', 'F00', 'F99', 'Психические расстройства и расстройства поведения'),
+    ('VI', 'G00', 'G99', 'Болезни нервной системы'),
+    ('VII', 'H00', 'H59', 'Болезни глаза и его придаточного аппарата'),
+    ('VIII', 'H60', 'H95', 'Болезни уха и сосцевидного отростка'),
+    ('IX', 'I00', 'I99', 'Болезни системы кровообращения'),
+    ('X', 'J00', 'J99', 'Болезни органов дыхания'),
+    ('XI', 'K00', 'K93', 'Болезни органов пищеварения'),
+    ('XII', 'L00', 'L99', 'Болезни кожи и подкожной клетчатки'),
+    ('XIII', 'M00', 'M99', 'Болезни костно-мышечной системы и соединительной ткани'),
+    ('XIV', 'N00', 'N99', 'Болезни мочеполовой системы'),
+    ('XV', 'O00', 'O99', 'Беременность, роды и послеродовой период'),
+    ('XVI', 'P00', 'P96', 'Отдельные состояния, возникающие в перинатальном периоде'),
+    ('XVII', 'Q00', 'Q99', 'Врождённые аномалии (пороки развития), деформации и хромосомные нарушения'),
+    ('XVIII', 'R00', 'R99', 'Симптомы, признаки и отклонения от нормы, не классифицированные в других рубриках'),
+    ('XIX', 'S00', 'T98', 'Травмы, отравления и некоторые другие последствия воздействия внешних причин'),
+    ('XX', 'V01', 'Y98', 'Внешние причины заболеваемости и смертности'),
+    ('XXI', 'Z00', 'Z99', 'Факторы, влияющие на состояние здоровья и обращения в учреждения здравоохранения'),
+    ('XXII', 'U00', 'U85', 'Коды для особых целей'),
+]
+
+# Cyrillic look-alike letters typed on a Russian layout
+_LATIN = str.maketrans('АВСЕНКМОРТХ', 'ABCEHKMOPTX')
+_WORD = re.compile(r'\w+')
+_CODE_QUERY = re.compile(r'^[A-Z][0-9]{0,2}(\.?[0-9]{0,2})?$')
+
+
+def chapter_of(code: str):
+    """Roman chapter number for an МКБ-10 code such as 'J20.9', or None if it is not a valid code."""
+    head = (code or '').strip().upper()[:3]
+    if len(head) < 3:
+        return None
+    head = head.translate(_LATIN)
+    for chapter, first, last, _ in CHAPTERS:
+        if first <= head <= last:
+            return chapter
+    return None
+
+
+def code_key(code: str) -> str:
+    """Sort/search key of a code: upper case, Latin letters, no dot ('j20.9' -> 'J209')."""
+    return (code or '').strip().upper().translate(_LATIN).replace('.', '').replace(' ', '')
+
+def _words(text):
+    return _WORD.findall((text or '').casefold().replace('ё', 'е'))
+
+
+def compile_records(records):
+    """Compact, sorted form of the classifier (what MKB_CACHE holds).
+
+    Words of the descriptions are a sorted vocabulary; the ids of the entries containing
+    each word are concatenated in vocabulary order into one uint32 array, so all entries
+    with a word prefix are one contiguous slice of it.
+    """
+    entries = []
+    for r in records:
+        code = (r.get('code') or '').strip()
+        if not code:
+            continue
+        texts = [r[k] for k in ('desc_ru', 'desc', 'desc_lat', 'name') if r.get(k)]
+        title = r.get('desc_ru') or r.get('name') or r.get('desc') or ''
+        entries.append((code_key(code), code, title, set(_words(' '.join(texts)))))
+    entries.sort()
+    postings = {}
+    for i, e in enumerate(entries):
+        for w in e[3]:
+            postings.setdefault(w, []).append(i)
+    vocab = sorted(postings)
+    ids, offsets = array('I'), array('I', [0])
+    for w in vocab:
+        ids.extend(postings[w])
+        offsets.append(len(ids))
+    # titles stay one UTF-8 blob, decoded only for the entries a search returns
+    blob, title_offsets = bytearray(), array('I', [0])
+    for e in entries:
+        blob += e[2].encode('utf-8')
+        title_offsets.append(len(blob))
+    return {'format': _CACHE_FORMAT, 'keys': '\n'.join(e[0] for e in entries), 'codes': '\n'.join(e[1] for e in entries),
+            'titles': bytes(blob), 'title_offsets': title_offsets.tobytes(), 'vocab': '\n'.join(vocab),
+            'ids': ids.tobytes(), 'offsets': offsets.tobytes()}
+
+def _unpack(data):
+    for name in ('keys', 'codes', 'vocab'):
+        data[name] = data[name].split('\n') if data[name] else []
+    for name in ('ids', 'offsets', 'title_offsets'):
+        a = array('I')
+        a.frombytes(data[name])
+        data[name] = a
+    return data
+
+def _source_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def load_compiled(source=MKB_SOURCE, cache=MKB_CACHE):
+    """Compiled classifier from the cache, recompiling it when the source changed."""
+    sig = _source_signature(source)
+    try:
+        with open(cache, 'rb') as f:
+            data = marshal.load(f)
+        if data.get('format') == _CACHE_FORMAT and data.get('source') == sig:
+            return _unpack(data)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    with open(source, encoding='utf-8') as f:
+        data = compile_records(json.load(f))
+    data['source'] = sig
+    try:
+        tmp = cache + '.tmp'
+        with open(tmp, 'wb') as f:
+            marshal.dump(data, f)
+        os.replace(tmp, cache)
+    except OSError:
+        pass
+    return _unpack(data)
+
+
+class MkbIndex:
+    """Code-prefix and word-prefix search over the classifier, loaded on first use."""
+
+    def __init__(self, source=MKB_SOURCE, cache=MKB_CACHE):
+        self.source, self.cache = source, cache
+        self._lock = threading.Lock()
+        self._data = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def load(self):
+        with self._lock:
+            if self._data is None:
+                try:
+                    self._data = load_compiled(self.source, self.cache)
+                except OSError as e:
+                    print('МКБ-10: классификатор не загружен:', e)
+                    self._data = _unpack(compile_records([]))
+        return self
+
+    def __len__(self):
+        return len(self.load()._data['codes'])
+
+    def entry(self, i):
+        d = self._data
+        offsets = d['title_offsets']
+        title = d['titles'][offsets[i]:offsets[i + 1]].decode('utf-8')
+        return d['codes'][i], title, chapter_of(d['codes'][i])
+
+    def lookup(self, code):
+        """(code, title, chapter) of an exact code, or None."""
+        d = self.load()._data
+        key = code_key(code)
+        i = bisect.bisect_left(d['keys'], key)
+        if i < len(d['keys']) and d['keys'][i] == key:
+            return self.entry(i)
+        return None
+
+    def search(self, text, limit=50, chapter=None):
+        """(code, title, chapter) matches: codes starting with the query first, then
+        entries whose description has words starting with every typed word."""
+        d = self.load()._data
+        out, seen = [], set()
+        query = (text or '').strip()
+        if not query:
+            return out
+
+        def take(i):
+            if i not in seen and (chapter is None or chapter_of(d['codes'][i]) == chapter):
+                seen.add(i)
+                out.append(self.entry(i))
+
+        key = code_key(query)
+        if _CODE_QUERY.match(query.upper().translate(_LATIN)):
+            keys = d['keys']
+            i = bisect.bisect_left(keys, key)
+            while i < len(keys) and keys[i].startswith(key) and len(out) < limit:
+                take(i)
+                i += 1
+
+        tokens = _words(query)
+        if tokens and len(out) < limit:
+            vocab, ids, offsets = d['vocab'], d['ids'], d['offsets']
+            ranges = []
+            for t in tokens:
+                lo, hi = bisect.bisect_left(vocab, t), bisect.bisect_left(vocab, t + '\uffff')
+                ranges.append((offsets[hi] - offsets[lo], offsets[lo], offsets[hi]))
+            # walk the postings of the rarest token, the others only filter
+            ranges.sort()
+            _, start, stop = ranges[0]
+            others = [set(ids[a:b]) for _, a, b in ranges[1:]]
+            matched = []
+            for i in ids[start:stop]:
+                if i in seen or not all(i in o for o in others):
+                    continue
+                seen.add(i)
+                if chapter is None or chapter_of(d['codes'][i]) == chapter:
+                    matched.append(i)
+                    if len(out) + len(matched) >= limit:
+                        break
+            for i in sorted(matched):
+                out.append(self.entry(i))
+        return out
+
+    def by_chapter(self, results):
+        """Group search results as [(chapter, title, [results])] in classifier order."""
+        groups = {}
+        for r in results:
+            groups.setdefault(r[2], []).append(r)
+        return [(ch, title, groups[ch]) for ch, _, _, title in CHAPTERS if ch in groups]
+
+
+_index = MkbIndex()
+
+
+def get_index() -> MkbIndex:
+    return _index
+
+
+if __name__ == '__main__':
+    # install step: compile the classifier cache ahead of the first start
+    print(len(get_index()), 'codes in', MKB_CACHE)
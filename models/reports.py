@@ -0,0 +1,95 @@
+"""Aggregated reports for the Reports window, read from the visit_stats daily counters."""
+import datetime
+from collections import Counter
+
+from models.db import list_visits_between
+from models import stats
+from models.mkb import CHAPTERS
+
+EMPTY = '—'
+
+# key -> (title, group column header, visit_stats dimension or calendar bucket)
+GROUPINGS = {
+    'by_organisation': ('По организациям', 'Организация', 'organisation'),
+    'by_mkb': ('По кодам МКБ', 'Код МКБ', 'mkb'),
+    'by_mkb_chapter': ('По классам МКБ', 'Класс МКБ', 'mkb_chapter'),
+    'by_outcome': ('По исходам', 'Исход', 'outcome'),
+    'by_examiner': ('По врачам', 'Врач', 'examiner'),
+    'by_day': ('По дням', 'День', 'day'),
+    'by_week': ('По неделям', 'Неделя', 'week'),
+    'by_month': ('По месяцам', 'Месяц', 'month'),
+}
+# calendar buckets of a datetime.date; weeks are ISO weeks (Monday first, 2025-12-29 is in 2026-W01)
+_CALENDAR = {
+    'day': lambda d: d.isoformat(),
+    'week': lambda d: '{}-W{:02d}'.format(*d.isocalendar()[:2]),
+    'month': lambda d: d.strftime('%Y-%m'),
+}
+_CHAPTER_TITLES = {c[0]: f'{c[0]}. {c[3]}' for c in CHAPTERS}
+
+VISITS_TITLE = 'Список обращений'
+VISITS_COLUMNS = [('visit_datetime', 'Дата'), ('patient_fio', 'Пациент'), ('organisation', 'Организация'), ('other', 'Прочее')]
+
+REPORT_TYPES = [('visits', VISITS_TITLE)] + [(k, v[0]) for k, v in GROUPINGS.items()]
+
+
+def _parse_day(day):
+    try:
+        return datetime.date.fromisoformat(str(day)[:10])
+    except ValueError:
+        return None
+
+
+def aggregate(kind: str, start_date: str, end_date: str, skipped=None):
+    """Visit counts per group for a period of 'YYYY-MM-DD' dates; rows have 'group', 'count', 'share'.
+
+    Calendar groupings leave out days whose date cannot be read; they are appended to
+    ``skipped`` as (day, visits) if given.
+    """
+    dimension = GROUPINGS[kind][2]
+    if dimension in _CALENDAR:
+        bucket = _CALENDAR[dimension]
+        counts = Counter()
+        for day, n in stats.per_day(start_date, end_date):
+            parsed = _parse_day(day)
+            if parsed is None:
+                if skipped is not None:
+                    skipped.append((day, n))
+                continue
+            counts[bucket(parsed)] += n
+        ordered = sorted(counts.items())
+    else:
+        counts = stats.totals(dimension, start_date, end_date)
+        ordered = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    total = sum(counts.values())
+    out = []
+    for value, n in ordered:
+        if dimension == 'mkb_chapter':
+            value = _CHAPTER_TITLES.get(value, value)
+        out.append({'group': value or EMPTY, 'count': n, 'share': f"{100.0 * n / total:.1f}%"})
+    if out:
+        out.append({'group': 'Итого', 'count': total, 'share': '100.0%'})
+    return out
+
+
+def visits_page(start_date: str, end_date: str, offset=0, limit=None):
+    """Rows of the visit list report (VISITS_COLUMNS), newest first; paged like list_visits_between."""
+    rows = list_visits_between(start_date, end_date, brief=True, limit=limit, offset=offset)
+    for r in rows:
+        r['other'] = ' '.join(x for x in (r.get('mkb_code'), r.get('diagnosis')) if x)
+    return rows
+
+
+def build_report(kind: str, start_date: str, end_date: str):
+    """Return (title, [(row key, header)...], rows) for the Reports window.
+
+    The window pages the 'visits' list in through visits_page(); here it is read whole.
+    """
+    if kind == 'visits':
+        return VISITS_TITLE, VISITS_COLUMNS, visits_page(start_date, end_date)
+    title, header = GROUPINGS[kind][:2]
+    skipped = []
+    rows = aggregate(kind, start_date, end_date, skipped)
+    if skipped:
+        title += f' (не учтено обращений с нечитаемой датой: {sum(n for _, n in skipped)})'
+    return title, [('group', header), ('count', 'Обращений'), ('share', 'Доля')], rows
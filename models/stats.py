@@ -0,0 +1,124 @@
+"""Materialized daily visit counters (visit_stats) for dashboards and reports.
+
+One row per (dimension, day, value) holds the number of visits. Counters are
+incremented in the same transaction that inserts the visit (save_visit and the
+bulk importer), so reading them is a primary-key range lookup instead of a scan
+of visits. rebuild() recomputes everything from visits and check() reports rows
+where the counters and visits disagree.
+
+The organisation dimension uses the patient's organisation at the time of the
+visit; rebuild() takes the current one.
+"""
+from collections import Counter
+
+from config import DB_SERVICE
+from models.mkb import chapter_of
+
+# dimension -> title; 'total' has a single value ''
+DIMENSIONS = {
+    'total': 'Всего',
+    'organisation': 'Организация',
+    'mkb': 'Код МКБ',
+    'mkb_chapter': 'Класс МКБ',
+    'outcome': 'Исход',
+    'examiner': 'Врач',
+}
+
+
+def visit_keys(organisation, mkb_code, outcome, examiner):
+    """(dimension, value) pairs one visit counts towards."""
+    return [
+        ('total', ''),
+        ('organisation', organisation or ''),
+        ('mkb', (mkb_code or '').strip()),
+        ('mkb_chapter', chapter_of(mkb_code) or ''),
+        ('outcome', outcome or ''),
+        ('examiner', examiner or ''),
+    ]
+
+
+def add_counts(conn, counts):
+    """Add a Counter of (day, dimension, value) -> n to visit_stats."""
+    conn.executemany("""INSERT INTO visit_stats (day, dimension, value, count) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + excluded.count""",
+                     [(day, dim, value, n) for (day, dim, value), n in counts.items()])
+
+
+def record_visit(conn, day, organisation, mkb_code, outcome, examiner):
+    """Count one new visit; call inside the transaction that inserts it."""
+    if day:
+        add_counts(conn, Counter((day, dim, value) for dim, value in visit_keys(organisation, mkb_code, outcome, examiner)))
+
+
+def _compute(conn, where="", params=()):
+    counts = Counter()
+    cur = conn.execute(f"""SELECT v.visit_date, p.organisation, v.mkb_code, v.outcome, v.examiner, COUNT(*)
+                           FROM visits v LEFT JOIN patients p ON p.id=v.patient_id {where}
+                           GROUP BY v.visit_date, p.organisation, v.mkb_code, v.outcome, v.examiner""", params)
+    for day, organisation, mkb_code, outcome, examiner, n in cur:
+        if day:
+            for dim, value in visit_keys(organisation, mkb_code, outcome, examiner):
+                counts[(day, dim, value)] += n
+    return counts
+
+
+def record_visit_ids(conn, first_id, last_id):
+    """Count visits inserted in bulk with ids first_id..last_id (see models.importer)."""
+    add_counts(conn, _compute(conn, "WHERE v.id >= ? AND v.id <= ?", (first_id, last_id)))
+
+
+def rebuild(conn=None):
+    """Recompute visit_stats from visits (backfill, or repair after check() found drift)."""
+    from models.db import transaction
+    if conn is not None:
+        conn.execute("DELETE FROM visit_stats")
+        add_counts(conn, _compute(conn))
+        return
+    with transaction() as conn:
+        conn.execute("DELETE FROM visit_stats")
+        add_counts(conn, _compute(conn))
+
+
+def check(start_day=None, end_day=None):
+    """Compare visit_stats with visits; returns [(day, dimension, value, stored, actual)] for mismatches."""
+    from models.db import get_conn
+    conn = get_conn()
+    if start_day and end_day:
+        actual = _compute(conn, "WHERE v.visit_date >= ? AND v.visit_date <= ?", (start_day, end_day))
+        where, params = "WHERE day >= ? AND day <= ?", (start_day, end_day)
+    else:
+        actual = _compute(conn)
+        where, params = "", ()
+    stored = Counter({(d, dim, v): n for d, dim, v, n in conn.execute(f"SELECT day, dimension, value, count FROM visit_stats {where}", params)})
+    return sorted((k + (stored.get(k, 0), actual.get(k, 0))) for k in set(stored) | set(actual) if stored.get(k, 0) != actual.get(k, 0))
+
+
+def totals(dimension, start_day, end_day):
+    """{value: visits} for a dimension over a period of 'YYYY-MM-DD' days."""
+    from models.db import get_conn
+    cur = get_conn().execute("SELECT value, SUM(count) FROM visit_stats WHERE day >= ? AND day <= ? AND dimension = ? GROUP BY value",
+                             (start_day[:10], end_day[:10], dimension))
+    return dict(cur.fetchall())
+
+
+def per_day(start_day, end_day):
+    """[(day, visits)] for every day with visits in the period."""
+    from models.db import get_conn
+    cur = get_conn().execute("SELECT day, count FROM visit_stats WHERE dimension = 'total' AND day >= ? AND day <= ? ORDER BY day",
+                             (start_day[:10], end_day[:10]))
+    return cur.fetchall()
+
+
+def day_summary(day):
+    """{dimension: {value: visits}} for one day, e.g. for the main window status bar."""
+    from models.db import get_conn
+    out = {dim: {} for dim in DIMENSIONS}
+    for dim in DIMENSIONS:
+        for value, n in get_conn().execute("SELECT value, count FROM visit_stats WHERE dimension = ? AND day = ?", (dim, day[:10])):
+            out[dim][value] = n
+    return out
+
+
+if DB_SERVICE:
+    from models.db_service import install_client
+    install_client(globals())
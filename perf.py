@@ -0,0 +1,226 @@
+"""Timing instrumentation: models.db calls, SQL statements, controller actions, startup.
+
+Disabled by default (MIS_PERF=1 in the environment or enable() turns it on). When off,
+an instrumented function costs one flag check; SQL statements are not wrapped at all,
+because models.db only opens timed connections while timing is on.
+
+Each finished operation becomes one JSON line in PERF_LOG_FILE (rotating, written by a
+background listener so the GUI thread never waits on the disk) and is added to the
+in-memory statistics shown by controllers/perf_controller.py.
+"""
+import bisect
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import deque
+from config import PERF_ENABLED, PERF_LOG_FILE
+
+# upper bounds of the histogram buckets, ms
+BUCKETS = (1, 5, 20, 100, 500, 2000)
+RECENT = 1000
+SLOWEST = 50
+MAX_SQL = 20
+
+enabled = False
+
+_lock = threading.Lock()
+_stats = {}
+_slowest = []
+_local = threading.local()
+_queue = None
+_writer_thread = None
+
+
+class OpStats:
+    __slots__ = ('count', 'total', 'max', 'recent', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT)
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.recent.append(ms)
+        self.buckets[bisect.bisect_left(BUCKETS, ms)] += 1
+
+    def percentile(self, p):
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _writer(q, handler):
+    # background thread: JSON encoding and file I/O stay off the instrumented threads
+    while True:
+        entry = q.get()
+        if entry is None:
+            break
+        handler.emit(logging.makeLogRecord({'msg': json.dumps(entry, ensure_ascii=False, default=str)}))
+    handler.close()
+
+def _start_log():
+    global _queue, _writer_thread
+    if _writer_thread is not None:
+        return
+    os.makedirs(os.path.dirname(PERF_LOG_FILE), exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(PERF_LOG_FILE, maxBytes=2_000_000, backupCount=5, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _queue = queue.SimpleQueue()
+    _writer_thread = threading.Thread(target=_writer, args=(_queue, handler), name='perf-log', daemon=True)
+    _writer_thread.start()
+
+def enable():
+    global enabled
+    _start_log()
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def flush():
+    """Write out the queued entries and stop the log writer (call at exit)."""
+    global _queue, _writer_thread
+    if _writer_thread is not None:
+        _queue.put(None)
+        _writer_thread.join()
+        _writer_thread = None
+        _queue = None
+
+
+def params_shape(params):
+    """Types of the bound parameters, never their values (the log must not hold patient data)."""
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return '{' + ','.join(f'{k}:{type(v).__name__}' for k, v in params.items()) + '}'
+    try:
+        return '(' + ','.join(type(v).__name__ for v in params) + ')'
+    except TypeError:
+        return type(params).__name__
+
+def _rows(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    if result is None:
+        return 0
+    return None
+
+def record(op, ms, **fields):
+    """Account one finished operation (``ms`` wall time) and log it."""
+    with _lock:
+        st = _stats.get(op)
+        if st is None:
+            st = _stats[op] = OpStats()
+        st.add(ms)
+        if len(_slowest) < SLOWEST or ms > _slowest[0][0]:
+            statements = '; '.join(s['sql'] for s in fields.get('sql', ()))[:200]
+            bisect.insort(_slowest, (ms, time.time(), op, statements))
+            if len(_slowest) > SLOWEST:
+                del _slowest[0]
+    q = _queue
+    if q is not None:
+        entry = {'ts': round(time.time(), 3), 'op': op, 'ms': round(ms, 3), 'thread': threading.current_thread().name}
+        entry.update(fields)
+        q.put(entry)
+
+def sql(statement, params, seconds, many=False):
+    """Called by the timed connection of models.db for each statement."""
+    span = getattr(_local, 'span', None)
+    if span is not None and len(span) < MAX_SQL:
+        span.append({'sql': ' '.join(statement.split())[:300], 'params': 'many' if many else params_shape(params),
+                     'ms': round(seconds * 1000, 3)})
+
+
+def timed(op=None, rows=False):
+    """Decorator: time calls of the function as ``op`` when instrumentation is enabled.
+
+    Statements run inside the call are attached to its log entry; ``rows`` also logs
+    the size of the result. Extra positional arguments beyond the function's own are
+    dropped, as PyQt does for slots (clicked(bool) -> on_filter(self)).
+    """
+    def decorate(fn):
+        name = op or f'{fn.__module__}.{fn.__qualname__}'
+        code = fn.__code__
+        nargs = None if code.co_flags & 0x04 else code.co_argcount
+        # methods: the first argument is self, not a parameter worth logging
+        first = 1 if '.' in fn.__qualname__.replace('<locals>.', '') else 0
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if nargs is not None and len(args) > nargs:
+                args = args[:nargs]
+            if not enabled:
+                return fn(*args, **kwargs)
+            outer = getattr(_local, 'span', None)
+            _local.span = span = []
+            started = time.perf_counter()
+            error = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                ms = (time.perf_counter() - started) * 1000
+                _local.span = outer
+                fields = {'args': params_shape(args[first:])}
+                if span:
+                    fields['sql'] = span
+                    if outer is not None and len(outer) < MAX_SQL:
+                        outer.extend(span[:MAX_SQL - len(outer)])
+                if error is not None:
+                    fields['error'] = type(error).__name__
+                elif rows:
+                    fields['rows'] = _rows(result)
+                record(name, ms, **fields)
+        return wrapper
+    return decorate
+
+def instrument(namespace, prefix, skip=()):
+    """Wrap the public functions defined in a module namespace (pass globals())."""
+    module = namespace['__name__']
+    for name, fn in list(namespace.items()):
+        if name.startswith('_') or name in skip or not callable(fn) or getattr(fn, '__module__', None) != module:
+            continue
+        if not hasattr(fn, '__code__'):
+            continue
+        namespace[name] = timed(f'{prefix}.{name}', rows=True)(fn)
+
+def snapshot():
+    """(per-operation rows, slowest operations) for the debug window."""
+    with _lock:
+        ops = []
+        for op, st in _stats.items():
+            ops.append({'op': op, 'count': st.count, 'total_ms': round(st.total, 1),
+                        'avg_ms': round(st.total / st.count, 2), 'p95_ms': round(st.percentile(0.95), 2),
+                        'max_ms': round(st.max, 2), 'buckets': list(st.buckets)})
+        slowest = [{'ms': round(ms, 2), 'at': time.strftime('%H:%M:%S', time.localtime(ts)), 'op': op,
+                    'sql': statements}
+                   for ms, ts, op, statements in reversed(_slowest)]
+    ops.sort(key=lambda r: -r['total_ms'])
+    return ops, slowest
+
+def reset():
+    with _lock:
+        _stats.clear()
+        del _slowest[:]
+
+
+if PERF_ENABLED:
+    enable()
@@ -1,5 +1,5 @@
-
-import json, os, hashlib
+import json, os, hashlib, copy, tempfile, threading, time
+from contextlib import contextmanager
 from config import SETTINGS_FILE, DEFAULT_AUTOSAVE_INTERVAL
 
 DEFAULTS = {
@@ -12,39 +12,111 @@ DEFAULTS = {
     "theme": "light"
 }
 
+# In-memory copy of the settings file, valid while the file's (mtime, size) is unchanged.
+_lock = threading.RLock()
+_cache = None
+_cache_sig = None
+_batch_depth = 0
+_batch_dirty = False
+
 def _hash(pw: str):
     return hashlib.sha256(pw.encode('utf-8')).hexdigest()
 
-def load_settings():
-    if not os.path.exists(SETTINGS_FILE):
-        s = DEFAULTS.copy()
-        s['users'] = {'admin': _hash('admin')}
-        save_settings(s)
-        return s
+def _signature():
     try:
-        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            s = json.load(f)
-        # ensure defaults
-        for k, v in DEFAULTS.items():
-            if k not in s:
-                s[k] = v
-        return s
-    except Exception:
-        s = DEFAULTS.copy()
-        s['users'] = {'admin': _hash('admin')}
-        save_settings(s)
-        return s
+        st = os.stat(SETTINGS_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
-def save_settings(s: dict):
+def _initial():
+    s = copy.deepcopy(DEFAULTS)
+    s['users'] = {'admin': _hash('admin')}
+    return s
+
+def _settings():
+    """Cached settings dict (not a copy); re-read only when the file changed on disk."""
+    global _cache, _cache_sig
+    with _lock:
+        sig = _signature()
+        if _cache is not None and sig == _cache_sig:
+            return _cache
+        if sig is None:
+            _cache = _initial()
+            _write(_cache)
+            return _cache
+        try:
+            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                s = json.load(f)
+            # ensure defaults
+            for k, v in DEFAULTS.items():
+                if k not in s:
+                    s[k] = copy.deepcopy(v)
+            _cache, _cache_sig = s, sig
+        except Exception:
+            _cache = _initial()
+            _write(_cache)
+        return _cache
+
+def _write(s: dict):
+    """Atomically replace the settings file: write a temp file next to it, then rename over it."""
+    global _cache_sig
+    d = os.path.dirname(os.path.abspath(SETTINGS_FILE))
+    fd, tmp = tempfile.mkstemp(prefix='.app_settings.', suffix='.tmp', dir=d)
     try:
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
             json.dump(s, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(5):
+            try:
+                os.replace(tmp, SETTINGS_FILE)
+                break
+            except PermissionError:
+                # Windows: another instance is reading the file right now
+                if attempt == 4:
+                    raise
+                time.sleep(0.05)
+        _cache_sig = _signature()
     except Exception as e:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
         print('Не удалось сохранить настройки:', e)
 
+def load_settings():
+    """Return a copy of the settings; callers may modify it and pass it to save_settings()."""
+    return copy.deepcopy(_settings())
+
+def save_settings(s: dict):
+    global _cache, _batch_dirty
+    with _lock:
+        if _cache is not None and s == _cache and _cache_sig == _signature():
+            return
+        _cache = copy.deepcopy(s)
+        if _batch_depth:
+            _batch_dirty = True
+        else:
+            _write(_cache)
+
+@contextmanager
+def batch():
+    """Coalesce all save_settings() calls inside the block into one write at the end."""
+    global _batch_depth, _batch_dirty
+    with _lock:
+        _batch_depth += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _batch_depth -= 1
+            if not _batch_depth and _batch_dirty:
+                _batch_dirty = False
+                _write(_cache)
+
 def verify_user(username: str, password: str) -> bool:
-    s = load_settings()
-    users = s.get('users', {})
+    users = _settings().get('users', {})
     if username not in users:
         return False
     return users.get(username) == _hash(password)
@@ -67,9 +139,11 @@ def change_password(username: str, old_password: str, new_password: str) -> bool
     return True
 
 def set_current_user(username: str):
+    if _settings().get('current_user') == username:
+        return
     s = load_settings()
     s['current_user'] = username
     save_settings(s)
 
 def get_current_user():
-    return load_settings().get('current_user')
+    return _settings().get('current_user')
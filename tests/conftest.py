@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point models.db at an empty database file for the duration of a test."""
+    path = str(tmp_path / 'app.db')
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    yield path
+    db.close_conn()
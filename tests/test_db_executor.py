@@ -0,0 +1,34 @@
+import os
+import threading
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtCore = pytest.importorskip('PyQt5.QtCore')
+
+from models import db  # noqa: E402
+
+
+def test_pool_threads_keep_their_connection(temp_db, monkeypatch):
+    from controllers.db_executor import DbExecutor
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    db.init_db()
+    opened = []
+    connect = db._connect
+
+    def counting_connect(path, timed=False):
+        opened.append(threading.get_ident())
+        return connect(path, timed)
+    monkeypatch.setattr(db, '_connect', counting_connect)
+
+    executor = DbExecutor()
+    results = []
+    try:
+        for _ in range(10):
+            executor.submit(db.list_patient_names, on_done=results.append)
+        assert executor.wait(10000)
+        app.processEvents()
+    finally:
+        executor.shutdown()
+    assert len(results) == 10
+    assert len(opened) <= DbExecutor.MAX_THREADS
@@ -0,0 +1,72 @@
+import csv
+import functools
+import threading
+
+import pytest
+
+from models import db, db_service, export
+
+
+def test_loopback_addresses():
+    assert db_service.is_loopback('127.0.0.1')
+    assert db_service.is_loopback('localhost')
+    assert not db_service.is_loopback('0.0.0.0')
+    assert not db_service.is_loopback('')
+    assert not db_service.is_loopback('192.168.1.5')
+
+
+def test_network_bind_needs_token(temp_db, monkeypatch):
+    monkeypatch.setattr(db_service, 'DB_SERVICE_TOKEN', '')
+    with pytest.raises(PermissionError):
+        db_service.make_server('0.0.0.0', 0)
+
+
+def test_loopback_bind_without_token(temp_db, monkeypatch):
+    monkeypatch.setattr(db_service, 'DB_SERVICE_TOKEN', '')
+    server, service = db_service.make_server('127.0.0.1', 0)
+    server.server_close()
+    service.close()
+
+
+@pytest.fixture
+def live_service(temp_db, monkeypatch):
+    """A DB service on a free loopback port, with the client pointed at it."""
+    monkeypatch.setattr(db_service, 'DB_SERVICE_TOKEN', '')
+    server, service = db_service.make_server('127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(db_service, 'DB_SERVICE', f'127.0.0.1:{server.server_address[1]}')
+    yield service
+    server.shutdown()
+    server.server_close()
+    service.close()
+    db_service._local.http = None
+
+
+def _client(module):
+    """The served functions of ``module`` as calls to the service."""
+    namespace = dict(vars(module))
+    db_service.install_client(namespace)
+    return namespace
+
+
+def test_export_through_the_service(live_service, tmp_path, monkeypatch):
+    pid = db.save_patient({'fio': 'Иванов Иван'})
+    for minute in range(5):
+        db.save_visit(pid, f'2025-03-01 10:0{minute}:00', '', '', '', '', '', 'J06.9', '', '', {'zhalobypole': f'жалоба {minute}'})
+    db.close_conn()
+    client = _client(export)
+    monkeypatch.setattr(export, 'count_visits', client['count_visits'])
+    # small pages, so that the keyset cursor is carried over HTTP
+    monkeypatch.setattr(export, 'export_page', functools.partial(client['export_page'], limit=2))
+    monkeypatch.setattr(export, 'list_epicrisis_fields', _client(db)['list_epicrisis_fields'])
+
+    assert export.epicrisis_fields() == ['zhalobypole']
+    path = export.export_visits(str(tmp_path / 'visits.csv'), '2025-03-01', '2025-03-01',
+                                columns=['visit_datetime', 'patient_fio', 'full_epicrisis.zhalobypole'])
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['ДатаВремя', 'ФИО', 'zhalobypole']
+    assert rows[1:] == [[f'2025-03-01 10:0{m}:00', 'Иванов Иван', f'жалоба {m}'] for m in range(5)]
+    # the desk itself opened no database: everything went over HTTP
+    assert getattr(db._local, 'conn', None) is None
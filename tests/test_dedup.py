@@ -0,0 +1,35 @@
+from models import db
+from models.dedup import find_duplicates, merge_duplicates
+
+
+def _patient(fio, birthdate, phone=''):
+    pid = db.save_patient({'fio': fio, 'birthdate': birthdate, 'phone': phone})
+    vid = db.save_visit(pid, '2025-03-01 10:00:00', '', '', '', '', 'ОРВИ', 'J06.9', '', '', {'zhalobypole': 'кашель'})
+    return pid, vid
+
+
+def test_save_patient_matches_normalised_phone(temp_db):
+    db.init_db()
+    first = db.save_patient({'fio': 'Иванов Иван', 'birthdate': '1980-05-01', 'phone': '+7 900 123-45-67'})
+    assert db.save_patient({'fio': 'Иванов Иван', 'birthdate': '1980-05-01', 'phone': '89001234567'}) == first
+
+
+def test_merge_repoints_visits_and_search(temp_db):
+    db.init_db()
+    keep, keep_visit = _patient('Семёнов Пётр Иванович', '1980-05-01')
+    dup, dup_visit = _patient('Семенов Петр Ивановч', '1980-05-01')
+    twin, twin_visit = _patient('Семенова Полина Ивановна', '1980-05-01')
+    # all three share the birthdate+fio_key block, only the typo scores as a duplicate
+    assert [(a['id'], b['id']) for _, a, b in find_duplicates()] == [(keep, dup)]
+
+    assert merge_duplicates() == (1, 1, 1)
+    assert db.get_patient_by_id(dup) is None
+    assert db.get_visit_by_id(dup_visit)['patient_id'] == keep
+    assert db.get_visit_by_id(twin_visit)['patient_id'] == twin
+    conn = db.get_conn()
+    assert conn.execute("SELECT patient_fio FROM visits_fts WHERE rowid=?", (dup_visit,)).fetchone()[0] == 'Семёнов Пётр Иванович'
+    assert db.search_visits('ивановч') == []
+    merged = dict(conn.execute("SELECT * FROM patient_merges").fetchone())
+    assert (merged['merged_id'], merged['into_id'], merged['visits_moved']) == (dup, keep, 1)
+    # nothing left to merge
+    assert merge_duplicates() == (0, 0, 0)
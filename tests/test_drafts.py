@@ -0,0 +1,22 @@
+from models import db
+from models.drafts import append_draft, clear_drafts, load_draft
+
+
+def test_clear_up_to_seq_keeps_later_autosaves(temp_db):
+    db.init_db()
+    append_draft({'patientfio': 'Иванов', 'zhalobypole': 'кашель'}, 10, station='desk')
+    append_draft({'zhalobypole': 'кашель, насморк'}, 20, station='desk')
+    # the save was submitted at seq 15; the autosave at 20 came from edits made after that
+    clear_drafts('desk', up_to_seq=15)
+    assert load_draft('desk') == {'zhalobypole': 'кашель, насморк'}
+    clear_drafts('desk')
+    assert load_draft('desk') == {}
+
+
+def test_journals_of_workstations_are_separate(temp_db):
+    db.init_db()
+    append_draft({'a': 1}, 1, station='desk1')
+    append_draft({'b': 2}, 2, station='desk2')
+    clear_drafts('desk1')
+    assert load_draft('desk1') == {}
+    assert load_draft('desk2') == {'b': 2}
@@ -0,0 +1,48 @@
+import json
+import zlib
+
+from models import db
+
+
+def test_round_trip_keeps_non_default_values(temp_db):
+    db.init_db()
+    full = {'zhalobypole': 'кашель', 'vashslider': 3, 'normalskin': True, 'blednost': False, 'dspole': '', 'x': None}
+    blob = db.encode_epicrisis(full)
+    assert isinstance(blob, bytes)
+    assert db.decode_epicrisis(blob) == {'zhalobypole': 'кашель', 'vashslider': 3, 'normalskin': True}
+
+
+def test_large_text_is_compressed(temp_db):
+    db.init_db()
+    full = {'anamnesispole': 'без особенностей ' * 50}
+    blob = db.encode_epicrisis(full)
+    assert blob[0] == db.EPICRISIS_ZLIB
+    assert db.decode_epicrisis(blob) == full
+
+
+def test_checkboxes_with_high_field_ids(temp_db):
+    db.init_db()
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO epicrisis_fields (name) VALUES (?)", [(f'legacy_{i}',) for i in range(20000)])
+    db._forget_epicrisis_fields()
+    full = {'legacy_19999': True, 'legacy_3000': True, 'zhalobypole': 'кашель'}
+    pid = db.save_patient({'fio': 'Иванов Иван', 'birthdate': '1980-01-02'})
+    vid = db.save_visit(pid, '2025-01-01 10:00:00', '', '', '', '', '', '', '', '', full)
+    blob = db.get_conn().execute("SELECT full_epicrisis FROM visits WHERE id=?", (vid,)).fetchone()[0]
+    assert len(blob) < 100
+    assert db.get_visit_by_id(vid)['full_epicrisis'] == full
+
+
+def test_reads_rows_with_checkbox_bitmask(temp_db):
+    db.init_db()
+    with db.transaction() as conn:
+        ids = db._field_ids(conn, ['normalskin', 'zhalobypole'])
+    payload = json.dumps([1 << ids['normalskin'], [ids['zhalobypole'], 'кашель']]).encode('utf-8')
+    assert db.decode_epicrisis(bytes((db.EPICRISIS_RAW,)) + payload) == {'normalskin': True, 'zhalobypole': 'кашель'}
+    packed = bytes((db.EPICRISIS_ZLIB,)) + zlib.compress(payload)
+    assert db.decode_epicrisis(packed) == {'normalskin': True, 'zhalobypole': 'кашель'}
+
+
+def test_legacy_json_text(temp_db):
+    db.init_db()
+    assert db.decode_epicrisis('{"a": "b", "c": false}') == {'a': 'b', 'c': False}
@@ -0,0 +1,60 @@
+import csv
+
+import pytest
+
+from models import db, export
+
+COLUMNS = ['id', 'visit_datetime', 'patient_fio', 'mkb_code', 'full_epicrisis.zhalobypole', 'full_epicrisis.normalskin']
+
+
+@pytest.fixture
+def visits(temp_db):
+    db.init_db()
+    pid = db.save_patient({'fio': 'Иванов Иван', 'phone': '89001112233'})
+    first = db.save_visit(pid, '2025-03-01 10:00:00', '', '', '', '', 'ОРВИ', 'J06.9', '', '', {'zhalobypole': 'кашель', 'normalskin': True})
+    second = db.save_visit(pid, '2025-03-02 09:30:00', '', '', '', '', 'Гастрит', 'K29.7', '', '', {'zhalobypole': 'боль'})
+    # outside the period
+    db.save_visit(pid, '2025-04-01 09:30:00', '', '', '', '', '', 'I10', '', '', {})
+    return [
+        [first, '2025-03-01 10:00:00', 'Иванов Иван', 'J06.9', 'кашель', 'Да'],
+        [second, '2025-03-02 09:30:00', 'Иванов Иван', 'K29.7', 'боль', ''],
+    ]
+
+HEADER = ['id', 'ДатаВремя', 'ФИО', 'МКБ', 'zhalobypole', 'normalskin']
+
+
+def test_csv(visits, tmp_path):
+    progress = []
+    path = export.export_visits(str(tmp_path / 'visits.csv'), '2025-03-01', '2025-03-31', COLUMNS,
+                                progress=lambda done, total: progress.append((done, total)))
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows == [HEADER] + [[str(v) for v in r] for r in visits]
+    assert progress[-1] == (2, 2)
+
+
+def test_xlsx(visits, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = export.export_visits(str(tmp_path / 'visits.xlsx'), '2025-03-01', '2025-03-31', COLUMNS)
+    rows = [list(r) for r in openpyxl.load_workbook(path).active.iter_rows(values_only=True)]
+    assert rows == [HEADER] + [[v if v != '' else None for v in r] for r in visits]
+
+
+def test_default_columns_and_other_extensions(visits, tmp_path):
+    path = export.export_visits(str(tmp_path / 'visits.txt'), '2025-03-01', '2025-03-31')
+    assert path.endswith('.txt.csv')
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['id', 'ДатаВремя', 'ФИО', 'МКБ']
+    assert [r[3] for r in rows[1:]] == ['J06.9', 'K29.7']
+
+
+def test_cancel_removes_the_file(visits, tmp_path):
+    target = tmp_path / 'visits.csv'
+    with pytest.raises(export.ExportCancelled):
+        export.export_visits(str(target), '2025-03-01', '2025-03-31', cancelled=lambda: True)
+    assert not target.exists()
+
+
+def test_column_chooser_fields(visits):
+    assert export.epicrisis_fields() == ['normalskin', 'zhalobypole']
@@ -0,0 +1,59 @@
+from models.fio_index import FioIndex, normalize
+
+NAMES = ['Сидоров Сидор Петрович', 'Сидорова Анна Ивановна', 'Семёнов Пётр', 'Петров Иван', 'Анна Сидоренко']
+
+
+def _index(names=NAMES):
+    index = FioIndex()
+    index.load(names)
+    return index
+
+
+def test_normalize():
+    assert normalize('  СЕМЁНОВ   Пётр ') == 'семенов петр'
+    assert normalize(None) == ''
+
+
+def test_surname_prefix():
+    assert _index().search('сидоров') == ['Сидоров Сидор Петрович', 'Сидорова Анна Ивановна']
+    # surname matches first, then names with a later word starting the same
+    assert _index().search('сидор') == ['Сидоров Сидор Петрович', 'Сидорова Анна Ивановна', 'Анна Сидоренко']
+    assert _index().search('') == []
+    assert _index().search('Кузнецов') == []
+
+
+def test_case_and_yo_are_folded():
+    assert _index().search('СЕМЕН') == ['Семёнов Пётр']
+    assert _index().search('семён пёт') == ['Семёнов Пётр']
+
+
+def test_word_inside_the_name():
+    # full-name prefix matches come before matches on a later word
+    assert _index().search('анна') == ['Анна Сидоренко', 'Сидорова Анна Ивановна']
+    assert _index().search('иван') == ['Петров Иван', 'Сидорова Анна Ивановна']
+
+
+def test_every_typed_word_must_match():
+    assert _index().search('сидор ан') == ['Сидорова Анна Ивановна']
+    assert _index().search('ан сидоре') == ['Анна Сидоренко']
+    assert _index().search('сидор иван') == ['Сидорова Анна Ивановна']
+
+
+def test_limit():
+    assert len(_index().search('с', limit=2)) == 2
+
+
+def test_add_keeps_entries_sorted_and_unique():
+    index = _index(NAMES[:2])
+    for name in ('Абрамов Олег', 'Яковлев Ян', 'Сидоров Сидор Петрович', 'Абрамов Олег', '', None):
+        index.add(name)
+    assert index._full == sorted(index._full) and index._tokens == sorted(index._tokens)
+    assert len(index._full) == len({name for _, name in index._full}) == 4
+    assert index.search('абр') == ['Абрамов Олег']
+    assert index.search('ян') == ['Яковлев Ян']
+
+
+def test_load_drops_duplicates_and_empty_names():
+    index = _index(['Петров Иван', 'Петров Иван', '', None])
+    assert index.loaded
+    assert index.search('петров') == ['Петров Иван']
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from models import db, epicrisis
+from models.epicrisis import (FORM_UI, FORM_VERSION, PERSISTED_FIELDS, VERSION_KEY, _form_fields, get_plan,
+                              render_visit)
+
+
+def test_persisted_fields_match_the_form():
+    # a widget added to or removed from mainwindow.ui needs a new FORM_VERSION entry
+    declared = PERSISTED_FIELDS[FORM_VERSION]
+    assert len(set(declared)) == len(declared)
+    assert list(declared) == [name for name, _, _, _ in _form_fields(FORM_UI)]
+
+
+def test_every_persisted_field_is_rendered():
+    fields = get_plan().fields
+    assert [name for name in PERSISTED_FIELDS[FORM_VERSION] if name not in fields] == ['patientfio']
+
+
+def test_registry_binds_the_fields_it_finds():
+    pytest.importorskip('PyQt5')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5 import QtWidgets
+    from controllers.form_registry import FormRegistry
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    root = QtWidgets.QWidget()
+    for name in ('patientfio', 'not_a_field'):
+        QtWidgets.QLineEdit(root).setObjectName(name)
+    form = FormRegistry(root)
+    assert list(form.fields) == ['patientfio']
+    assert len(form.missing) == len(PERSISTED_FIELDS[FORM_VERSION]) - 1 and 'patientfio' not in form.missing
+    root.deleteLater()
+    app.processEvents()
+
+
+def test_plan_follows_the_version(monkeypatch):
+    monkeypatch.setitem(PERSISTED_FIELDS, FORM_VERSION + 1, ('zhalobypole', 'dspole'))
+    monkeypatch.setattr(epicrisis, '_plans', {})
+    assert set(get_plan(FORM_VERSION + 1).fields) == {'zhalobypole', 'dspole'}
+    assert len(get_plan().fields) == len(PERSISTED_FIELDS[FORM_VERSION]) - 1
+    # an unknown version falls back to the current form
+    assert get_plan(FORM_VERSION + 99) is get_plan()
+
+
+def test_stored_visit_is_rendered(temp_db):
+    db.init_db()
+    pid = db.save_patient({'fio': 'Иванов Иван'})
+    full = {'zhalobypole': ' кашель ', 'normalskin': True, 'blednost': True, 'sukhostskin': False,
+            'dspole': 'ОРВИ', 'vashslider': 3, 'imported_note': 'из файла', VERSION_KEY: FORM_VERSION}
+    vid = db.save_visit(pid, '2025-03-01 10:00:00', '', '', '', '', 'ОРВИ', 'J06.9', '', '', full)
+    lines = render_visit(db.get_visit_by_id(vid)).split('\n')
+    assert lines[:2] == ['Пациент: Иванов Иван', 'Дата: 2025-03-01 10:00:00']
+    assert 'Жалобы: кашель' in lines
+    assert 'Диагноз: ОРВИ' in lines
+    assert 'ВАШ: 3' in lines
+    assert 'Imported note: из файла' in lines
+    # checked boxes of one caption share a line; unchecked ones are left out
+    assert 'Кожные покровы: Обычной окраски и влажности, Бледные' in lines
+    # sections follow GROUP_ORDER: complaints before the diagnosis
+    assert lines.index('Жалобы: кашель') < lines.index('Диагноз: ОРВИ')
@@ -0,0 +1,52 @@
+import pytest
+
+from models.identity import (MERGE_THRESHOLD, REVIEW_THRESHOLD, fio_key, normalize_fio, normalize_phone,
+                             similarity)
+
+IVANOV = {'fio': 'Иванов Иван Петрович', 'birthdate': '1980-05-01', 'phone': '+7 900 123-45-67'}
+
+
+@pytest.mark.parametrize('raw', ['+7 900 123-45-67', '89001234567', '8 (900) 123 45 67', '9001234567'])
+def test_phone_formats_share_one_key(raw):
+    assert normalize_phone(raw) == '79001234567'
+
+
+def test_short_or_empty_phone_has_no_key():
+    assert normalize_phone('12-34') is None
+    assert normalize_phone('') is None
+    assert normalize_phone(None) is None
+
+
+def test_fio_normalisation():
+    assert normalize_fio('  Семёнова   Анна,  ') == 'семенова анна'
+    assert normalize_fio('') is None
+
+
+def test_fio_key_blocks_spelling_variants():
+    assert fio_key('Семёнова Анна') == fio_key('Семенова Анна')
+    # feminine surnames share the block of the masculine form
+    assert fio_key('Иванов Иван') == fio_key('Иванова Ирина')
+    assert fio_key('Иванов Иван') != fio_key('Петров Иван')
+    assert fio_key('') is None
+
+
+def test_same_person_written_differently():
+    other = {'fio': 'иванов  иван петрович', 'birthdate': '1980-05-01', 'phone': '89001234567'}
+    assert similarity(IVANOV, other) >= MERGE_THRESHOLD
+    typo = {'fio': 'Иванов Ивн Петрович', 'birthdate': '1980-05-01'}
+    assert similarity(IVANOV, typo) >= MERGE_THRESHOLD
+
+
+def test_different_phone_is_review_only():
+    other = dict(IVANOV, phone='89005554433')
+    assert REVIEW_THRESHOLD <= similarity(IVANOV, other) < MERGE_THRESHOLD
+
+
+def test_opposite_gender_is_not_a_duplicate():
+    wife = {'fio': 'Иванова Ирина Петровна', 'birthdate': '1980-05-01'}
+    assert similarity(IVANOV, wife) == pytest.approx(0.61, abs=0.01)
+    assert similarity(IVANOV, dict(wife, phone=IVANOV['phone'])) < REVIEW_THRESHOLD
+
+
+def test_name_alone_is_not_enough():
+    assert similarity({'fio': 'Иванов Иван'}, {'fio': 'Иванов Иван'}) == 0.0
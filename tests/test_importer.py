@@ -0,0 +1,29 @@
+from models import db, reports
+from models.importer import import_records, parse_visit_datetime
+
+
+def test_parse_visit_datetime_formats():
+    assert parse_visit_datetime('2025-10-18 10:00:00') == '2025-10-18 10:00:00'
+    assert parse_visit_datetime('2025-10-18T10:00') == '2025-10-18 10:00:00'
+    assert parse_visit_datetime('18.10.2025 10:00') == '2025-10-18 10:00:00'
+    assert parse_visit_datetime(' 18.10.2025 ') == '2025-10-18 00:00:00'
+    assert parse_visit_datetime('2025-10-18 10:00:00.123456') == '2025-10-18 10:00:00'
+    assert parse_visit_datetime('31.02.2025') is None
+    assert parse_visit_datetime('вчера') is None
+    assert parse_visit_datetime('') is None
+
+
+def test_legacy_dates_are_normalised_and_bad_ones_skipped(temp_db):
+    records = [
+        {'fio': 'Иванов Иван', 'birthdate': '1980-01-02', 'visit_datetime': '18.10.2025 10:00', 'mkb_code': 'J06.9'},
+        {'fio': 'Петров Пётр', 'birthdate': '1975-05-05', 'visit_datetime': 'неизвестно'},
+        {'fio': 'Сидоров Сидор', 'birthdate': '1990-03-04', 'visit_datetime': ''},
+    ]
+    bad = []
+    imported, new_patients, rejected = import_records(records, 'test', on_reject=lambda n, v: bad.append((n, v)))
+    assert (imported, new_patients, rejected) == (1, 1, 2)
+    assert bad == [(2, 'неизвестно'), (3, '')]
+    rows = db.list_visits_for_date('2025-10-18')
+    assert [r['visit_datetime'] for r in rows] == ['2025-10-18 10:00:00']
+    assert len(db.list_visits_between('2025-10-01', '2025-10-31')) == 1
+    assert reports.build_report('by_week', '2025-10-01', '2025-10-31')[2][0]['count'] == 1
@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import sqlite3
+
+import pytest
+
+from models import db
+from models.migrations import MIGRATIONS, SCHEMA_VERSION, check_query_plans, get_version, migrate
+
+# the database shipped with the first release: schema version 0, legacy JSON epicrisis
+BASELINE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.db')
+
+
+@pytest.fixture
+def baseline_db(temp_db):
+    if not os.path.exists(BASELINE_DB):
+        pytest.skip('app.db is not in the tree')
+    src = sqlite3.connect(f'file:{BASELINE_DB}?mode=ro', uri=True)
+    dst = sqlite3.connect(temp_db)
+    src.backup(dst)
+    src.close()
+    dst.close()
+    return temp_db
+
+
+def test_versions_are_ascending():
+    versions = [v for v, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert SCHEMA_VERSION == versions[-1]
+
+
+def test_new_database_is_migrated(temp_db):
+    db.init_db()
+    conn = db.get_conn()
+    assert get_version(conn) == SCHEMA_VERSION
+    check_query_plans(conn)
+    # a second run has nothing left to do
+    assert migrate(conn) == SCHEMA_VERSION
+
+
+@pytest.mark.parametrize('index, query', [
+    ('idx_patients_phone_norm', 'find_patient by phone'),
+    ('idx_patients_block', 'duplicate candidates by birthdate+fio_key'),
+    ('idx_visits_patient', 'rename patient in search index'),
+])
+def test_query_plan_check_catches_a_scan(temp_db, index, query):
+    db.init_db()
+    conn = db.get_conn()
+    conn.execute(f"DROP INDEX {index}")
+    with pytest.raises(RuntimeError, match=re.escape(query)):
+        check_query_plans(conn)
+
+
+def test_plans_are_checked_on_the_sql_that_runs(temp_db, monkeypatch):
+    db.init_db()
+    conn = db.get_conn()
+    # a query rewritten in models/db.py is what the check sees
+    monkeypatch.setattr(db, 'PATIENT_BY_PHONE_SQL', "SELECT * FROM patients WHERE phone=? LIMIT 1")
+    with pytest.raises(RuntimeError, match='find_patient by phone'):
+        check_query_plans(conn)
+
+
+def test_baseline_database_is_upgraded(baseline_db):
+    conn = sqlite3.connect(baseline_db)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    legacy = {vid: json.loads(text) for vid, text in conn.execute("SELECT id, full_epicrisis FROM visits")}
+    conn.close()
+    assert legacy
+
+    db.init_db()
+    conn = db.get_conn()
+    assert get_version(conn) == SCHEMA_VERSION
+    check_query_plans(conn)
+    for vid, full in legacy.items():
+        visit = db.get_visit_by_id(vid)
+        assert visit['visit_date'] == visit['visit_datetime'][:10]
+        # rows are re-encoded in the compact format; only defaults are dropped
+        assert conn.execute("SELECT typeof(full_epicrisis) FROM visits WHERE id=?", (vid,)).fetchone()[0] == 'blob'
+        assert visit['full_epicrisis'] == {k: v for k, v in full.items() if not (v is None or v is False or v == '')}
+    patient = db.find_patient(phone='8 (888) 888-88-88')
+    assert patient and patient['fio'] == 'Шухрат'
+    assert [r['patient_fio'] for r in db.search_visits('шухрат')] == ['Шухрат']
+
+
+def test_round_trip_after_upgrade(baseline_db):
+    db.init_db()
+    full = {'zhalobypole': 'головная боль', 'normalskin': True, 'vashslider': 0, 'dspole': ''}
+    assert db.decode_epicrisis(db.encode_epicrisis(full)) == {'zhalobypole': 'головная боль', 'normalskin': True,
+                                                              'vashslider': 0}
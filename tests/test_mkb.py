@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from models import mkb
+
+RECORDS = [
+    {'code': 'J20.9', 'desc_ru': 'Острый бронхит неуточнённый', 'desc_lat': 'Bronchitis acuta'},
+    {'code': 'J20', 'desc_ru': 'Острый бронхит'},
+    {'code': 'J06.9', 'desc_ru': 'Острая инфекция верхних дыхательных путей неуточнённая'},
+    {'code': 'I10', 'desc_ru': 'Эссенциальная (первичная) гипертензия'},
+    {'code': 'S60.0', 'desc': 'Ушиб пальца кисти'},
+    {'code': 'E11.9', 'desc_ru': 'Сахарный диабет 2 типа без осложнений'},
+    {'code': '', 'desc_ru': 'без кода'},
+]
+
+
+def _write(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+@pytest.fixture
+def index(tmp_path):
+    source, cache = str(tmp_path / 'mkb.json'), str(tmp_path / 'mkb.idx')
+    _write(source, RECORDS)
+    return mkb.MkbIndex(source, cache)
+
+
+def test_code_prefix(index):
+    assert [r[0] for r in index.search('J20')] == ['J20', 'J20.9']
+    # the dot is optional and a Cyrillic look-alike letter is read as Latin
+    assert [r[0] for r in index.search('j209')] == ['J20.9']
+    assert [r[0] for r in index.search('Е11')] == ['E11.9']
+    assert index.search('S60.0')[0] == ('S60.0', 'Ушиб пальца кисти', 'XIX')
+    assert len(index) == 6
+
+
+def test_title_words(index):
+    assert [r[0] for r in index.search('бронх')] == ['J20', 'J20.9']
+    assert [r[0] for r in index.search('остр неуточ')] == ['J06.9', 'J20.9']
+    # every description is searchable, the Russian one is shown
+    assert index.search('acuta') == [('J20.9', 'Острый бронхит неуточнённый', 'X')]
+    assert index.search('ПЕРВИЧНАЯ')[0][0] == 'I10'
+    assert index.search('остр', chapter='IX') == []
+    assert index.search('') == [] and index.search('туберкулез') == []
+
+
+def test_lookup(index):
+    assert index.lookup('j20.9') == ('J20.9', 'Острый бронхит неуточнённый', 'X')
+    assert index.lookup('J21') is None
+
+
+def test_cache_is_reused(index, monkeypatch):
+    index.load()
+    assert os.path.exists(index.cache)
+
+    def no_compile(records):
+        raise AssertionError('recompiled an unchanged classifier')
+    monkeypatch.setattr(mkb, 'compile_records', no_compile)
+    again = mkb.MkbIndex(index.source, index.cache)
+    assert [r[0] for r in again.search('J20')] == ['J20', 'J20.9']
+
+
+def test_cache_is_rebuilt_when_the_source_changes(index):
+    index.load()
+    _write(index.source, RECORDS + [{'code': 'K29.7', 'desc_ru': 'Гастрит неуточнённый'}])
+    fresh = mkb.MkbIndex(index.source, index.cache)
+    assert [r[0] for r in fresh.search('гастр')] == ['K29.7']
+    assert len(fresh) == 7
+    # and the rebuilt cache is what the next start reads
+    assert mkb.load_compiled(index.source, index.cache)['codes'] == fresh._data['codes']
+
+
+def test_missing_classifier_gives_an_empty_index(tmp_path):
+    index = mkb.MkbIndex(str(tmp_path / 'none.json'), str(tmp_path / 'none.idx'))
+    assert len(index) == 0 and index.search('J20') == []
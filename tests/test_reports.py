@@ -0,0 +1,43 @@
+from models import db, reports, stats
+
+
+def _counts(day_counts, monkeypatch, kind):
+    monkeypatch.setattr(stats, 'per_day', lambda start, end: day_counts)
+    return {r['group']: r['count'] for r in reports.aggregate(kind, '2025-12-01', '2026-01-31')}
+
+
+def test_weeks_are_iso_weeks_across_the_new_year(monkeypatch):
+    counts = _counts([('2025-12-28', 1), ('2025-12-29', 2), ('2026-01-01', 3), ('2026-01-05', 4)], monkeypatch, 'by_week')
+    assert counts == {'2025-W52': 1, '2026-W01': 5, '2026-W02': 4, 'Итого': 10}
+
+
+def test_unreadable_days_are_skipped(monkeypatch):
+    counts = _counts([('18.10.2025', 7), ('2025-12-29', 2)], monkeypatch, 'by_month')
+    assert counts == {'2025-12': 2, 'Итого': 2}
+    assert _counts([('18.10.2025', 7), ('2025-12-29', 2)], monkeypatch, 'by_day') == {'2025-12-29': 2, 'Итого': 2}
+    skipped = []
+    reports.aggregate('by_week', '2025-12-01', '2026-01-31', skipped)
+    assert skipped == [('18.10.2025', 7)]
+    title = reports.build_report('by_week', '2025-12-01', '2026-01-31')[0]
+    assert title == 'По неделям (не учтено обращений с нечитаемой датой: 7)'
+
+
+def test_by_week_from_the_database(temp_db):
+    db.init_db()
+    pid = db.save_patient({'fio': 'Иванов Иван', 'birthdate': '1980-01-02'})
+    for when in ('2025-12-29 10:00:00', '2026-01-02 11:00:00'):
+        db.save_visit(pid, when, '', '', '', '', '', 'J06.9', '', '', {})
+    rows = reports.build_report('by_week', '2025-12-01', '2026-01-31')[2]
+    assert rows[0] == {'group': '2026-W01', 'count': 2, 'share': '100.0%'}
+
+
+def test_visit_list_is_paged(temp_db):
+    db.init_db()
+    pid = db.save_patient({'fio': 'Иванов Иван', 'organisation': 'ООО "Вахта"'})
+    for day in range(1, 6):
+        db.save_visit(pid, f'2025-03-0{day} 10:00:00', '', '', '', '', 'ОРВИ', 'J06.9', '', '', {})
+    first = reports.visits_page('2025-03-01', '2025-03-31', 0, 2)
+    rest = reports.visits_page('2025-03-01', '2025-03-31', 2, 10)
+    assert [r['visit_datetime'][:10] for r in first + rest] == [f'2025-03-0{d}' for d in range(5, 0, -1)]
+    assert first[0]['other'] == 'J06.9 ОРВИ' and first[0]['organisation'] == 'ООО "Вахта"'
+    assert reports.build_report('visits', '2025-03-01', '2025-03-31')[2] == first + rest
@@ -0,0 +1,24 @@
+import pytest
+
+from models import db, fio_index
+
+
+def test_failed_case_leaves_nothing_behind(temp_db, monkeypatch):
+    db.init_db()
+    index = fio_index.FioIndex()
+    index.load([])
+    monkeypatch.setattr(fio_index, '_index', index)
+    with pytest.raises(TypeError):
+        db.save_case({'fio': 'Петров Пётр'}, {'no_such_column': 1})
+    assert db.find_patient('Петров Пётр') is None
+    assert index.search('Петров') == []
+
+
+def test_case_is_saved_in_one_go(temp_db):
+    db.init_db()
+    pid, vid = db.save_case({'fio': 'Петров Пётр', 'phone': '89001112233'},
+                            {'visit_datetime': '2025-03-01 10:00:00', 'vid_priema': '', 'obschsost': '', 'soznanie': '',
+                             'examiner': '', 'diagnosis': '', 'mkb_code': 'J06.9', 'outcome': '', 'evacuation_place': '',
+                             'full_epicrisis': {'zhalobypole': 'кашель'}})
+    visit = db.get_visit_by_id(vid)
+    assert visit['patient_id'] == pid and visit['full_epicrisis'] == {'zhalobypole': 'кашель'}
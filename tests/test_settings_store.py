@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import settings_store
+
+
+@pytest.fixture
+def settings_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'app_settings.json')
+    monkeypatch.setattr(settings_store, 'SETTINGS_FILE', path)
+    monkeypatch.setattr(settings_store, '_cache', None)
+    monkeypatch.setattr(settings_store, '_cache_sig', None)
+    return path
+
+
+def _count_writes(monkeypatch):
+    writes = []
+    real = settings_store._write
+    monkeypatch.setattr(settings_store, '_write', lambda s: (writes.append(dict(s)), real(s)))
+    return writes
+
+
+def test_first_load_creates_the_file(settings_path):
+    s = settings_store.load_settings()
+    assert s['theme'] == 'light'
+    assert settings_store.verify_user('admin', 'admin')
+    with open(settings_path, encoding='utf-8') as f:
+        assert json.load(f)['users'] == s['users']
+
+
+def test_round_trip(settings_path):
+    s = settings_store.load_settings()
+    s['organisations'] = ['ООО "Вахта"']
+    s['theme'] = 'dark'
+    settings_store.save_settings(s)
+    with open(settings_path, encoding='utf-8') as f:
+        assert json.load(f)['organisations'] == ['ООО "Вахта"']
+    # the caller's dict is a copy: changing it does not touch the cache
+    s['theme'] = 'light'
+    assert settings_store.load_settings()['theme'] == 'dark'
+    # no temp files are left next to the settings
+    assert os.listdir(os.path.dirname(settings_path)) == ['app_settings.json']
+
+
+def test_unchanged_settings_are_not_written(settings_path, monkeypatch):
+    settings_store.load_settings()
+    writes = _count_writes(monkeypatch)
+    settings_store.save_settings(settings_store.load_settings())
+    settings_store.set_current_user(None)
+    assert writes == []
+
+
+def test_external_change_is_reloaded(settings_path):
+    settings_store.load_settings()
+    with open(settings_path, encoding='utf-8') as f:
+        data = json.load(f)
+    data['medics'] = ['Петрова Е.В.', 'Сидоров А.Н.']
+    with open(settings_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    assert settings_store.load_settings()['medics'] == ['Петрова Е.В.', 'Сидоров А.Н.']
+
+
+def test_broken_file_falls_back_to_defaults(settings_path):
+    with open(settings_path, 'w', encoding='utf-8') as f:
+        f.write('{not json')
+    assert settings_store.load_settings()['autosave_on'] is True
+    with open(settings_path, encoding='utf-8') as f:
+        json.load(f)
+
+
+def test_batch_writes_once(settings_path, monkeypatch):
+    settings_store.load_settings()
+    writes = _count_writes(monkeypatch)
+    with settings_store.batch():
+        settings_store.add_user('ivanov', '1')
+        with settings_store.batch():
+            settings_store.set_current_user('ivanov')
+        settings_store.add_user('petrov', '2')
+        assert writes == []
+    assert len(writes) == 1
+    assert writes[0]['current_user'] == 'ivanov' and set(writes[0]['users']) == {'admin', 'ivanov', 'petrov'}
+    assert settings_store.verify_user('petrov', '2') and not settings_store.verify_user('petrov', '1')
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtWidgets  # noqa: E402
+
+from controllers.visits_model import VisitsTableModel  # noqa: E402
+
+
+class _Executor:
+    """Keeps submitted pages so the test decides when and how each one finishes."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, **kwargs):
+        self.tasks.append((fn, args, on_done, on_error))
+
+    def cancel(self, key):
+        pass
+
+
+@pytest.fixture
+def model():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    executor = _Executor()
+    m = VisitsTableModel([('id', 'id')], executor=executor)
+    m.PAGE_SIZE = 2
+    yield m, executor
+    app.processEvents()
+
+
+def _rows(offset, limit):
+    return [{'id': i} for i in range(offset, offset + limit)]
+
+
+def test_pages_are_appended(model):
+    m, executor = model
+    m.set_source(_rows)
+    fn, args, on_done, _ = executor.tasks.pop()
+    on_done(fn(*args))
+    assert m.rowCount() == 2 and m.canFetchMore()
+    m.fetchMore()
+    fn, args, on_done, _ = executor.tasks.pop()
+    on_done(fn(*args)[:1])
+    assert [m.visit_id(r) for r in range(m.rowCount())] == [0, 1, 2]
+    assert not m.canFetchMore()
+
+
+def test_failure_of_a_replaced_source_is_ignored(model):
+    m, executor = model
+    failures = []
+    m.load_failed.connect(failures.append)
+    m.set_source(lambda offset, limit: [])
+    m.set_source(_rows)
+    (_, _, _, old_error), (fn, args, on_done, _) = executor.tasks
+    old_error(RuntimeError('old page'))
+    assert failures == []
+    on_done(fn(*args))
+    assert m.rowCount() == 2 and m.canFetchMore()
+
+
+def test_failure_stops_paging(model):
+    m, executor = model
+    failures = []
+    m.load_failed.connect(failures.append)
+    m.set_source(_rows)
+    executor.tasks.pop()[3](RuntimeError('disk I/O error'))
+    assert len(failures) == 1 and not m.canFetchMore()